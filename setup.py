@@ -175,6 +175,9 @@ setup(
     #     'dev': ['check-manifest'],
     #     'test': ['coverage'],
     # },
+    extras_require={
+        'async': ['httpx'],
+    },
     # If there are data files included in your packages that need to be
     # installed, specify them here.
     # package_data={  # Optional
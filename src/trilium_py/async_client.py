@@ -0,0 +1,662 @@
+import asyncio
+import mimetypes
+import os
+import sys
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from loguru import logger
+
+from .utils.param_util import clean_param, format_query_string
+from .utils.time_util import format_dates_for_api, get_today, get_yesterday
+from .version import __version__
+
+try:
+    import httpx
+except ImportError as e:  # pragma: no cover
+    raise ImportError(
+        'AsyncETAPI requires httpx, install it with `pip install trilium-py[async]`'
+    ) from e
+
+
+class AsyncETAPI:
+    """
+    asyncio twin of `ETAPI`, backed by a pooled `httpx.AsyncClient`.
+
+    Every request waits on a semaphore, so at most `max_concurrency` requests are in flight
+    no matter how many coroutines are gathered.
+
+    .. Code:: python
+
+    async with AsyncETAPI(server_url, token) as ea:
+        notes = await ea.map(ea.get_note, note_ids)
+    """
+
+    __version__ = __version__
+
+    def __init__(
+            self,
+            server_url: str,
+            token: Optional[str] = None,
+            max_concurrency: int = 32,
+            max_keepalive_connections: int = 32,
+            timeout: Optional[float] = None,
+            **client_kwargs,
+    ):
+        """
+        :param server_url:
+        :param token:
+        :param max_concurrency: max number of requests in flight at the same time
+        :param max_keepalive_connections: max number of idle connections kept in the pool
+        :param timeout: default request timeout in seconds, None means no timeout
+        :param client_kwargs: extra arguments passed to `httpx.AsyncClient`
+        """
+        if sys.version_info < (3, 9):
+            print(
+                (
+                    f'You are using Python {sys.version_info.major}.{sys.version_info.minor}'
+                    ', 3.9+ is required.'
+                ),
+                file=sys.stderr,
+            )
+
+        self.server_url = server_url
+        self.token: str = token  # type: ignore
+        self.max_concurrency = max_concurrency
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            timeout=timeout,
+            **client_kwargs,
+        )
+        # created lazily, so it is bound to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close_session()
+
+    async def close_session(self):
+        """
+        Close the pooled HTTP client. Not to be confused with `close()`, which asks the server to sync.
+        """
+        await self.client.aclose()
+
+    def get_header(self) -> dict:
+        return {
+            'Authorization': self.token,
+        }
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        kwargs.setdefault('headers', self.get_header())
+        async with self.semaphore:
+            return await self.client.request(method, url, **kwargs)
+
+    async def gather(self, *aws: Awaitable, return_exceptions: bool = False) -> list:
+        """
+        `asyncio.gather` wrapper, concurrency is still bounded by `max_concurrency`.
+
+        :param aws: awaitables, e.g. `ea.get_note(noteId)`
+        :param return_exceptions: return exceptions in the result list instead of raising
+        :return: results in the same order as `aws`
+        """
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    async def map(
+            self,
+            func: Callable[..., Awaitable],
+            items: Iterable[Any],
+            return_exceptions: bool = False,
+    ) -> list:
+        """
+        Call `func` for every item concurrently, e.g. `await ea.map(ea.get_note, note_ids)`
+
+        :param func: coroutine function taking one argument
+        :param items:
+        :param return_exceptions: return exceptions in the result list instead of raising
+        :return: results in the same order as `items`
+        """
+        return await self.gather(*(func(x) for x in items), return_exceptions=return_exceptions)
+
+    async def login(self, password: str) -> Optional[str]:
+        """
+        generate token with password
+        """
+        url = f'{self.server_url}/etapi/auth/login'
+        res = await self._request('POST', url, data={'password': password}, headers={})
+        if res.status_code == 201:
+            self.token = res.json()['authToken']
+            return self.token
+        else:
+            logger.info(res.json()['message'])
+            return None
+
+    async def logout(self, token_to_destroy: Optional[str] = None) -> bool:
+        """
+        destroy token
+        """
+        if not token_to_destroy:
+            token_to_destroy = self.token
+
+        if not token_to_destroy:
+            return False
+
+        url = f'{self.server_url}/etapi/auth/logout'
+        res = await self._request('POST', url, headers={'Authorization': token_to_destroy})
+        if res.status_code == 204:
+            logger.info('logout successfully')
+            return True
+        return False
+
+    async def app_info(self) -> dict:
+        url = f'{self.server_url}/etapi/app-info'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def search_note(self, search: str, **params) -> dict:
+        url = f'{self.server_url}/etapi/notes'
+        params['search'] = search
+        res = await self._request('GET', url, params=format_query_string(params))
+        return res.json()
+
+    async def get_note(self, noteId: str) -> dict:
+        url = f'{self.server_url}/etapi/notes/{noteId}'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def create_note(
+            self,
+            parentNoteId: str,
+            title: str,
+            type: str,
+            mime: Optional[str] = None,
+            content=None,
+            notePosition: Optional[int] = None,
+            prefix: Optional[str] = None,
+            isExpanded: Optional[str] = None,
+            noteId: Optional[str] = None,
+            branchId: Optional[str] = None,
+            dateCreated: Optional[str] = None
+    ) -> dict:
+        """
+        Actually it's create or update,
+        if noteId already exists, the corresponding note will be updated
+        """
+        url = f'{self.server_url}/etapi/create-note'
+        params = {
+            "parentNoteId": parentNoteId,
+            "title": title,
+            "type": type,
+            "mime": mime,
+            "content": content,
+            "notePosition": notePosition,
+            "prefix": prefix,
+            "isExpanded": isExpanded,
+            "noteId": noteId,
+            "branchId": branchId,
+            "dateCreated": dateCreated,
+        }
+        res = await self._request('POST', url, json=clean_param(params))
+        return res.json()
+
+    async def _create_binary_note(
+            self,
+            parentNoteId: str,
+            title: str,
+            file_path: str,
+            type: str,
+            mime: str,
+            content: str,
+            notePosition: Optional[int] = None,
+            prefix: Optional[str] = None,
+            isExpanded: Optional[str] = None,
+            noteId: Optional[str] = None,
+            branchId: Optional[str] = None,
+    ):
+        res_note_json = await self.create_note(
+            parentNoteId=parentNoteId,
+            title=title,
+            type=type,
+            mime=mime,
+            content=content,
+            notePosition=notePosition,
+            prefix=prefix,
+            isExpanded=isExpanded,
+            noteId=noteId,
+            branchId=branchId,
+        )
+        new_noteId = res_note_json['note']['noteId']
+
+        # set file name
+        await self.create_attribute(
+            attributeId=None,
+            noteId=new_noteId,
+            type='label',
+            name='originalFileName',
+            value=os.path.basename(file_path),
+            isInheritable=False,
+        )
+
+        # upload file, set note content
+        url = f'{self.server_url}/etapi/notes/{new_noteId}/content'
+        res = await self._upload_file(url, 'PUT', file_path)
+        if res.status_code == 204:
+            return res_note_json
+        return None
+
+    async def create_file_note(
+            self,
+            parentNoteId: str,
+            title: str,
+            file_path: str,
+            type: str = 'file',
+            mime: str = "application/octet-stream",
+            content='<p></p>',
+            **kwargs,
+    ):
+        """
+        Upload ordinary file as a sub-note
+        """
+        return await self._create_binary_note(
+            parentNoteId=parentNoteId,
+            title=title,
+            file_path=file_path,
+            type=type,
+            mime=mime,
+            content=content,
+            **kwargs,
+        )
+
+    async def create_image_note(
+            self,
+            parentNoteId: str,
+            title: str,
+            image_file: str,
+            type: str = 'image',
+            mime: Optional[str] = None,
+            content: str = "image",
+            **kwargs,
+    ):
+        """
+        Upload image as a sub-note
+        """
+        if not mime:
+            mime, _ = mimetypes.guess_type(image_file)
+        if not mime:
+            mime = "image/png"
+
+        return await self._create_binary_note(
+            parentNoteId=parentNoteId,
+            title=title,
+            file_path=image_file,
+            type=type,
+            mime=mime,
+            content=content,
+            **kwargs,
+        )
+
+    async def patch_note(
+            self,
+            noteId: str,
+            title: Optional[str] = None,
+            type: Optional[str] = None,
+            mime: Optional[str] = None,
+            dateCreated: Optional[datetime] = None,
+            utcDateCreated: Optional[datetime] = None,
+    ) -> dict:
+        url = f'{self.server_url}/etapi/notes/{noteId}'
+
+        formatted_date_created, formatted_utc_date_created = None, None
+        if dateCreated or utcDateCreated:
+            formatted_date_created, formatted_utc_date_created = format_dates_for_api(
+                local_date=dateCreated,
+                utc_date=utcDateCreated
+            )
+
+        params = {
+            "title": title,
+            "type": type,
+            "mime": mime,
+            "dateCreated": formatted_date_created,
+            "utcDateCreated": formatted_utc_date_created,
+        }
+        res = await self._request('PATCH', url, json=clean_param(params))
+        return res.json()
+
+    async def delete_note(self, noteId: str) -> bool:
+        url = f'{self.server_url}/etapi/notes/{noteId}'
+        res = await self._request('DELETE', url)
+        return res.status_code == 204
+
+    async def get_note_content(self, noteId: str) -> str:
+        url = f'{self.server_url}/etapi/notes/{noteId}/content'
+        res = await self._request('GET', url)
+        return res.content.decode('utf-8')
+
+    async def update_note_content(self, noteId: str, content: str) -> bool:
+        url = f'{self.server_url}/etapi/notes/{noteId}/content'
+        res = await self._request(
+            'PUT',
+            url,
+            content=content.encode('utf-8'),
+            headers={'content-type': 'text/plain', 'Authorization': self.token},
+        )
+        return res.status_code == 204
+
+    async def get_branch(self, branchId: str) -> dict:
+        url = f'{self.server_url}/etapi/branches/{branchId}'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def create_branch(
+            self,
+            noteId: str,
+            parentNoteId: str,
+            prefix: str = "",
+            notePosition: int = 0,
+            isExpanded: bool = False,
+            utcDateModified=None
+    ) -> dict:
+        url = f'{self.server_url}/etapi/branches/'
+        params = {
+            "noteId": noteId,
+            "parentNoteId": parentNoteId,
+            "prefix": prefix,
+            "notePosition": notePosition,
+            "isExpanded": isExpanded,
+            "utcDateModified": utcDateModified,
+        }
+        res = await self._request('POST', url, json=clean_param(params))
+        return res.json()
+
+    async def patch_branch(
+            self, branchId: str, notePosition: int, prefix: str, isExpanded: bool
+    ) -> dict:
+        url = f'{self.server_url}/etapi/branches/{branchId}'
+        params = {
+            "notePosition": notePosition,
+            "prefix": prefix,
+            "isExpanded": isExpanded,
+        }
+        res = await self._request('PATCH', url, json=clean_param(params))
+        return res.json()
+
+    async def delete_branch(self, branchId: str) -> bool:
+        url = f'{self.server_url}/etapi/branches/{branchId}'
+        res = await self._request('DELETE', url)
+        return res.status_code == 204
+
+    async def get_attribute(self, attributeId: str) -> dict:
+        url = f'{self.server_url}/etapi/attributes/{attributeId}'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def create_attribute(
+            self,
+            noteId: str,
+            type: str,
+            name: str,
+            value: str,
+            isInheritable: bool,
+            attributeId: Optional[str] = None,
+    ) -> dict:
+        url = f'{self.server_url}/etapi/attributes/'
+        params = {
+            "noteId": noteId,
+            "type": type,
+            "name": name,
+            "value": value,
+            "isInheritable": isInheritable,
+            "attributeId": attributeId,
+        }
+        res = await self._request('POST', url, json=clean_param(params))
+        return res.json()
+
+    async def patch_attribute(self, attributeId: str, value: str) -> dict:
+        url = f'{self.server_url}/etapi/attributes/{attributeId}'
+        res = await self._request('PATCH', url, json=clean_param({"value": value}))
+        return res.json()
+
+    async def delete_attribute(self, attributeId: str) -> bool:
+        url = f'{self.server_url}/etapi/attributes/{attributeId}'
+        res = await self._request('DELETE', url)
+        return res.status_code == 204
+
+    async def refresh_note_ordering(self, parentNoteId: str) -> bool:
+        url = f'{self.server_url}/etapi/refresh-note-ordering/{parentNoteId}'
+        res = await self._request('POST', url)
+        return res.status_code == 204
+
+    async def inbox(self, date: str) -> dict:
+        url = f'{self.server_url}/etapi/inbox/{date}'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def get_calendar_days(self, date: str) -> dict:
+        url = f'{self.server_url}/etapi/calendar/days/{date}'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def get_calendar_weeks(self, date: str) -> dict:
+        url = f'{self.server_url}/etapi/calendar/weeks/{date}'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def get_calendar_months(self, month: str) -> dict:
+        url = f'{self.server_url}/etapi/calendar/months/{month}'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def get_calendar_years(self, year: str) -> dict:
+        url = f'{self.server_url}/etapi/calendar/years/{year}'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def get_day_note(self, date: str) -> str:
+        """
+        get note content by date
+        :param date: date string in format of "%Y-%m-%d", e.g. "2022-02-25"
+        """
+        noteId = (await self.get_calendar_days(date))['noteId']
+        return await self.get_note_content(noteId)
+
+    async def set_day_note(self, date: str, content: str) -> bool:
+        """
+        set note content by date
+        :param date: date string in format of "%Y-%m-%d", e.g. "2022-02-25"
+        :param content: note content
+        """
+        noteId = (await self.get_calendar_days(date))['noteId']
+        return await self.update_note_content(noteId, content)
+
+    async def get_today_note_content(self) -> str:
+        return await self.get_day_note(get_today())
+
+    async def set_today_note_content(self, content: str) -> bool:
+        return await self.set_day_note(get_today(), content)
+
+    async def get_yesterday_note_content(self) -> str:
+        return await self.get_day_note(get_yesterday())
+
+    async def set_yesterday_note_content(self, content: str) -> bool:
+        return await self.set_day_note(get_yesterday(), content)
+
+    async def export_note(
+            self, noteId: str, format: str, save_path: str, chunk_size: int = 1024 * 1024
+    ) -> bool:
+        """
+        Export note by id. Please note that protected notes are not allowed to be exported by ETAPI.
+
+        :param noteId: note id
+        :param format: format should be "html" or "markdown" or "md" for short
+        :param save_path: path for exported file
+        :param chunk_size: download chunk size
+        """
+        url = f'{self.server_url}/etapi/notes/{noteId}/export'
+        format = 'markdown' if format in ['md', 'markdown'] else 'html'
+        async with self.semaphore:
+            async with self.client.stream(
+                    'GET', url, params={"format": format}, headers=self.get_header()
+            ) as r:
+                logger.info(r.status_code)
+                if r.status_code != 200:
+                    return False
+                # write to a temporary file, so an interrupted export never leaves a broken zip
+                part_path = f'{save_path}.part'
+                try:
+                    with open(part_path, 'wb') as fd:
+                        async for chunk in r.aiter_bytes(chunk_size):
+                            fd.write(chunk)
+                except BaseException:
+                    os.remove(part_path)
+                    raise
+        os.replace(part_path, save_path)
+        return True
+
+    async def import_note(self, noteId: str, file_path: str) -> bool:
+        """
+        import zip format note
+        """
+        url = f'{self.server_url}/etapi/notes/{noteId}/import'
+        res = await self._upload_file(url, 'POST', file_path)
+        logger.info(res)
+        return res.status_code == 201
+
+    async def save_revision(self, noteId: str) -> bool:
+        url = f'{self.server_url}/etapi/notes/{noteId}/revision'
+        res = await self._request('POST', url)
+        return res.status_code == 204
+
+    async def backup(self, backup_name: str) -> bool:
+        url = f'{self.server_url}/etapi/backup/{backup_name}'
+        res = await self._request('PUT', url)
+        if res.status_code == 204:
+            logger.info('backup successfully')
+            return True
+        return False
+
+    async def close(self):
+        """
+        Force sync from server
+        """
+        url = f"{self.server_url}/etapi/sync/now"
+        res = await self._request('POST', url)
+        if res.status_code == 200:
+            logger.info("sync successfully")
+
+    async def get_attachments(self, noteId: str) -> list:
+        url = f'{self.server_url}/etapi/notes/{noteId}/attachments'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def get_attachment(self, attachmentId: str) -> dict:
+        url = f'{self.server_url}/etapi/attachments/{attachmentId}'
+        res = await self._request('GET', url)
+        return res.json()
+
+    async def create_attachment(
+            self,
+            ownerId: str,
+            file_path: str,
+            title: str = None,
+            role: str = None,
+            mime: str = None,
+            position: int = 0,
+    ) -> dict:
+        """
+        create or update a attachment, meta data and content are uploaded with separate requests
+
+        :param role: should be 'image' or 'file'
+        :param mime: e.g. 'image/png'
+        """
+        url = f'{self.server_url}/etapi/attachments'
+
+        if not title:
+            title = os.path.basename(file_path)
+        if not mime:
+            mime, _ = mimetypes.guess_type(file_path)
+        if not mime:
+            mime = 'image/png'
+        if not role:
+            role = 'image' if 'image' in mime else 'file'
+
+        params = {
+            "ownerId": ownerId,
+            "role": role,
+            "mime": mime,
+            "title": title,
+            "position": position,
+            "content": '',
+        }
+        res = (await self._request('POST', url, data=clean_param(params))).json()
+        await self.update_attachment_content(res['attachmentId'], file_path)
+        return res
+
+    async def update_attachment(
+            self,
+            attachmentId: str,
+            title: str,
+            role: str,
+            mime: str,
+            position: int = 0,
+    ) -> dict:
+        url = f'{self.server_url}/etapi/attachments/{attachmentId}'
+        params = {
+            "role": role,
+            "mime": mime,
+            "title": title,
+            "position": position,
+        }
+        res = await self._request('PATCH', url, json=clean_param(params))
+        return res.json()
+
+    async def get_attachment_content(self, attachmentId: str) -> bytes:
+        url = f'{self.server_url}/etapi/attachments/{attachmentId}/content'
+        res = await self._request('GET', url)
+        return res.content
+
+    async def update_attachment_content(
+            self, attachmentId: str, data_source, is_file: bool = True
+    ) -> bool:
+        url = f'{self.server_url}/etapi/attachments/{attachmentId}/content'
+        if is_file:
+            res = await self._upload_file(url, 'PUT', data_source)
+        else:
+            res = await self._request(
+                'PUT', url, content=data_source, headers=self._binary_header()
+            )
+        return res.status_code == 204
+
+    async def delete_attachment(self, attachmentId: str) -> bool:
+        url = f'{self.server_url}/etapi/attachments/{attachmentId}'
+        res = await self._request('DELETE', url)
+        return res.status_code == 204
+
+    def _binary_header(self) -> dict:
+        return {
+            'content-type': 'application/octet-stream',
+            'Content-Transfer-Encoding': 'binary',
+            'Authorization': self.token,
+        }
+
+    async def _upload_file(
+            self, url: str, method: str, file_path: str, chunk_size: int = 1024 * 1024
+    ) -> httpx.Response:
+        async def file_chunks():
+            with open(file_path, 'rb') as f:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+
+        headers = self._binary_header()
+        headers['content-length'] = str(os.path.getsize(file_path))
+        return await self._request(method, url, content=file_chunks(), headers=headers)
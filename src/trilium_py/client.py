@@ -1,40 +1,103 @@
 import os
-import re
 import string
 import sys
+import tempfile
+import threading
+import time
 import urllib.parse
 from collections import deque
-from collections.abc import Mapping
-from datetime import datetime, timezone, timedelta
-from typing import Literal, Optional, Union
-from dateutil.tz import tzlocal
+from collections.abc import Iterator, Mapping
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from datetime import datetime, timedelta
+from typing import BinaryIO, Callable, Literal, Optional, Union
 
 import mimetypes
-import markdown2
-import requests
-from bs4 import BeautifulSoup
 from loguru import logger
 from natsort import natsort
-from tqdm import tqdm
+import requests
 
-from .utils.file_util import replace_extension
-from .utils.html_util import add_internal_links
+from .utils.batch_util import BatchExecutor
+from .utils.cache_util import LRUCache, NoteContentCache
+from .utils.file_util import FileReader, hash_file, replace_extension
+from .utils.html_util import (
+    add_internal_links,
+    add_internal_links_in_worker,
+    init_internal_link_worker,
+)
+from .utils.http_util import Timeout, create_session
 from .utils.image_util import compress_image_bytes, get_extension_from_image_mime
-from .utils.markdown_math import reconstructMath, sanitizeInput
-from .utils.note_util import beautify_content, sort_note_by_headings, preprocess_note_title_list
+from .utils.import_util import ImportZipWriter
+from .utils.keyword_util import ChainedKeywordMatcher, KeywordMatcher
+from .utils.link_state_util import InternalLinkState
+from .utils.manifest_util import AssetIndex, UploadManifest
+from .utils.markdown_util import find_md_assets, render_md_file, replace_asset_paths
+from .utils.note_util import (
+    beautify_content,
+    generate_note_id,
+    sort_note_by_headings,
+    preprocess_note_title_list,
+)
 from .utils.param_util import clean_param, format_query_string
 from .utils.time_util import (
     get_today,
     get_yesterday,
     format_dates_for_api,
 )
+from .utils.todo_util import (
+    add_item,
+    delete_item,
+    scan_todos,
+    set_checked,
+    update_description,
+)
+from .utils.zip_util import ZipInclude, extract_zip_stream
 from .version import __version__
 
 
 class ETAPI:
     __version__ = __version__
 
-    def __init__(self, server_url: str, token: Optional[str] = None):
+    def __init__(
+            self,
+            server_url: str,
+            token: Optional[str] = None,
+            pool_connections: int = 10,
+            pool_maxsize: int = 10,
+            max_retries: int = 0,
+            timeout: Timeout = None,
+            keep_alive: bool = True,
+            note_cache_size: int = 0,
+            note_cache_ttl: Optional[float] = 60,
+            content_cache_path: Optional[str] = None,
+            content_cache_max_bytes: int = 256 * 1024 * 1024,
+            day_note_cache_size: int = 1024,
+    ):
+        """
+        All requests share one pooled keep-alive session, so the TCP/TLS connection is reused
+        between calls. Use `with ETAPI(...) as ea:` or `close_session()` to release it.
+
+        :param server_url:
+        :param token:
+        :param pool_connections: number of host pools to cache
+        :param pool_maxsize: max number of connections kept alive per host
+        :param max_retries: retries for failed connections
+        :param timeout: default request timeout in seconds, a float or a (connect, read) tuple
+        :param keep_alive: set to False to open a new connection for every request
+        :param note_cache_size: cache up to this many `get_note` results, 0 disables the cache.
+            Notes changed through this client are invalidated automatically,
+            check `note_cache.stats()` for hit/miss counters
+        :param note_cache_ttl: seconds a cached note stays valid, None means no expiration
+        :param content_cache_path: SQLite file for a persistent `get_note_content` cache.
+            Contents are keyed by the note's blobId, so unchanged notes only cost a metadata request
+        :param content_cache_max_bytes: size cap of the content cache
+        :param day_note_cache_size: cache the note ids of this many day notes
+        """
         if sys.version_info < (3, 9):
             print(
                 (
@@ -46,6 +109,69 @@ class ETAPI:
 
         self.server_url = server_url
         self.token: str = token  # type: ignore
+        self.session = create_session(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+            timeout=timeout,
+            keep_alive=keep_alive,
+        )
+        self.note_cache: Optional[LRUCache] = None
+        if note_cache_size > 0:
+            self.note_cache = LRUCache(maxsize=note_cache_size, ttl=note_cache_ttl)
+        # day notes keep their note id until they are deleted, so they are looked up once
+        self.day_note_ids = LRUCache(maxsize=day_note_cache_size)
+        self.content_cache: Optional[NoteContentCache] = None
+        if content_cache_path:
+            self.content_cache = NoteContentCache(
+                content_cache_path, max_bytes=content_cache_max_bytes
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close_session()
+
+    def close_session(self):
+        """
+        Close the pooled HTTP session and its connections.
+        Not to be confused with `close()`, which asks the server to sync.
+        """
+        self.session.close()
+        if self.content_cache is not None:
+            self.content_cache.close()
+
+    def batch(self, max_workers: int = 8) -> BatchExecutor:
+        """
+        Run ETAPI calls concurrently on a bounded thread pool sharing this client's session.
+        Inside the block every method returns a Future, results are kept in call order.
+        Keep `max_workers` at most `pool_maxsize` so every worker gets a pooled connection.
+
+        .. Code:: python
+
+        with ea.batch(max_workers=8) as batch:
+            for note_id in note_ids:
+                batch.get_note(note_id)
+        notes = batch.results()
+        errors = batch.errors
+
+        :param max_workers: max number of concurrent calls
+        :return:
+        """
+        return BatchExecutor(self, max_workers=max_workers)
+
+    def _invalidate_notes(self, *noteIds: Optional[str]):
+        """drop notes from the note cache after they are changed"""
+        if self.note_cache is not None:
+            self.note_cache.invalidate(*[x for x in noteIds if x])
+
+    def _clear_note_cache(self):
+        """drop the whole note cache, for changes that may touch unknown notes, e.g. deletions"""
+        if self.note_cache is not None:
+            self.note_cache.clear()
+        # a deleted day note gets a new id when it's created again
+        self.day_note_ids.clear()
 
     def get_header(self) -> dict:
         return {
@@ -60,7 +186,7 @@ class ETAPI:
 
         data = {'password': password}
 
-        res = requests.post(url, data=data)
+        res = self.session.post(url, data=data)
         if res.status_code == 201:
             self.token = res.json()['authToken']
             return self.token
@@ -83,7 +209,7 @@ class ETAPI:
         headers = {
             'Authorization': token_to_destroy,
         }
-        res = requests.post(url, headers=headers)
+        res = self.session.post(url, headers=headers)
         if res.status_code == 204:
             logger.info('logout successfully')
             return True
@@ -96,7 +222,7 @@ class ETAPI:
         :return:
         """
         url = f'{self.server_url}/etapi/app-info'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
     def search_note(self, search: str, **params) -> dict:
@@ -108,20 +234,29 @@ class ETAPI:
         """
         url = f'{self.server_url}/etapi/notes'
         params['search'] = search
-        res = requests.get(url, params=format_query_string(params), headers=self.get_header())
+        res = self.session.get(url, params=format_query_string(params), headers=self.get_header())
         return res.json()
 
-    def get_note(self, noteId: str) -> dict:
+    def get_note(self, noteId: str, refresh: bool = False) -> dict:
         """
         get note by note id
         root note's id is just "root"
 
         :param noteId:
+        :param refresh: skip the note cache and store the fresh note in it
         :return:
         """
+        if self.note_cache is not None and not refresh:
+            note = self.note_cache.get(noteId)
+            if note is not None:
+                return note
+
         url = f'{self.server_url}/etapi/notes/{noteId}'
-        res = requests.get(url, headers=self.get_header())
-        return res.json()
+        res = self.session.get(url, headers=self.get_header())
+        note = res.json()
+        if self.note_cache is not None and res.status_code == 200:
+            self.note_cache.set(noteId, note)
+        return note
 
     def create_note(
             self,
@@ -170,7 +305,8 @@ class ETAPI:
             "dateCreated": dateCreated,
         }
         
-        res = requests.post(url, json=clean_param(params), headers=self.get_header())
+        res = self.session.post(url, json=clean_param(params), headers=self.get_header())
+        self._invalidate_notes(parentNoteId, noteId)
 
         return res.json()
 
@@ -187,9 +323,11 @@ class ETAPI:
             isExpanded: Optional[str] = None,
             noteId: Optional[str] = None,
             branchId: Optional[str] = None,
+            progress: Optional[Callable[[int, int, float], None]] = None,
     ):
         '''
         Helper method to create a note with binary content (file or image)
+        The file is streamed, it is never loaded into memory as a whole.
 
         :param parentNoteId: ID of the parent note
         :param title: Title of the note
@@ -202,6 +340,7 @@ class ETAPI:
         :param isExpanded: Whether the note is expanded (optional)
         :param noteId: ID for the note (optional)
         :param branchId: ID for the branch (optional)
+        :param progress: called with (bytes sent, total bytes, bytes per second) during the upload
         :return: Response JSON or None if failed
         '''
         url = f'{self.server_url}/etapi/create-note'
@@ -219,7 +358,7 @@ class ETAPI:
             "branchId": branchId,
         }
 
-        res_note = requests.post(
+        res_note = self.session.post(
             url,
             json=clean_param(params),
             headers={
@@ -243,16 +382,8 @@ class ETAPI:
 
         # upload file, set note content
         url = f'{self.server_url}/etapi/notes/{new_noteId}/content'
-        file_data = open(file_path, 'rb').read()
-        res = requests.put(
-            url,
-            data=file_data,
-            headers={
-                'content-type': 'application/octet-stream',
-                'Content-Transfer-Encoding': 'binary',
-                'Authorization': self.token,
-            },
-        )
+        res = self._send_binary('put', url, file_path, progress=progress)
+        self._invalidate_notes(parentNoteId, new_noteId)
         if res.status_code == 204:
             return res_note_json
         return None
@@ -270,6 +401,7 @@ class ETAPI:
             isExpanded: Optional[str] = None,
             noteId: Optional[str] = None,
             branchId: Optional[str] = None,
+            progress: Optional[Callable[[int, int, float], None]] = None,
     ):
         '''
         Upload ordinary file as a sub-note
@@ -288,6 +420,7 @@ class ETAPI:
         :param isExpanded:
         :param noteId:
         :param branchId:
+        :param progress: called with (bytes sent, total bytes, bytes per second) during the upload
         :return:
         '''
         return self._create_binary_note(
@@ -301,7 +434,8 @@ class ETAPI:
             prefix=prefix,
             isExpanded=isExpanded,
             noteId=noteId,
-            branchId=branchId
+            branchId=branchId,
+            progress=progress,
         )
 
     def create_image_note(
@@ -317,6 +451,7 @@ class ETAPI:
             isExpanded: Optional[str] = None,
             noteId: Optional[str] = None,
             branchId: Optional[str] = None,
+            progress: Optional[Callable[[int, int, float], None]] = None,
     ):
         '''
         Upload image as a sub-note
@@ -336,6 +471,7 @@ class ETAPI:
         :param isExpanded:
         :param noteId:
         :param branchId:
+        :param progress: called with (bytes sent, total bytes, bytes per second) during the upload
         :return:
         '''
         if not mime:
@@ -357,7 +493,8 @@ class ETAPI:
             prefix=prefix,
             isExpanded=isExpanded,
             noteId=noteId,
-            branchId=branchId
+            branchId=branchId,
+            progress=progress,
         )
 
     def patch_note(
@@ -400,36 +537,66 @@ class ETAPI:
             "dateCreated": formatted_date_created,
             "utcDateCreated": formatted_utc_date_created,
         }
-        res = requests.patch(url, json=clean_param(params), headers=self.get_header())
+        res = self.session.patch(url, json=clean_param(params), headers=self.get_header())
+        self._invalidate_notes(noteId)
         return res.json()
 
     def delete_note(self, noteId: str) -> bool:
         url = f'{self.server_url}/etapi/notes/{noteId}'
-        res = requests.delete(url, headers=self.get_header())
+        res = self.session.delete(url, headers=self.get_header())
+        # children and parents of the deleted note change too
+        self._clear_note_cache()
         if res.status_code == 204:
             return True
         return False
 
     def get_note_content(self, noteId: str) -> str:
+        return self._get_note_content(noteId)[1]
+
+    def _get_note_content(self, noteId: str) -> tuple[int, str]:
+        """
+        :return: (status code, content)
+        """
+        version = None
+        if self.content_cache is not None:
+            # a cached note may have an outdated blobId, the version must come from the server
+            note = self.get_note(noteId, refresh=True)
+            version = note.get('blobId') or note.get('utcDateModified')
+            if version:
+                content = self.content_cache.get(noteId, version)
+                if content is not None:
+                    return 200, content
+
         url = f'{self.server_url}/etapi/notes/{noteId}/content'
-        res = requests.get(url, headers=self.get_header())
-        return res.content.decode('utf-8')
+        res = self.session.get(url, headers=self.get_header())
+        content = res.content.decode('utf-8')
+        if version and res.status_code == 200:
+            self.content_cache.set(noteId, version, content)
+        return res.status_code, content
 
     def update_note_content(self, noteId: str, content: str) -> bool:
         """update note content"""
+        return self._update_note_content(noteId, content) == 204
+
+    def _update_note_content(self, noteId: str, content: str) -> int:
+        """
+        :return: status code
+        """
         url = f'{self.server_url}/etapi/notes/{noteId}/content'
-        res = requests.put(
+        res = self.session.put(
             url,
             data=content.encode('utf-8'),
             headers={'content-type': 'text/plain', 'Authorization': self.token},
         )
-        if res.status_code == 204:
-            return True
-        return False
+        # blobId and modification dates change with the content
+        self._invalidate_notes(noteId)
+        if self.content_cache is not None:
+            self.content_cache.invalidate(noteId)
+        return res.status_code
 
     def get_branch(self, branchId: str) -> dict:
         url = f'{self.server_url}/etapi/branches/{branchId}'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
     def create_branch(
@@ -464,7 +631,8 @@ class ETAPI:
             "isExpanded": isExpanded,
             "utcDateModified": utcDateModified,
         }
-        res = requests.post(url, json=clean_param(params), headers=self.get_header())
+        res = self.session.post(url, json=clean_param(params), headers=self.get_header())
+        self._invalidate_notes(noteId, parentNoteId)
         return res.json()
 
     def patch_branch(self, branchId: str, notePosition: int, prefix: str, isExpanded: bool) -> dict:
@@ -474,19 +642,24 @@ class ETAPI:
             "prefix": prefix,
             "isExpanded": isExpanded,
         }
-        res = requests.patch(url, json=clean_param(params), headers=self.get_header())
-        return res.json()
+        res = self.session.patch(url, json=clean_param(params), headers=self.get_header())
+        branch = res.json()
+        if isinstance(branch, dict):
+            self._invalidate_notes(branch.get('noteId'), branch.get('parentNoteId'))
+        return branch
 
     def delete_branch(self, branchId: str) -> bool:
         url = f'{self.server_url}/etapi/branches/{branchId}'
-        res = requests.delete(url, headers=self.get_header())
+        res = self.session.delete(url, headers=self.get_header())
+        # deleting the last branch of a note deletes the note and its subtree
+        self._clear_note_cache()
         if res.status_code == 204:
             return True
         return False
 
     def get_attribute(self, attributeId: str) -> dict:
         url = f'{self.server_url}/etapi/attributes/{attributeId}'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
     def create_attribute(
@@ -507,7 +680,8 @@ class ETAPI:
             "isInheritable": isInheritable,
             "attributeId": attributeId,
         }
-        res = requests.post(url, json=clean_param(params), headers=self.get_header())
+        res = self.session.post(url, json=clean_param(params), headers=self.get_header())
+        self._invalidate_notes(noteId)
         return res.json()
 
     def patch_attribute(self, attributeId: str, value: str) -> dict:
@@ -515,57 +689,170 @@ class ETAPI:
         params = {
             "value": value,
         }
-        res = requests.patch(url, json=clean_param(params), headers=self.get_header())
-        return res.json()
+        res = self.session.patch(url, json=clean_param(params), headers=self.get_header())
+        attribute = res.json()
+        if isinstance(attribute, dict):
+            self._invalidate_notes(attribute.get('noteId'))
+        return attribute
 
     def delete_attribute(self, attributeId: str) -> bool:
         url = f'{self.server_url}/etapi/attributes/{attributeId}'
-        res = requests.delete(url, headers=self.get_header())
+        res = self.session.delete(url, headers=self.get_header())
+        if self.note_cache is not None:
+            self.note_cache.invalidate_where(
+                lambda note: any(
+                    x.get('attributeId') == attributeId for x in note.get('attributes', [])
+                )
+            )
         if res.status_code == 204:
             return True
         return False
 
     def refresh_note_ordering(self, parentNoteId: str) -> bool:
         url = f'{self.server_url}/etapi/refresh-note-ordering/{parentNoteId}'
-        res = requests.post(url, headers=self.get_header())
+        res = self.session.post(url, headers=self.get_header())
+        self._invalidate_notes(parentNoteId)
         if res.status_code == 204:
             return True
         return False
 
     def inbox(self, date: str) -> dict:
         url = f'{self.server_url}/etapi/inbox/{date}'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
     def get_calendar_days(self, date: str) -> dict:
         url = f'{self.server_url}/etapi/calendar/days/{date}'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
+    def get_day_note_id(self, date: str, refresh: bool = False) -> str:
+        """
+        note id of a day note, looked up once and then cached.
+        Trilium creates the day note if it doesn't exist yet.
+
+        :param date: date string in format of "%Y-%m-%d", e.g. "2022-02-25"
+        :param refresh: ignore the cached id, e.g. after the day note got deleted
+        :return:
+        """
+        noteId = None if refresh else self.day_note_ids.get(date)
+        if noteId is None:
+            noteId = self.get_calendar_days(date)['noteId']
+            self.day_note_ids.set(date, noteId)
+        return noteId
+
+    def _call_day_note(self, date: str, call: Callable[[str], tuple]) -> tuple:
+        """
+        Run `call(noteId)` on the day note of `date`. If it gets a 404, the cached day note
+        was deleted, so the day note is looked up (and created) again and `call` retried.
+
+        :param date: date string in format of "%Y-%m-%d"
+        :param call: returns (status code, result)
+        :return: (note id, result)
+        """
+        noteId = self.get_day_note_id(date)
+        status, result = call(noteId)
+        if status == 404:
+            noteId = self.get_day_note_id(date, refresh=True)
+            status, result = call(noteId)
+        return noteId, result
+
+    def prefetch_calendar(
+            self, start: str, end: str, create_missing: bool = False, max_workers: int = 8
+    ) -> dict[str, str]:
+        """
+        Resolve the day notes of a date range into the day note id cache, e.g. a month or a year,
+        so later day note reads and writes skip the calendar lookup.
+
+        Existing day notes are found with a single search on their `dateNote` label.
+        With `create_missing`, the other days are created through the calendar API in parallel.
+
+        :param start: first date, in format of "%Y-%m-%d"
+        :param end: last date, included
+        :param create_missing: create day notes which don't exist yet
+        :param max_workers: concurrent calendar requests for missing days
+        :return: date -> note id for every resolved day in the range
+        """
+        first = datetime.strptime(start, '%Y-%m-%d').date()
+        last = datetime.strptime(end, '%Y-%m-%d').date()
+        dates = [
+            (first + timedelta(days=i)).strftime('%Y-%m-%d')
+            for i in range((last - first).days + 1)
+        ]
+
+        resolved = {}
+        for date in dates:
+            noteId = self.day_note_ids.get(date)
+            if noteId is not None:
+                resolved[date] = noteId
+        missing = set(dates).difference(resolved)
+        if missing:
+            res = self.search_note(
+                f"#dateNote >= '{start}' #dateNote <= '{end}'", includeArchivedNotes=True
+            )
+            for note in res.get('results', []):
+                for attribute in note.get('attributes', []):
+                    if (
+                            attribute['type'] == 'label'
+                            and attribute['name'] == 'dateNote'
+                            and attribute['value'] in missing
+                    ):
+                        resolved[attribute['value']] = note['noteId']
+                        self.day_note_ids.set(attribute['value'], note['noteId'])
+            missing.difference_update(resolved)
+
+        if missing and create_missing:
+            missing_dates = sorted(missing)
+            with self.batch(max_workers=max_workers) as batch:
+                batch.map(self.get_day_note_id, missing_dates)
+            for date, noteId in zip(missing_dates, batch.results()):
+                if noteId is not None:
+                    resolved[date] = noteId
+            for i, e in batch.errors.items():
+                logger.error(f'failed to resolve day note {missing_dates[i]}: {e}')
+
+        return {x: resolved[x] for x in dates if x in resolved}
+
     def get_calendar_weeks(self, date: str):
         url = f'{self.server_url}/etapi/calendar/weeks/{date}'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
     def get_calendar_months(self, month: str) -> dict:
         url = f'{self.server_url}/etapi/calendar/months/{month}'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
     def get_calendar_years(self, year: str) -> dict:
         url = f'{self.server_url}/etapi/calendar/years/{year}'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
-    def export_note(self, noteId: str, format: str, save_path: str, chunk_size=128):
+    def export_note(
+            self,
+            noteId: str,
+            format: str,
+            save_path: str,
+            chunk_size: int = 1024 * 1024,
+            resume: bool = False,
+            progress: Optional[Callable[[int, int, float], None]] = None,
+    ) -> bool:
         """
         Export note by id. Please note that protected notes are not allowed to be exported by ETAPI.
 
+        The export is streamed into `save_path + '.part'`, which is renamed to `save_path`
+        only when the download is complete.
+
         :param noteId: note id
         :param format: format should be "html" or "markdown" or "md" for short
-        :save_path: path for exported file
-        :chunk_size: download chunk size, default to 128
-        :return:
+        :param save_path: path for exported file
+        :param chunk_size: download chunk size, default to 1 MiB
+        :param resume: keep the partial file of a failed download and continue it with a Range
+            request next time. The request carries the ETag or Last-Modified of the first
+            response in If-Range, so a changed export is downloaded again. A partial file
+            without such a validator, or a 206 not starting at its end, is discarded.
+        :param progress: called with (bytes written, total bytes or 0 if unknown, bytes per second)
+        :return: False if the server did not return the export
         """
         url = f'{self.server_url}/etapi/notes/{noteId}/export'
         if format in ['md', 'markdown']:
@@ -575,34 +862,237 @@ class ETAPI:
         params = {
             "format": format,
         }
-        r = requests.get(url, params=clean_param(params), headers=self.get_header())
+        part_path = f'{save_path}.part'
+        # ETag or Last-Modified of the response the partial file comes from
+        validator_path = f'{part_path}.validator'
+
+        def discard_part():
+            for path in (part_path, validator_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        offset = 0
+        validator = None
+        if resume and os.path.exists(part_path):
+            if os.path.exists(validator_path):
+                with open(validator_path, encoding='utf-8') as f:
+                    validator = f.read().strip()
+            if validator:
+                offset = os.path.getsize(part_path)
+            else:
+                # nothing tells whether the partial file is from the current export
+                discard_part()
+
+        headers = self.get_header()
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = validator
+        r = self.session.get(url, params=clean_param(params), headers=headers, stream=True)
         logger.info(r.status_code)
-        with open(save_path, 'wb') as fd:
-            for chunk in r.iter_content(chunk_size=chunk_size):
-                fd.write(chunk)
+        if r.status_code == 416 or (
+                r.status_code == 206
+                and not r.headers.get('Content-Range', '').startswith(f'bytes {offset}-')
+        ):
+            # the partial file does not match the export any more, start over
+            r.close()
+            discard_part()
+            return self.export_note(noteId, format, save_path, chunk_size, resume, progress)
+
+        with r:
+            if r.status_code == 206:
+                mode = 'ab'
+            elif r.status_code == 200:
+                # no range support, or the export changed since the partial file
+                mode = 'wb'
+                offset = 0
+                discard_part()
+                etag = r.headers.get('ETag', '')
+                # weak ETags are not allowed in If-Range
+                if etag.startswith('W/'):
+                    etag = ''
+                validator = etag or r.headers.get('Last-Modified')
+                if resume and validator:
+                    with open(validator_path, 'w', encoding='utf-8') as f:
+                        f.write(validator)
+            else:
+                return False
+
+            total = int(r.headers.get('Content-Length', 0))
+            if total:
+                total += offset
+            written = offset
+            started = time.monotonic()
+            try:
+                with open(part_path, mode) as fd:
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        fd.write(chunk)
+                        written += len(chunk)
+                        if progress:
+                            elapsed = time.monotonic() - started
+                            speed = (written - offset) / elapsed if elapsed > 0 else 0.0
+                            progress(written, total, speed)
+            except BaseException:
+                if not resume:
+                    discard_part()
+                raise
+
+        os.replace(part_path, save_path)
+        if os.path.exists(validator_path):
+            os.remove(validator_path)
         return True
 
-    def import_note(self, noteId: str, file_path: str):
+    def export_note_to_dir(
+            self,
+            noteId: str,
+            format: str,
+            out_dir: str,
+            include: ZipInclude = None,
+            chunk_size: int = 1024 * 1024,
+    ) -> Optional[list[str]]:
+        """
+        Export note by id and extract the zip into `out_dir` while it is downloaded,
+        no archive is written to disk.
+
+        :param noteId: note id
+        :param format: format should be "html" or "markdown" or "md" for short
+        :param out_dir: folder for the exported files, created if missing
+        :param include: glob patterns (e.g. ['*.md']) or a function of the path in the zip,
+            only matching files are extracted
+        :param chunk_size: download chunk size
+        :return: paths of the extracted files, None if the server did not return the export
+        """
+        url = f'{self.server_url}/etapi/notes/{noteId}/export'
+        if format in ['md', 'markdown']:
+            format = 'markdown'
+        else:
+            format = 'html'
+        params = {
+            "format": format,
+        }
+        with self.session.get(
+                url, params=clean_param(params), headers=self.get_header(), stream=True
+        ) as r:
+            logger.info(r.status_code)
+            if r.status_code != 200:
+                return None
+            return extract_zip_stream(
+                r.iter_content(chunk_size=chunk_size),
+                os.path.expanduser(out_dir),
+                include=include,
+                chunk_size=chunk_size,
+            )
+
+    def export_notes(
+            self,
+            note_ids: list[str],
+            format: str,
+            out_dir: str,
+            max_workers: int = 4,
+            retries: int = 2,
+            backoff: float = 1.0,
+            chunk_size: int = 1024 * 1024,
+    ) -> dict[str, dict]:
         """
-        import zip format note
+        Export many notes concurrently, each into `out_dir/{noteId}.zip`.
+
+        Downloads share the connection pool of the session, so keep `max_workers` within
+        `pool_maxsize`. A failed export is retried on its own, continuing the partial file
+        of the previous attempt if the server supports Range requests. A partial file left
+        by an earlier run is deleted, it is never resumed.
+
+        :param note_ids: note ids
+        :param format: format should be "html" or "markdown" or "md" for short
+        :param out_dir: folder for the exported zip files, created if missing
+        :param max_workers: concurrent downloads
+        :param retries: extra attempts for each failed export
+        :param backoff: seconds to wait before the first retry, doubled for each further retry
+        :param chunk_size: download chunk size
+        :return: report for each note id, like
+            {'path': ..., 'ok': True, 'size': 1024, 'duration': 0.5, 'attempts': 1, 'error': None}
+        """
+        out_dir = os.path.expanduser(out_dir)
+        os.makedirs(out_dir, exist_ok=True)
+
+        def export(note_id):
+            save_path = os.path.join(out_dir, f'{note_id}.zip')
+            report = {'path': save_path, 'ok': False, 'size': 0, 'duration': 0.0, 'error': None}
+            started = time.monotonic()
+            part_path = f'{save_path}.part'
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            for attempt in range(1, retries + 2):
+                report['attempts'] = attempt
+                if attempt > 1:
+                    time.sleep(backoff * 2 ** (attempt - 2))
+                try:
+                    if self.export_note(
+                            note_id, format, save_path, chunk_size=chunk_size, resume=True
+                    ):
+                        report['ok'] = True
+                        report['error'] = None
+                        report['size'] = os.path.getsize(save_path)
+                        break
+                    report['error'] = 'export failed'
+                except Exception as e:
+                    report['error'] = repr(e)
+                logger.warning(f'export {note_id} attempt {attempt} failed: {report["error"]}')
+            report['duration'] = time.monotonic() - started
+            return report
+
+        with self.batch(max_workers=max_workers) as batch:
+            batch.map(export, note_ids)
+        result = dict(zip(note_ids, batch.results(raise_errors=True)))
+
+        total_size = sum(x['size'] for x in result.values())
+        failed = [k for k, v in result.items() if not v['ok']]
+        logger.info(f'exported {len(note_ids) - len(failed)} notes, {total_size} bytes')
+        if failed:
+            logger.error(f'failed to export {failed}')
+        return result
+
+    def import_note(
+            self,
+            noteId: str,
+            file_path: str,
+            progress: Optional[Callable[[int, int, float], None]] = None,
+    ):
+        """
+        import zip format note, the zip is streamed from disk
+
+        :param noteId:
+        :param file_path:
+        :param progress: called with (bytes sent, total bytes, bytes per second) during the upload
+        :return:
         """
         url = f'{self.server_url}/etapi/notes/{noteId}/import'
-        file_data = open(file_path, 'rb').read()
-        res = requests.post(
-            url,
-            data=file_data,
-            headers={
-                'content-type': 'application/octet-stream',
-                'Content-Transfer-Encoding': 'binary',
-                'Authorization': self.token,
-            },
-        )
+        res = self._send_binary('post', url, file_path, progress=progress)
         logger.info(res)
+        self._invalidate_notes(noteId)
         if res.status_code == 201:
             return True
         else:
             return False
 
+    def _send_binary(
+            self,
+            method: str,
+            url: str,
+            data_source: Union[str, bytes, BinaryIO],
+            progress: Optional[Callable[[int, int, float], None]] = None,
+    ) -> requests.Response:
+        """
+        send raw binary content, file paths and file objects are streamed in chunks
+        """
+        headers = {
+            'content-type': 'application/octet-stream',
+            'Content-Transfer-Encoding': 'binary',
+            'Authorization': self.token,
+        }
+        if isinstance(data_source, (bytes, bytearray)):
+            return self.session.request(method, url, data=data_source, headers=headers)
+        with FileReader(data_source, progress=progress) as reader:
+            return self.session.request(method, url, data=reader, headers=headers)
+
     def save_revision(self, noteId: str):
         """
         force save note revision
@@ -611,7 +1101,7 @@ class ETAPI:
         """
 
         url = f'{self.server_url}/etapi/notes/{noteId}/revision'
-        res = requests.post(url, headers=self.get_header())
+        res = self.session.post(url, headers=self.get_header())
         if res.status_code == 204:
             return True
         return False
@@ -638,10 +1128,7 @@ class ETAPI:
         :param date: date string in format of "%Y-%m-%d", e.g. "2022-02-25"
         :return:
         """
-        url = f'{self.server_url}/etapi/calendar/days/{date}'
-        res = requests.get(url, headers=self.get_header())
-        noteId = res.json()['noteId']
-        content = self.get_note_content(noteId)
+        _, content = self._call_day_note(date, self._get_note_content)
         return content
 
     def set_day_note(self, date, content):
@@ -651,34 +1138,30 @@ class ETAPI:
         :param content: note content
         :return:
         """
-        url = f'{self.server_url}/etapi/calendar/days/{date}'
-        res = requests.get(url, headers=self.get_header())
-        noteId = res.json()['noteId']
-        return self.update_note_content(noteId, content)
+
+        def update(noteId):
+            status = self._update_note_content(noteId, content)
+            return status, status == 204
+
+        _, res = self._call_day_note(date, update)
+        return res
+
+    def todo_session(self, date: Optional[str] = None) -> 'TodoSession':
+        """
+        Edit the todo list of a day note with one read and one write, see `TodoSession`.
+
+        :param date: date string in format of "%Y-%m-%d", default to today
+        :return:
+        """
+        return TodoSession(self, date or get_today())
 
     def get_todo(self) -> list[list[Union[bool, str]]]:
         """get today's todo list.
 
         :return: list of todo items, each item is a list of [status, description]
         """
-        content = self.get_today_note_content()
-        soup = BeautifulSoup(content, 'html.parser')
-        try:
-            todo_labels = soup.find_all("label", {"class": "todo-list__label"})
-            todo_list: list[list[Union[bool, str]]] = []
-            for x in todo_labels:
-                description = x.text.strip()
-                checked = x.find("input").get("checked")
-                if checked:
-                    status = True
-                else:
-                    status = False
-                todo_list.append([status, description])
-        finally:
-            # free mem
-            soup.decompose()
-            del soup
-        return todo_list
+        with self.todo_session() as todos:
+            return todos.items
 
     def todo_check(self, todo_index: int, check: bool = True) -> bool:
         """check/uncheck a todo item by index.
@@ -687,25 +1170,10 @@ class ETAPI:
         :param check: True to check, False to uncheck
         :return: True if success, False if failed
         """
-        content = self.get_today_note_content()
-        soup = BeautifulSoup(content, 'html.parser')
-        todo_labels = soup.find_all("label", {"class": "todo-list__label"})
-        try:
-            label = todo_labels[todo_index]
-            check_input = label.find("input")
-            if check:
-                check_input['checked'] = 'checked'
-            else:
-                del check_input['checked']
-
-            new_content = str(soup)
-            return self.set_today_note_content(new_content)
-        except IndexError:
-            return False
-        finally:
-            # free mem
-            soup.decompose()
-            del soup
+        with self.todo_session() as todos:
+            if not todos.check(todo_index, check):
+                return False
+            return todos.commit()
 
     def todo_uncheck(self, todo_index: int) -> bool:
         """uncheck a todo item by index.
@@ -725,51 +1193,13 @@ class ETAPI:
         :param date: date string in format of "%Y-%m-%d", e.g. "2022-02-25"
         :return: True if success, False if failed
         """
-        todo_description = todo_description.strip()
-        soup: Optional[BeautifulSoup] = None
         try:
-            if not date:
-                date = get_today()
-            content = self.get_day_note(date)
-            soup = BeautifulSoup(content, 'html.parser')
-            todo_labels = soup.find_all("label", {"class": "todo-list__label"})
-            # append todo item after last todo item
-            # special case 1: no todo available, add it to the beginning of document
-            # special case 2: if last todo item is empty, update it
-
-            if "todo-list__label" in todo_description:
-                todo_item_html = f'''<li>{todo_description}</li>'''
-            else:
-                todo_item_html = ItemTemplate(todo_description).substitute()
-
-            if not todo_labels:
-                logger.info('new empty page')
-                todo_item_html = ListTemplate(todo_caption).substitute(items=todo_item_html)
-                todo_item = BeautifulSoup(todo_item_html, 'html.parser')
-                soup.insert(0, todo_item)
-            else:
-                last_todo_label = todo_labels[-1]
-                if not last_todo_label.text.strip():
-                    # replace last empty todo item
-                    todo_item = BeautifulSoup(todo_item_html, 'html.parser')
-                    todo_list_label = soup.find_all("ul", {"class": "todo-list"})[0]
-                    empty_li = todo_list_label.find_all("li")[-1]
-                    empty_li.replace_with(todo_item)
-                else:
-                    # if todo item list exists, append to the end
-                    todo_item = BeautifulSoup(todo_item_html, 'html.parser')
-                    todo_list_label = soup.find_all("ul", {"class": "todo-list"})[0]
-                    todo_list_label.append(todo_item)
-            new_content = str(soup)
-            return self.set_day_note(date, new_content)
+            with self.todo_session(date) as todos:
+                todos.add(todo_description, todo_caption)
+                return todos.commit()
         except Exception as e:
             logger.info(e)
             return False
-        finally:
-            # free mem
-            if soup:
-                soup.decompose()
-                del soup
 
     def update_todo(self, todo_index: int, todo_description: str) -> bool:
         """update a todo item by index.
@@ -777,23 +1207,10 @@ class ETAPI:
         :param todo_index: index starts from 0
         :param todo_description: new todo item
         :return: True if success, False if failed"""
-        todo_description = todo_description.strip()
-
-        content = self.get_today_note_content()
-        soup = BeautifulSoup(content, 'html.parser')
-        todo_labels = soup.find_all("label", {"class": "todo-list__label"})
-        try:
-            todo_label = todo_labels[todo_index]
-            target_span = todo_label.find_next("span", {"class": "todo-list__label__description"})
-            target_span.string = todo_description
-            new_content = str(soup)
-            return self.set_today_note_content(new_content)
-        except IndexError:
-            return False
-        finally:
-            # free mem
-            soup.decompose()
-            del soup
+        with self.todo_session() as todos:
+            if not todos.update(todo_index, todo_description):
+                return False
+            return todos.commit()
 
     def delete_todo(self, todo_index: int) -> bool:
         """delete a todo item by index.
@@ -820,23 +1237,10 @@ class ETAPI:
         :param todo_index: index starts from 0
         :return: True if success, False if failed
         """
-        content = self.get_day_note(date)
-
-        soup = BeautifulSoup(content, 'html.parser')
-        todo_labels = soup.find_all("label", {"class": "todo-list__label"})
-        try:
-            todo_label = todo_labels[todo_index]
-            # decompose parent <li> tag
-            todo_label.parent.decompose()
-
-            new_content = str(soup)
-            return self.set_day_note(date, new_content)
-        except IndexError:
-            return False
-        finally:
-            # free mem
-            soup.decompose()
-            del soup
+        with self.todo_session(date) as todos:
+            if not todos.delete(todo_index):
+                return False
+            return todos.commit()
 
     def get_yesterday_unfinished_todo(self) -> list[list[Union[bool, str]]]:
         """get yesterday's unfinished todo list.
@@ -844,54 +1248,35 @@ class ETAPI:
         :return: list of todo items, each item is a list of [status, description]
         """
         content = self.get_yesterday_note_content()
-
-        unfinished_todo_list = []
-        soup = BeautifulSoup(content, 'html.parser')
-        try:
-            todo_labels = soup.find_all("label", {"class": "todo-list__label"})
-            for x in todo_labels:
-                checked = x.find("input").get("checked")
-                if not checked:
-                    description = x.text.strip()
-                    unfinished_todo_list.append([False, description])
-        finally:
-            # free mem
-            soup.decompose()
-            del soup
-        return unfinished_todo_list
+        return [[False, x['description']] for x in scan_todos(content) if not x['checked']]
 
     def move_yesterday_unfinished_todo_to_today(self) -> None:
-        """move yesterday's unfinished todo list to today's note."""
-        content = self.get_yesterday_note_content()
-        soup = BeautifulSoup(content, 'html.parser')
-        try:
-            todo_labels = soup.find_all("label", {"class": "todo-list__label"})
-            todo_indexes = []
-            todo_descriptions = []
-            for i, x in enumerate(todo_labels):
-                checked = x.find("input").get("checked")
-                if not checked:
-                    description = x.text.strip()
-                    if not description:
-                        # skip empty todos
-                        continue
-                    todo_indexes.append(i)
-                    # keep the internal link, text format or what so ever, avoid lost valuable info
-                    todo_descriptions.append(str(x))
+        """move yesterday's unfinished todo list to today's note.
 
-            if not todo_descriptions:
+        Both notes are read once and written once, today's note is written first,
+        so a failure can't lose todo items.
+        """
+        with self.todo_session(get_yesterday()) as yesterday:
+            # skip empty todos
+            todo_indexes = [
+                i for i, x in enumerate(yesterday.todos()) if not x['checked'] and x['description']
+            ]
+            if not todo_indexes:
                 return
 
-            # add todos to today
-            for description in todo_descriptions:
-                self.add_todo(description)
+            with self.todo_session(get_today()) as today:
+                # add todos to today
+                for i in todo_indexes:
+                    # keep the internal link, text format or what so ever, avoid lost valuable info
+                    today.add(yesterday.todos()[i]['html'])
+                if not today.commit():
+                    # keep them in yesterday's note
+                    logger.error(f"failed to add yesterday's todos to {today.date}")
+                    return
 
             # remove todos from yesterday
-            for i in reversed(sorted(todo_indexes)):
-                self.delete_yesterday_todo(i)
-        finally:
-            soup.decompose()
-            del soup
+            yesterday.delete_many(todo_indexes)
+            yesterday.commit()
 
     def add_periodic_todos(self, periodic_todos):
         today = datetime.today().date()
@@ -957,252 +1342,242 @@ class ETAPI:
         return
 
     def upload_md_file(
-            self, file: str, 
-            parentNoteId: str, 
-            parse_math: bool = True, 
+            self, file: str,
+            parentNoteId: str,
+            parse_math: bool = True,
             image_and_file_as_attachments: bool = True,
             hasFrontMatter: bool = False,
-            cleanText: bool = False
+            cleanText: bool = False,
+            notePosition: Optional[int] = None,
+            noteId: Optional[str] = None,
     ):
-        md_file = os.path.abspath(file).replace('\\', '/').replace('//', '/')
-        md_full_name = os.path.basename(md_file)
-        md_name = md_full_name[:-3]
-        md_folder = os.path.dirname(md_file)
-        logger.info(md_file)
-        # logger.info(md_name)
-        # logger.info(md_folder)
-
-        # convert md to html
-        with open(md_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-            utcDateCreated = None
-            dateCreated = None
-            
-            if hasFrontMatter:
-                
-                # Extract and strip FrontMatter (delimited by leading ---)
-                frontmatter_match = re.match(r'^---\n(.*?)\n---\n', content, re.DOTALL)
-                if frontmatter_match:
-                    frontmatter = frontmatter_match.group(1)
-                    content = content[frontmatter_match.end():]
-
-                    # Extract the 'created' key from FrontMatter
-                    created_match = re.search(r'^created:\s*(.+)$', frontmatter, re.MULTILINE)
-                    if created_match:
-                        created_raw = created_match.group(1).strip()
-                        # Normalise to millisecond precision: "YYYY-MM-DD HH:MM:SS.mmmZ"
-                        # Input may be "YYYY-MM-DD HH:MM:SSZ" (no millis) or already have them
-                        ts_match = re.match(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(\.\d+)?(Z?)$', created_raw)
-                        if ts_match:
-                            base, millis, tz = ts_match.groups()
-                            millis = (millis or '.000')[:4].ljust(4, '0')  # ensure exactly .mmm
-                            utcDateCreated = f"{base}{millis}Z"
-                            
-                            # Convert to local timezone
-                            dt_utc = datetime.strptime(f"{base}{millis}", "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=timezone.utc)
-                            local_tz = tzlocal()
-                            dt_local = dt_utc.astimezone(local_tz)
-                            utc_offset = dt_local.strftime("%z")  # e.g. "+0900"
-                            dateCreated = dt_local.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt_local.microsecond // 1000:03d}{utc_offset}"
-
-            # fix logseq image size format
-            logseq_image_pat = r'(\!\[.*\]\(.*\))\{.*?:height.*width.*}'
-            content = re.sub(logseq_image_pat, r'\1', content)
-
-            # Check if we should parse math formulas
-            if not parse_math or not re.search(re.escape("$"), content):
-                # extra format support
-                # https://github.com/trentm/python-markdown2/wiki/Extras
-                html = markdown2.markdown(
-                    content,
-                    extras=['fenced-code-blocks', 'strike', 'tables', 'task_list', 'code-friendly'],
-                )
-                
-                if cleanText:
-                    html = beautify_content(html)
-                
-                # logger.info(html)
-            else:
-                # Parse math formulas
-                no_latex_part, latex_code_part = sanitizeInput(content)
-                html = reconstructMath(
-                    markdown2.markdown(
-                        no_latex_part,
-                        extras=['fenced-code-blocks', 'strike', 'tables', 'task_list'],
-                    ),
-                    list(
-                        map(
-                            lambda x: x.replace("<", " \\lt ").replace(">", " \\gt "),
-                            latex_code_part,
-                        )
-                    ),
-                )
+        """
+        Upload a markdown file with its images and linked files.
+
+        The note is created first, then images and files are uploaded concurrently and
+        the note content is updated once with all their urls.
+
+        :param file: markdown file path
+        :param parentNoteId:
+        :param parse_math: parse latex math formulas
+        :param image_and_file_as_attachments: upload images and files as attachments instead of sub notes
+        :param hasFrontMatter: strip front matter and use its `created` date
+        :param cleanText: beautify the generated html
+        :param notePosition:
+        :param noteId: fixed note id, an existing note with this id is updated
+        :return:
+        """
+        rendered = render_md_file(
+            file, parse_math=parse_math, hasFrontMatter=hasFrontMatter, cleanText=cleanText
+        )
+        res, _ = self._upload_rendered_md(
+            rendered,
+            parentNoteId=parentNoteId,
+            image_and_file_as_attachments=image_and_file_as_attachments,
+            notePosition=notePosition,
+            noteId=noteId,
+        )
+        return res
+
+    def _upload_rendered_md(
+            self,
+            rendered: dict,
+            parentNoteId: str,
+            image_and_file_as_attachments: bool = True,
+            notePosition: Optional[int] = None,
+            noteId: Optional[str] = None,
+            asset_workers: int = 4,
+            asset_index: Optional[AssetIndex] = None,
+            on_asset: Optional[Callable[[dict], None]] = None,
+    ):
+        """
+        Create the note of a markdown file rendered by `render_md_file`,
+        then upload the images and files it links to.
+
+        Assets are uploaded concurrently and all their urls are rewritten in one pass,
+        so the note content is written at most once after the note is created.
+        `on_asset` is called with each uploaded asset right after it is created.
+
+        :return: (create_note response, list of uploaded assets like {'type': 'attachment', 'id': ...})
+        """
+        md_name = rendered['md_name']
+        md_folder = rendered['md_folder']
+        html = rendered['html']
+        dateCreated = rendered['dateCreated']
         note_id = ''
 
-        # detect images
-        # https://github.com/Nriver/trilium-py/issues/36
-        pat = '<img (.*?)>'
-        images = re.findall(pat, html)
+        image_assets, file_assets = find_md_assets(html, md_folder)
 
         current_note_res = self.create_note(
             parentNoteId=parentNoteId,
             title=md_name,
             type="text",
             content=html,
+            notePosition=notePosition,
+            noteId=noteId,
             dateCreated=dateCreated
         )
         note_id = current_note_res['note']['noteId']
         # logger.info(note_id)
 
-        if images:
-            # images require manually upload and url need to be replaced
-            logger.info('found images:')
-            logger.info(images)
-
-            # process images
-            for match in images:
-                # extract image url and name
-                image_names = re.findall('alt="(.*?)"', match)
-                image_paths = re.findall('src="(.*?)"', match)
-
-                if not image_paths:
-                    continue
-                image_path = image_paths[0]
-                if not image_names:
-                    image_name = ''
-                else:
-                    image_name = image_names[0]
-
-                # absolute path
-                if image_path.startswith('http'):
-                    # skip online images
-                    continue
-
-                # fix vnote image with special size format
-                if ' ' in image_path and image_path.endswith('x'):
-                    image_path = image_path.split(' ')[0]
-
-                image_file_path = os.path.join(md_folder, image_path).replace('\\', '/')
-                # unquote path, in case the url is quoted
-                image_file_path_unquote = urllib.parse.unquote(image_file_path)
-
-                # skip if path does not point to a valid file
-                if os.path.isdir(image_file_path) or os.path.isdir(image_file_path_unquote):
-                    continue
-
-                # try both raw path and unquoted path
-                if not os.path.exists(image_file_path):
-                    if not os.path.exists(image_file_path_unquote):
-                        # image file not exist, ignore it
-                        continue
-                    image_file_path = image_file_path_unquote
+        if not image_assets and not file_assets:
+            return current_note_res, []
+
+        with self.batch(max_workers=asset_workers) as batch:
+            for image_file_path, image_name in image_assets.values():
+                batch.submit(
+                    self._upload_md_image,
+                    note_id,
+                    image_file_path,
+                    image_name,
+                    image_and_file_as_attachments,
+                    asset_index,
+                    on_asset,
+                )
+            for file_path, link_name in file_assets.values():
+                batch.submit(
+                    self._upload_md_linked_file,
+                    note_id,
+                    file_path,
+                    link_name,
+                    image_and_file_as_attachments,
+                    asset_index,
+                    on_asset,
+                )
 
-                if not image_name:
-                    # if image name is not specified, use file name
-                    image_name = os.path.basename(image_path)
+        asset_paths = [*image_assets, *file_assets]
+        replacements = {}
+        uploaded_assets = []
+        for path, result in zip(asset_paths, batch.results()):
+            if result:
+                replacements[path], asset = result
+                if asset:
+                    uploaded_assets.append(asset)
+        errors = batch.errors
+        for i, e in errors.items():
+            logger.error(f'failed to upload {asset_paths[i]}: {e}')
+
+        # replace all asset urls in one pass, then write the note content once
+        if replacements:
+            html = replace_asset_paths(html, replacements)
+            self.update_note_content(note_id, html)
+
+        if errors:
+            raise next(iter(errors.values()))
+        return current_note_res, uploaded_assets
+
+    def _upload_md_image(
+            self,
+            note_id: str,
+            image_file_path: str,
+            image_name: str,
+            as_attachment: bool,
+            asset_index: Optional[AssetIndex] = None,
+            on_asset: Optional[Callable[[dict], None]] = None,
+    ) -> tuple[str, Optional[dict]]:
+        """
+        upload an image used by a markdown note
 
-                if image_and_file_as_attachments:
-                    res = self.create_attachment(
-                        ownerId=note_id,
-                        file_path=image_file_path,
-                        title=image_name,
-                        role='image',
-                    )
-                    image_note_id = res['attachmentId']
-                    image_url = f"api/attachments/{image_note_id}/image/{urllib.parse.quote(res['title'], safe='')}"
-                    logger.info(image_url)
-                else:
-                    res = self.create_image_note(
-                        parentNoteId=note_id,
-                        title=image_name,
-                        image_file=image_file_path,
-                    )
-                    # logger.info(res)
-                    image_note_id = res['note']['noteId']
-                    # fix path with `/` in it, the param should be quoted.
-                    # e.g. relative url from obsidian
-                    image_url = (
-                        f"api/images/{image_note_id}/"
-                        f"{urllib.parse.quote(res['note']['title'], safe='')}"
-                    )
-                    logger.info(image_url)
-
-                html = html.replace(image_path, image_url)
-
-                # add relation for image
-                self.create_attribute(
-                    attributeId=None,
-                    noteId=note_id,
-                    type='relation',
-                    name='imageLink',
-                    value=image_note_id,
-                    isInheritable=False,
+        :param asset_index: reuse image notes with the same content, cache file contents
+        :param on_asset: called with the uploaded asset as soon as it is created
+        :return: (url to put in the note content, uploaded asset or None if an upload was reused)
+        """
+        if as_attachment:
+            res = self.create_attachment(
+                ownerId=note_id,
+                file_path=image_file_path,
+                title=image_name,
+                role='image',
+                data=asset_index.read(image_file_path) if asset_index else None,
+            )
+            image_note_id = res['attachmentId']
+            image_url = f"api/attachments/{image_note_id}/image/{urllib.parse.quote(res['title'], safe='')}"
+            asset = {'type': 'attachment', 'id': image_note_id}
+        else:
+            def upload():
+                res = self.create_image_note(
+                    parentNoteId=note_id,
+                    title=image_name,
+                    image_file=image_file_path,
+                )
+                image_note_id = res['note']['noteId']
+                # fix path with `/` in it, the param should be quoted.
+                # e.g. relative url from obsidian
+                image_url = (
+                    f"api/images/{image_note_id}/"
+                    f"{urllib.parse.quote(res['note']['title'], safe='')}"
                 )
+                return {'type': 'note', 'id': image_note_id, 'url': image_url}
 
-            # replace note content
-            res = self.update_note_content(note_id, html)
-            # logger.info(res)
-
-        # detect files
-        pat = '<a href="(.*?)">(.*)</a>'
-        a_links = re.findall(pat, html)
-        logger.info(a_links)
-        for link, link_name in a_links:
-            # fix file path
-            file_path = ''
-            if link.startswith(('http:', 'https:')):
-                # skip online link
-                continue
-            if os.path.exists(link):
-                # absolute file path
-                file_path = link
+            if asset_index:
+                record, reused = asset_index.get_or_upload(image_file_path, 'image', upload)
             else:
-                file_path = os.path.join(md_folder, link).replace('\\', '/')
-                # unquote path, in case the url is quoted
-                file_path_unquote = urllib.parse.unquote(file_path)
-
-                # skip if path does not point to a valid file
-                if os.path.isdir(file_path) or os.path.isdir(file_path_unquote):
-                    continue
-
-                # try both raw path and unquoted path
-                if os.path.exists(file_path_unquote):
-                    file_path = file_path_unquote
-
-            # upload file
-            if os.path.exists(file_path):
-                logger.info(file_path)
-
-                if image_and_file_as_attachments:
-                    res = self.create_attachment(
-                        ownerId=note_id,
-                        file_path=file_path,
-                        title=link_name,
-                        role='file',
-                    )
-                    file_attachment_id = res['attachmentId']
-                    file_url = f"#root/{note_id}?viewMode=attachments&amp;attachmentId={file_attachment_id}"
-                    logger.info(file_url)
-                else:
-                    res = self.create_file_note(
-                        parentNoteId=note_id,
-                        title=link_name,
-                        file_path=file_path,
-                    )
-
-                    # update file link
-                    file_note_id = res['note']['noteId']
-                    # fix path with `/` in it, the param should be quoted.
-                    # e.g. relative url from obsidian
-                    file_url = f"#root/{note_id}/{file_note_id}"
+                record, reused = upload(), False
+            image_note_id = record['id']
+            image_url = record['url']
+            asset = None if reused else {'type': 'note', 'id': image_note_id}
+        if asset and on_asset:
+            on_asset(asset)
+        logger.info(image_url)
+
+        # add relation for image
+        self.create_attribute(
+            attributeId=None,
+            noteId=note_id,
+            type='relation',
+            name='imageLink',
+            value=image_note_id,
+            isInheritable=False,
+        )
+        return image_url, asset
 
-                html = html.replace(link, file_url)
+    def _upload_md_linked_file(
+            self,
+            note_id: str,
+            file_path: str,
+            link_name: str,
+            as_attachment: bool,
+            asset_index: Optional[AssetIndex] = None,
+            on_asset: Optional[Callable[[dict], None]] = None,
+    ) -> tuple[str, Optional[dict]]:
+        """
+        upload a file linked by a markdown note
 
-            # replace note content
-            res = self.update_note_content(note_id, html)
+        :param asset_index: reuse file notes with the same content, cache file contents
+        :param on_asset: called with the uploaded asset as soon as it is created
+        :return: (url to put in the note content, uploaded asset or None if an upload was reused)
+        """
+        if as_attachment:
+            res = self.create_attachment(
+                ownerId=note_id,
+                file_path=file_path,
+                title=link_name,
+                role='file',
+                data=asset_index.read(file_path) if asset_index else None,
+            )
+            file_attachment_id = res['attachmentId']
+            file_url = f"#root/{note_id}?viewMode=attachments&amp;attachmentId={file_attachment_id}"
+            asset = {'type': 'attachment', 'id': file_attachment_id}
+        else:
+            def upload():
+                res = self.create_file_note(
+                    parentNoteId=note_id,
+                    title=link_name,
+                    file_path=file_path,
+                )
+                file_note_id = res['note']['noteId']
+                return {'type': 'note', 'id': file_note_id, 'url': f"#root/{note_id}/{file_note_id}"}
 
-        return current_note_res
+            if asset_index:
+                record, reused = asset_index.get_or_upload(file_path, 'file', upload)
+            else:
+                record, reused = upload(), False
+            file_url = record['url']
+            asset = None if reused else {'type': 'note', 'id': record['id']}
+        if asset and on_asset:
+            on_asset(asset)
+        logger.info(file_url)
+        return file_url, asset
 
     def upload_md_folder(
             self,
@@ -1213,12 +1588,74 @@ class ETAPI:
             ignoreFile: Optional[list[str]] = None,
             parse_math: bool = True,
             hasFrontMatter: Optional[bool] = False,
-            cleanText: Optional[bool] = False
+            cleanText: Optional[bool] = False,
+            render_workers: int = 0,
+            upload_workers: int = 0,
+            manifest_path: Optional[str] = None,
+            image_and_file_as_attachments: bool = True,
+            dedup_assets: bool = True,
+            strategy: Literal['api', 'zip'] = 'api',
+            zip_path: Optional[str] = None,
     ):
+        """
+        Upload all markdown files in a folder, sub folders become notes too.
+
+        By default files are processed one after another. Set `render_workers` and/or
+        `upload_workers` to run a pipeline instead: markdown to html conversion runs in a
+        process pool, note/attachment/attribute uploads run in a thread pool. The note order
+        is kept by setting `notePosition` explicitly.
+
+        With `manifest_path`, every uploaded file and folder is recorded in a local SQLite file
+        together with its content hash and note id. Running the upload again skips unchanged files,
+        updates changed files in place and resumes an interrupted run without creating duplicates.
+
+        With `dedup_assets`, images and files are indexed by content hash. When they are uploaded
+        as notes, identical files referenced from many markdown files are uploaded once and reused
+        (across runs too if a manifest is used). Attachments can't be shared between notes,
+        but each file is still read from disk only once.
+
+        With `strategy='zip'`, all files are rendered into a Trilium import archive on disk,
+        which is then uploaded with a single `import_note` request. Note creation dates from
+        front matter can't be set this way, and `manifest_path` is not supported.
+
+        :param parentNoteId:
+        :param mdFolder:
+        :param includePattern:
+        :param ignoreFolder:
+        :param ignoreFile:
+        :param parse_math:
+        :param hasFrontMatter:
+        :param cleanText:
+        :param render_workers: processes for markdown rendering, 0 renders in the upload threads
+        :param upload_workers: threads for uploads
+        :param manifest_path: SQLite file recording uploaded files, for incremental uploads
+        :param image_and_file_as_attachments: upload images and files as attachments instead of sub notes
+        :param dedup_assets: upload images and files with the same content only once
+        :param strategy: `api` creates every note with its own requests, `zip` imports one archive
+        :param zip_path: where to write the archive for the zip strategy, a temporary file by default
+        :return:
+        """
         includePattern = includePattern or ['.md']
         ignoreFolder = ignoreFolder or []
         ignoreFile = ignoreFile or []
 
+        if strategy == 'zip':
+            if manifest_path:
+                raise ValueError('manifest_path is not supported by the zip strategy')
+            return self._upload_md_folder_zip(
+                parentNoteId,
+                mdFolder,
+                includePattern,
+                ignoreFolder,
+                ignoreFile,
+                parse_math=parse_math,
+                hasFrontMatter=hasFrontMatter,
+                cleanText=cleanText,
+                render_workers=render_workers,
+                image_and_file_as_attachments=image_and_file_as_attachments,
+                zip_path=zip_path,
+            )
+
         # note tree
         # record for noteId
         note_tree = {'.': parentNoteId}
@@ -1226,50 +1663,192 @@ class ETAPI:
 
         mdFolder = os.path.expandvars(os.path.expanduser(mdFolder))
 
-        error_files = {}
-        for root, dirs, files in os.walk(mdFolder, topdown=True):
-            root_folder_name = os.path.basename(root)
+        manifest = UploadManifest(os.path.expanduser(manifest_path)) if manifest_path else None
+        skipped_files = []
+        asset_index = None
+        if dedup_assets:
+            asset_index = AssetIndex(manifest.path if manifest else None)
+
+        pipeline = render_workers > 0 or upload_workers > 0
+        render_pool = None
+        upload_pool = None
+        upload_futures = {}
+        if pipeline:
+            if render_workers > 0:
+                render_pool = ProcessPoolExecutor(max_workers=render_workers)
+            upload_pool = ThreadPoolExecutor(max_workers=max(upload_workers, 1))
+            # limit rendered files waiting for upload, so memory does not grow with the folder
+            window = threading.BoundedSemaphore((render_workers + upload_workers) * 4)
+
+        def upload_file(file_path, parent_note_id, note_position, render_future, entry):
+            if render_future:
+                rendered = render_future.result()
+            else:
+                rendered = render_md_file(
+                    file_path,
+                    parse_math=parse_math,
+                    hasFrontMatter=hasFrontMatter,
+                    cleanText=cleanText,
+                )
 
-            rel_path = os.path.relpath(root, start=mdFolder)
-            if any(x in rel_path for x in ignoreFolder):
-                continue
+            note_id = None
+            if manifest:
+                previous = manifest.get(entry['rel_path'])
+                if previous:
+                    # update the note in place, drop assets of the previous upload
+                    note_id = previous['note_id']
+                    self._delete_md_assets(note_id, previous['assets'], asset_index)
+                else:
+                    note_id = generate_note_id()
+                manifest.start(
+                    entry['rel_path'], 'file', note_id, parent_note_id, entry['content_hash']
+                )
 
-            logger.info('==============')
-            logger.info(f'root {root}')
-            logger.info(f'root_folder_name {root_folder_name}')
-            logger.info(f'rel_path {rel_path}')
+            res, assets = self._upload_rendered_md(
+                rendered,
+                parentNoteId=parent_note_id,
+                image_and_file_as_attachments=image_and_file_as_attachments,
+                notePosition=note_position,
+                noteId=note_id,
+                asset_index=asset_index,
+                on_asset=(lambda x: manifest.add_asset(entry['rel_path'], x)) if manifest else None,
+            )
+            if manifest:
+                manifest.finish(entry['rel_path'], assets)
+            return res
 
-            current_parent_note_id = note_tree[rel_path]
+        def upload_task(*args):
+            try:
+                return upload_file(*args)
+            finally:
+                window.release()
 
-            logger.info('files')
-            for name in natsort.natsorted(files):
-                # only include markdown files
-                if any(x == name for x in ignoreFile):
+        error_files = {}
+        try:
+            for root, dirs, files in os.walk(mdFolder, topdown=True):
+                root_folder_name = os.path.basename(root)
+
+                rel_path = os.path.relpath(root, start=mdFolder)
+                if any(x in rel_path for x in ignoreFolder):
                     continue
 
-                if any(x in name for x in includePattern):
-                    file_path = os.path.join(root, name)
-                    logger.info(file_path)
-                    try:
-                        self.upload_md_file(file=file_path, parentNoteId=current_parent_note_id, parse_math=parse_math, hasFrontMatter=hasFrontMatter, cleanText=cleanText)
-                    except Exception as e:
-                        error_files[os.path.abspath(file_path)] = e
+                logger.info('==============')
+                logger.info(f'root {root}')
+                logger.info(f'root_folder_name {root_folder_name}')
+                logger.info(f'rel_path {rel_path}')
 
-            logger.info('dirs')
-            for name in natsort.natsorted(dirs):
-                if all(x not in name for x in ignoreFolder):
-                    dir_path = os.path.join(root, name)
-                    logger.info(dir_path)
-                    rel_path = os.path.relpath(dir_path, start=mdFolder)
-                    logger.info(rel_path)
-                    res = self.create_note(
-                        parentNoteId=current_parent_note_id,
-                        title=name,
-                        type="text",
-                        content=name,
-                    )
-                    res['note']['noteId']
-                    note_tree[rel_path] = res['note']['noteId']
+                current_parent_note_id = note_tree[rel_path]
+                # explicit positions keep the natsorted order when notes are created concurrently
+                note_position = 0
+
+                logger.info('files')
+                for name in natsort.natsorted(files):
+                    # only include markdown files
+                    if any(x == name for x in ignoreFile):
+                        continue
+
+                    if any(x in name for x in includePattern):
+                        file_path = os.path.join(root, name)
+                        logger.info(file_path)
+                        if pipeline:
+                            note_position += 10
+
+                        entry = None
+                        if manifest:
+                            manifest_key = os.path.relpath(file_path, start=mdFolder)
+                            entry = {
+                                'rel_path': manifest_key.replace('\\', '/'),
+                                'content_hash': hash_file(file_path),
+                            }
+                            previous = manifest.get(entry['rel_path'])
+                            if (
+                                    previous
+                                    and previous['status'] == 'done'
+                                    and previous['content_hash'] == entry['content_hash']
+                            ):
+                                logger.info('unchanged, skip')
+                                skipped_files.append(file_path)
+                                continue
+
+                        if pipeline:
+                            window.acquire()
+                            render_future = None
+                            if render_pool:
+                                render_future = render_pool.submit(
+                                    render_md_file, file_path, parse_math, hasFrontMatter, cleanText
+                                )
+                            future = upload_pool.submit(
+                                upload_task,
+                                file_path,
+                                current_parent_note_id,
+                                note_position,
+                                render_future,
+                                entry,
+                            )
+                            upload_futures[future] = file_path
+                            continue
+                        try:
+                            upload_file(file_path, current_parent_note_id, None, None, entry)
+                        except Exception as e:
+                            error_files[os.path.abspath(file_path)] = e
+
+                logger.info('dirs')
+                for name in natsort.natsorted(dirs):
+                    if all(x not in name for x in ignoreFolder):
+                        dir_path = os.path.join(root, name)
+                        logger.info(dir_path)
+                        rel_path = os.path.relpath(dir_path, start=mdFolder)
+                        logger.info(rel_path)
+                        if pipeline:
+                            note_position += 10
+
+                        folder_note_id = None
+                        if manifest:
+                            manifest_key = rel_path.replace('\\', '/')
+                            previous = manifest.get(manifest_key)
+                            if previous and previous['status'] == 'done':
+                                note_tree[rel_path] = previous['note_id']
+                                continue
+                            folder_note_id = previous['note_id'] if previous else generate_note_id()
+                            manifest.start(
+                                manifest_key, 'folder', folder_note_id, current_parent_note_id
+                            )
+
+                        res = self.create_note(
+                            parentNoteId=current_parent_note_id,
+                            title=name,
+                            type="text",
+                            content=name,
+                            notePosition=note_position or None,
+                            noteId=folder_note_id,
+                        )
+                        note_tree[rel_path] = res['note']['noteId']
+                        if manifest:
+                            manifest.finish(manifest_key)
+
+            for future, file_path in upload_futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    error_files[os.path.abspath(file_path)] = e
+        finally:
+            if upload_pool:
+                upload_pool.shutdown(wait=True, cancel_futures=True)
+            if render_pool:
+                render_pool.shutdown(wait=True, cancel_futures=True)
+            if manifest:
+                manifest.close()
+            if asset_index:
+                asset_index.close()
+
+        if skipped_files:
+            logger.info(f"Skipped {len(skipped_files)} unchanged files.")
+        if asset_index:
+            stats = asset_index.stats()
+            logger.info(
+                f"Uploaded {stats['uploads']} image/file notes, reused {stats['reused']} "
+                f"({stats['reused_bytes']} bytes), {stats['reads_saved']} file reads saved."
+            )
 
         # count how many errors
         if error_files:
@@ -1280,10 +1859,140 @@ class ETAPI:
             # return False
         return True
 
+    def _upload_md_folder_zip(
+            self,
+            parentNoteId: str,
+            mdFolder: str,
+            includePattern: list[str],
+            ignoreFolder: list[str],
+            ignoreFile: list[str],
+            parse_math: bool = True,
+            hasFrontMatter: bool = False,
+            cleanText: bool = False,
+            render_workers: int = 0,
+            image_and_file_as_attachments: bool = True,
+            zip_path: Optional[str] = None,
+    ):
+        """
+        `upload_md_folder` with the zip strategy: write every markdown file with its images
+        and files into an import archive, then import the archive under `parentNoteId`.
+        """
+        mdFolder = os.path.expandvars(os.path.expanduser(mdFolder))
+        keep_zip = zip_path is not None
+        if not keep_zip:
+            fd, zip_path = tempfile.mkstemp(suffix='.zip', prefix='trilium_py_')
+            os.close(fd)
+
+        # walk the folder first, so files can be rendered in order by a process pool
+        md_files = []
+        folders = {'.': None}
+        for root, dirs, files in os.walk(mdFolder, topdown=True):
+            rel_path = os.path.relpath(root, start=mdFolder)
+            if any(x in rel_path for x in ignoreFolder):
+                continue
+            for name in natsort.natsorted(files):
+                if any(x == name for x in ignoreFile):
+                    continue
+                if any(x in name for x in includePattern):
+                    md_files.append((os.path.join(root, name), rel_path))
+            for name in natsort.natsorted(dirs):
+                if all(x not in name for x in ignoreFolder):
+                    # folder notes keep their place after the files, as in the api strategy
+                    md_files.append((None, os.path.relpath(os.path.join(root, name), mdFolder)))
+
+        render_pool = ProcessPoolExecutor(max_workers=render_workers) if render_workers > 0 else None
+        try:
+            file_paths = [x for x, _ in md_files if x]
+            render_args = (
+                file_paths,
+                [parse_math] * len(file_paths),
+                [hasFrontMatter] * len(file_paths),
+                [cleanText] * len(file_paths),
+            )
+            if render_pool:
+                rendered_files = render_pool.map(render_md_file, *render_args)
+            else:
+                rendered_files = map(render_md_file, *render_args)
+
+            with ImportZipWriter(zip_path) as writer:
+                for file_path, rel_path in md_files:
+                    if file_path is None:
+                        parent = folders[os.path.dirname(rel_path) or '.']
+                        name = os.path.basename(rel_path)
+                        folders[rel_path] = writer.add_note(parent, name, name)
+                        continue
+
+                    rendered = next(rendered_files)
+                    parent = folders[rel_path]
+                    html = rendered['html']
+                    image_assets, file_assets = find_md_assets(html, rendered['md_folder'])
+                    note = writer.add_note(parent, rendered['md_name'])
+
+                    # relative urls inside the archive, Trilium links them to the imported notes
+                    replacements = {}
+                    for path, (asset_path, title) in image_assets.items():
+                        if image_and_file_as_attachments:
+                            replacements[path] = writer.add_attachment(
+                                note, title, asset_path, role='image'
+                            )
+                        else:
+                            image_note = writer.add_note(
+                                note,
+                                title,
+                                file_path=asset_path,
+                                type='image',
+                                mime=mimetypes.guess_type(asset_path)[0] or 'image/png',
+                            )
+                            writer.add_attribute(note, 'relation', 'imageLink', image_note['noteId'])
+                            replacements[path] = writer.relative_url(note, image_note)
+                    for path, (asset_path, title) in file_assets.items():
+                        if image_and_file_as_attachments:
+                            replacements[path] = writer.add_attachment(note, title, asset_path)
+                        else:
+                            file_note = writer.add_note(
+                                note,
+                                title,
+                                file_path=asset_path,
+                                type='file',
+                                mime=(
+                                    mimetypes.guess_type(asset_path)[0]
+                                    or 'application/octet-stream'
+                                ),
+                            )
+                            replacements[path] = writer.relative_url(note, file_note)
+                    writer.set_content(note, replace_asset_paths(html, replacements))
+
+            logger.info(
+                f'Packed {writer.note_count} notes and {writer.attachment_count} attachments '
+                f'into {zip_path} ({os.path.getsize(zip_path)} bytes)'
+            )
+            return self.import_note(parentNoteId, zip_path)
+        finally:
+            if render_pool:
+                render_pool.shutdown(wait=True, cancel_futures=True)
+            if not keep_zip and os.path.exists(zip_path):
+                os.remove(zip_path)
+
+    def _delete_md_assets(
+            self, noteId: str, assets: list[dict], asset_index: Optional[AssetIndex] = None
+    ):
+        """
+        Delete images and files uploaded for a markdown note before it is uploaded again.
+        Only assets recorded in the manifest are deleted, attachments added in Trilium stay.
+        Image/file notes in `asset_index` may be used by other notes, they are kept.
+        """
+        for asset in assets:
+            if asset['type'] == 'note':
+                if asset_index and asset_index.contains(asset['id']):
+                    continue
+                self.delete_note(asset['id'])
+            else:
+                self.delete_attachment(asset['id'])
+
     def backup(self, backup_name):
         url = f'{self.server_url}/etapi/backup/{backup_name}'
 
-        res = requests.put(url, headers=self.get_header())
+        res = self.session.put(url, headers=self.get_header())
         if res.status_code == 204:
             logger.info('backup successfully')
             return True
@@ -1308,15 +2017,11 @@ class ETAPI:
         :param noteId:
         :return:
         """
-        note = self.get_note(noteId)
-        logger.info(f"{noteId} {note['type']} {note['title']}")
-
-        if note['type'] == 'text':
-            self.beautify_note(noteId)
+        for note in self.get_subtree(noteId).values():
+            logger.info(f"{note['noteId']} {note['type']} {note['title']}")
 
-        for x in note['childNoteIds']:
-            # logger.info(x)
-            self.beautify_sub_notes(x)
+            if note['type'] == 'text':
+                self.beautify_note(note['noteId'])
 
     def close(self):
         """
@@ -1330,7 +2035,7 @@ class ETAPI:
         :return:
         """
         url = f"{self.server_url}/etapi/sync/now"
-        res = requests.post(url, headers=self.get_header())
+        res = self.session.post(url, headers=self.get_header())
         if res.status_code == 200:
             logger.info("sync successfully")
 
@@ -1342,7 +2047,7 @@ class ETAPI:
         """
         url = f'{self.server_url}/etapi/notes/{noteId}/attachments'
 
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
     def get_attachment(self, attachmentId: str) -> dict:
@@ -1353,7 +2058,7 @@ class ETAPI:
         :return:
         """
         url = f'{self.server_url}/etapi/attachments/{attachmentId}'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.json()
 
     def create_attachment(
@@ -1364,6 +2069,8 @@ class ETAPI:
             role: str = None,
             mime: str = None,
             position: int = 0,
+            data: Optional[bytes] = None,
+            progress: Optional[Callable[[int, int, float], None]] = None,
     ) -> dict:
         """
         create or update a attachment
@@ -1382,6 +2089,8 @@ class ETAPI:
         :param role: should be 'image' or 'file'
         :param mime: e.g. 'image/png'
         :param position:
+        :param data: file content already in memory, uploaded instead of reading `file_path`
+        :param progress: called with (bytes sent, total bytes, bytes per second) during the upload
         :return:
         """
         url = f'{self.server_url}/etapi/attachments'
@@ -1411,9 +2120,12 @@ class ETAPI:
             "position": position,
             "content": '',
         }
-        res = requests.post(url, data=clean_param(params), headers=self.get_header()).json()
+        res = self.session.post(url, data=clean_param(params), headers=self.get_header()).json()
 
-        self.update_attachment_content(res['attachmentId'], file_path)
+        if data is not None:
+            self.update_attachment_content(res['attachmentId'], data, is_file=False)
+        else:
+            self.update_attachment_content(res['attachmentId'], file_path, progress=progress)
 
         return res
 
@@ -1442,40 +2154,44 @@ class ETAPI:
             "title": title,
             "position": position,
         }
-        res = requests.patch(url, json=clean_param(params), headers=self.get_header())
+        res = self.session.patch(url, json=clean_param(params), headers=self.get_header())
 
         return res.json()
 
     def get_attachment_content(self, attachmentId: str) -> bytes:
         url = f'{self.server_url}/etapi/attachments/{attachmentId}/content'
-        res = requests.get(url, headers=self.get_header())
+        res = self.session.get(url, headers=self.get_header())
         return res.content
 
     def update_attachment_content(
-            self, attachmentId: str, data_source: str, is_file: bool = True
+            self,
+            attachmentId: str,
+            data_source: Union[str, bytes, BinaryIO],
+            is_file: bool = True,
+            progress: Optional[Callable[[int, int, float], None]] = None,
     ) -> bool:
+        """
+        upload attachment content
+
+        :param attachmentId:
+        :param data_source: file path if `is_file`, otherwise the content as str or bytes,
+            a binary file object is streamed either way
+        :param is_file:
+        :param progress: called with (bytes sent, total bytes, bytes per second) during the upload
+        :return:
+        """
         # upload file, set content
         url = f'{self.server_url}/etapi/attachments/{attachmentId}/content'
-        if is_file:
-            file_data = open(data_source, 'rb').read()
-        else:
-            file_data = data_source
-        res = requests.put(
-            url,
-            data=file_data,
-            headers={
-                'content-type': 'application/octet-stream',
-                'Content-Transfer-Encoding': 'binary',
-                'Authorization': self.token,
-            },
-        )
+        if not is_file and isinstance(data_source, str):
+            data_source = data_source.encode('utf-8')
+        res = self._send_binary('put', url, data_source, progress=progress)
         if res.status_code == 204:
             return True
         return False
 
     def delete_attachment(self, attachmentId: str) -> bool:
         url = f'{self.server_url}/etapi/attachments/{attachmentId}'
-        res = requests.delete(url, headers=self.get_header())
+        res = self.session.delete(url, headers=self.get_header())
         if res.status_code == 204:
             return True
         return False
@@ -1597,9 +2313,36 @@ class ETAPI:
             skip_clipped_notes=True,
             skip_day_notes=True,
             verbose=True,
-    ):
+            state_path: Optional[str] = None,
+            max_workers: int = 8,
+            link_workers: int = 0,
+            progress: Optional[Callable[[int, int, float], None]] = None,
+    ) -> dict:
         """
         Create internal link for notes
+
+        Note metadata comes from the title searches, notes they miss are fetched in bulk
+        before processing. Target notes are processed concurrently on `max_workers` threads,
+        with `link_workers` the html rewriting runs in a process pool.
+
+        With `state_path`, `process_all_notes=True` runs incrementally. The state file records
+        the newest modification time and the note titles of the last run. The next run only
+        processes notes modified since then (and their parents, for new child titles), plus
+        notes whose content contains a new or renamed title when the titles have changed.
+        Without a state file yet, or with too many changed titles to search for, all notes
+        are processed.
+
+        :param target_note_id: process this note
+        :param target_notes: process these notes
+        :param process_all_notes: process every note if no target is given
+        :param skip_clipped_notes:
+        :param skip_day_notes:
+        :param verbose:
+        :param state_path: JSON state file for incremental runs over all notes
+        :param max_workers: threads fetching and updating notes
+        :param link_workers: processes adding the links, 0 adds them in the threads
+        :param progress: called with (notes processed, total notes, notes per second)
+        :return: dict with processed, updated, duration and notes_per_second
         """
 
         # Prepare note title and note id list
@@ -1616,8 +2359,14 @@ class ETAPI:
 
         # Process the note titles, handling duplicates and sorting
         processed_note_title_list = preprocess_note_title_list(all_note_title_list)
+        # build the keyword automaton once, it is shared by all target notes
+        all_note_matcher = KeywordMatcher(processed_note_title_list)
+
+        # note metadata from the searches, other notes are fetched in bulk before processing
+        notes = {x['noteId']: x for x in all_notes['results']}
 
         # prepare target note id
+        state = None
         if target_note_id:
             target_notes = [
                 target_note_id,
@@ -1625,27 +2374,51 @@ class ETAPI:
         elif target_notes:
             pass
         elif process_all_notes:
-            # process all notes if not provided a note id list
-            target_notes = [
-                x['noteId']
-                for x in self.search_note(search="note.title %= '.*'")['results']
-                if not x['isProtected']
-            ]
+            if state_path:
+                state = InternalLinkState(state_path)
+                # newest modification time before this run, notes changed later are newer
+                last_modified = max(
+                    (x['utcDateModified'] for x in all_notes['results']), default=None
+                )
+            if state is not None and state.last_modified is not None:
+                target_notes = self._get_internal_link_target_notes(
+                    state, processed_note_title_list, notes
+                )
+                if verbose and target_notes is not None:
+                    logger.info(f'incremental run: {len(target_notes)} notes to process')
+            if target_notes is None:
+                # process all notes if not provided a note id list
+                all_target_notes = self.search_note(search="note.title %= '.*'")['results']
+                notes.update((x['noteId'], x) for x in all_target_notes)
+                target_notes = [x['noteId'] for x in all_target_notes if not x['isProtected']]
+        target_notes = list(target_notes or [])
+
+        with self.batch(max_workers=max_workers) as batch:
+            for note_id in target_notes:
+                if note_id not in notes:
+                    batch.get_note(note_id)
+        for note in batch.results(raise_errors=True):
+            notes[note['noteId']] = note
+        # protected notes are not editable via ETAPI, e.g. the parent of a changed note
+        target_notes = [x for x in target_notes if not notes[x]['isProtected']]
 
         # Add internal link
 
-        def get_child_note_title_note_id_list(note_id):
-            res = self.get_note(note_id)
-            result = []
-            for child_note_id in res['childNoteIds']:
-                x = self.get_note(child_note_id)
-                result.append([x['title'], x['noteId']])
+        def get_child_note_title_note_id_list(note):
+            # children missing from the searches, e.g. archived notes
+            missing_child_note_ids = [x for x in note['childNoteIds'] if x not in notes]
+            if missing_child_note_ids:
+                with self.batch() as child_batch:
+                    for child_note_id in missing_child_note_ids:
+                        child_batch.get_note(child_note_id)
+                for child_note in child_batch.results(raise_errors=True):
+                    notes[child_note['noteId']] = child_note
+            result = [[notes[x]['title'], x] for x in note['childNoteIds']]
             return preprocess_note_title_list(result)
 
-        for note_id in tqdm(target_notes):
-
+        def link_note(note_id):
             # only process text note here
-            current_note = self.get_note(note_id)
+            current_note = notes[note_id]
 
             if verbose:
                 logger.info(f'current note id: {note_id} title: {current_note["title"]}')
@@ -1653,39 +2426,139 @@ class ETAPI:
             if not current_note['type'] == 'text':
                 if verbose:
                     logger.info('skip: not text note')
-                continue
+                return False
 
             if skip_clipped_notes and any(
                     [x['name'] == 'pageUrl' for x in current_note['attributes']]
             ):
                 if verbose:
                     logger.info('skip: clipped note')
-                continue
+                return False
 
             if skip_day_notes and any(
                     [x['name'] == 'dateNote' for x in current_note['attributes']]
             ):
                 if verbose:
                     logger.info('skip: day note')
-                continue
+                return False
 
             # add child note, we can handle sub notes with same name from different parent notes
-            processed_child_note_title_list = get_child_note_title_note_id_list(note_id)
-            tmp_list_for_current_note = processed_child_note_title_list + processed_note_title_list
+            processed_child_note_title_list = get_child_note_title_note_id_list(current_note)
 
             content = self.get_note_content(note_id)
-            updated_content, replaced = add_internal_links(
-                content, tmp_list_for_current_note, current_note_id=note_id
-            )
+            if link_pool:
+                updated_content, replaced = link_pool.submit(
+                    add_internal_links_in_worker, content, processed_child_note_title_list, note_id
+                ).result()
+            else:
+                matcher_for_current_note = ChainedKeywordMatcher(
+                    KeywordMatcher(processed_child_note_title_list), all_note_matcher
+                )
+                updated_content, replaced = add_internal_links(
+                    content, matcher_for_current_note, current_note_id=note_id
+                )
             # If content has changed, update the note
             if replaced:
                 self.update_note_content(note_id, updated_content)
                 if verbose:
                     logger.info(f"Added internal link to note {note_id}.")
+            return replaced
+
+        link_pool = None
+        if link_workers > 0:
+            link_pool = ProcessPoolExecutor(
+                max_workers=link_workers,
+                initializer=init_internal_link_worker,
+                initargs=(all_note_matcher,),
+            )
+        executor = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+        started = time.monotonic()
+        updated = 0
+        try:
+            futures = [executor.submit(link_note, x) for x in target_notes]
+            for done, future in enumerate(as_completed(futures), 1):
+                if future.result():
+                    updated += 1
+                if progress:
+                    elapsed = time.monotonic() - started
+                    progress(done, len(futures), done / elapsed if elapsed > 0 else 0.0)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if link_pool:
+                link_pool.shutdown()
+
+        duration = time.monotonic() - started
+        notes_per_second = len(target_notes) / duration if duration > 0 else 0.0
+        logger.info(
+            f'processed {len(target_notes)} notes in {duration:.1f}s '
+            f'({notes_per_second:.1f} notes/s), {updated} updated'
+        )
+
+        if state is not None:
+            state.save(last_modified, processed_note_title_list)
+        return {
+            'processed': len(target_notes),
+            'updated': updated,
+            'duration': duration,
+            'notes_per_second': notes_per_second,
+        }
+
+    def _get_internal_link_target_notes(
+            self,
+            state: InternalLinkState,
+            note_title_list: list,
+            notes: dict,
+            titles_per_search: int = 20,
+            max_title_searches: int = 50,
+    ) -> Optional[list[str]]:
+        """
+        notes an incremental `auto_create_internal_link` run has to process,
+        metadata found by the searches is added to `notes`
+
+        :param titles_per_search: changed titles OR-ed into one content search
+        :param max_title_searches: with more content searches, a full run is cheaper
+        :return: note ids, None if all notes should be processed
+        """
+        changed_titles = []
+        if state.title_hash != state.hash_titles(note_title_list):
+            changed_titles = state.changed_titles(note_title_list)
+            if len(changed_titles) > titles_per_search * max_title_searches:
+                logger.info(f'{len(changed_titles)} titles changed, processing all notes')
+                return None
+
+        target_notes = {}
+        modified = self.search_note(search=f"note.utcDateModified > '{state.last_modified}'")
+        for x in modified['results']:
+            notes[x['noteId']] = x
+            if not x['isProtected']:
+                target_notes[x['noteId']] = None
+            # a new or renamed child title is linked in the parent
+            for parent_note_id in x.get('parentNoteIds', []):
+                parent = notes.get(parent_note_id)
+                if parent is None or not parent['isProtected']:
+                    target_notes[parent_note_id] = None
+
+        if changed_titles:
+            with self.batch() as batch:
+                for i in range(0, len(changed_titles), titles_per_search):
+                    conditions = []
+                    for title in changed_titles[i:i + titles_per_search]:
+                        quoted = title.replace('\\', '\\\\').replace("'", "\\'")
+                        conditions.append(f"note.content *=* '{quoted}'")
+                    batch.search_note(search=' or '.join(conditions))
+            for res in batch.results(raise_errors=True):
+                for x in res['results']:
+                    notes[x['noteId']] = x
+                    if not x['isProtected']:
+                        target_notes[x['noteId']] = None
+        # parent of root
+        target_notes.pop('none', None)
+        return list(target_notes)
 
     def traverse_note_tree(self, noteId: str, depth: int = 3, limit: int = 100, method: Literal['dfs', 'bfs'] = 'dfs'):
         """
         Traverse the note tree using either DFS or BFS and collect information from notes and their descendants.
+        Metadata of the tree is fetched with one `get_subtree` search, content only for the collected notes.
         Args:
             noteId: Starting note ID
             depth: Maximum traversal depth
@@ -1694,34 +2567,22 @@ class ETAPI:
         Returns:
             list: List containing information of all found notes in the tree, up to limit
         """
-        search_result = []
-
         if method.lower() not in ['dfs', 'bfs']:
             raise ValueError("Method must be either 'dfs' or 'bfs'")
 
+        # metadata of the whole walk comes from one search, content only for visited notes
+        subtree = self.get_subtree(noteId, depth=depth)
+        visited = []  # (note_id, depth)
+
         # DFS Implementation
         if method.lower() == 'dfs':
             def dfs_helper(current_note_id: str, current_depth: int) -> None:
-                if current_depth > depth or len(search_result) >= limit:
+                if current_depth > depth or len(visited) >= limit:
                     return
-
-                try:
-                    note = self.get_note(noteId=current_note_id)
-                    note_content = self.get_note_content(current_note_id)
-
-                    search_result.append({
-                        "noteId": current_note_id,
-                        "title": note.get("title", ""),
-                        "content": note_content,
-                        "depth": current_depth
-                    })
-
-                    child_note_ids = note.get('childNoteIds', [])
-                    for sub_note_id in child_note_ids:
-                        if len(search_result) < limit:
-                            dfs_helper(sub_note_id, current_depth + 1)
-                except Exception as e:
-                    logger.error(f"Error processing note {current_note_id}: {str(e)}")
+                visited.append((current_note_id, current_depth))
+                for sub_note_id in subtree[current_note_id]['children']:
+                    if len(visited) < limit:
+                        dfs_helper(sub_note_id, current_depth + 1)
 
             dfs_helper(noteId, 1)
 
@@ -1729,35 +2590,143 @@ class ETAPI:
         elif method.lower() == 'bfs':
             queue = deque([(noteId, 1)])  # (note_id, depth)
 
-            while queue and len(search_result) < limit:
+            while queue and len(visited) < limit:
                 current_note_id, current_depth = queue.popleft()
 
                 if current_depth > depth:
                     continue
-
-                try:
-                    note = self.get_note(noteId=current_note_id)
-                    note_content = self.get_note_content(current_note_id)
-
-                    search_result.append({
-                        "noteId": current_note_id,
-                        "title": note.get("title", ""),
-                        "content": note_content,
-                        "depth": current_depth
-                    })
-
-                    child_note_ids = note.get('childNoteIds', [])
-                    for sub_note_id in child_note_ids:
-                        if current_depth < depth:
-                            queue.append((sub_note_id, current_depth + 1))
-                except Exception as e:
-                    logger.error(f"Error processing note {current_note_id}: {str(e)}")
-
-        if len(search_result) >= limit:
+                visited.append((current_note_id, current_depth))
+                for sub_note_id in subtree[current_note_id]['children']:
+                    if current_depth < depth:
+                        queue.append((sub_note_id, current_depth + 1))
+
+        with self.batch() as batch:
+            for current_note_id, _ in visited:
+                batch.get_note_content(current_note_id)
+        errors = batch.errors
+        search_result = []
+        for i, (content, (current_note_id, current_depth)) in enumerate(
+                zip(batch.results(), visited)
+        ):
+            if i in errors:
+                logger.error(f"Error processing note {current_note_id}: {str(errors[i])}")
+                continue
+            search_result.append({
+                "noteId": current_note_id,
+                "title": subtree[current_note_id].get("title", ""),
+                "content": content,
+                "depth": current_depth
+            })
+
+        if len(visited) >= limit:
             logger.info(f"Reached limit of {limit} notes using {method} method, stopping traversal")
 
         return search_result
 
+    def get_subtree(self, noteId: str, depth: Optional[int] = None) -> dict[str, dict]:
+        """
+        Fetch metadata of a note and all its descendants with one search request,
+        instead of one `get_note` per node.
+
+        The tree is rebuilt locally from `childNoteIds`. The result maps noteId to note metadata
+        in breadth first order, each note gets an extra `depth` key (the starting note has depth 1)
+        and a `children` key listing its child note ids inside the subtree.
+        Cloned notes appear once, at their lowest depth.
+
+        :param noteId: starting note id
+        :param depth: maximum depth, None means the whole subtree
+        :return:
+        """
+        notes = {noteId: self.get_note(noteId)}
+        if depth is None or depth > 1:
+            params = {'ancestorNoteId': noteId, 'includeArchivedNotes': True}
+            if depth is not None:
+                params['ancestorDepth'] = f'lt{depth}'
+            res = self.search_note(search="note.title %= '.*'", **params)
+            for x in res['results']:
+                notes[x['noteId']] = x
+
+        subtree = {}
+        queue = deque([(noteId, 1)])
+        while queue:
+            current_note_id, current_depth = queue.popleft()
+            if current_note_id in subtree:
+                continue
+            note = notes[current_note_id]
+            note['depth'] = current_depth
+            note['children'] = [x for x in note.get('childNoteIds', []) if x in notes]
+            subtree[current_note_id] = note
+            for sub_note_id in note['children']:
+                queue.append((sub_note_id, current_depth + 1))
+        return subtree
+
+    def iter_note_tree(
+            self,
+            noteId: str,
+            depth: Optional[int] = None,
+            limit: Optional[int] = None,
+            with_content: bool = False,
+            max_workers: int = 8,
+    ) -> Iterator[dict]:
+        """
+        Lazily walk the note tree breadth first, fetching notes concurrently.
+        Notes are yielded as soon as they arrive, so the order within a level is not stable.
+        Cloned notes with several parents are only visited once.
+
+        Each yielded item is the note metadata from `get_note` with an extra `depth` key,
+        and a `content` key if `with_content` is True.
+
+        Args:
+            noteId: Starting note ID
+            depth: Maximum traversal depth, the starting note has depth 1. None means no limit
+            limit: Maximum number of notes to yield. None means no limit
+            with_content: Also fetch note content
+            max_workers: Number of concurrent requests
+        """
+
+        def fetch(current_note_id: str, current_depth: int) -> dict:
+            note = self.get_note(noteId=current_note_id)
+            note['depth'] = current_depth
+            if with_content:
+                note['content'] = self.get_note_content(current_note_id)
+            return note
+
+        queue = deque([(noteId, 1)])
+        visited = {noteId}
+        pending = {}
+        count = 0
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            while queue or pending:
+                # keep a bounded window of requests in flight, so memory does not grow with the tree
+                while queue and len(pending) < max_workers * 2:
+                    current_note_id, current_depth = queue.popleft()
+                    future = executor.submit(fetch, current_note_id, current_depth)
+                    pending[future] = current_note_id
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    current_note_id = pending.pop(future)
+                    try:
+                        note = future.result()
+                    except Exception as e:
+                        logger.error(f"Error processing note {current_note_id}: {str(e)}")
+                        continue
+
+                    if depth is None or note['depth'] < depth:
+                        for sub_note_id in note.get('childNoteIds', []):
+                            if sub_note_id not in visited:
+                                visited.add(sub_note_id)
+                                queue.append((sub_note_id, note['depth'] + 1))
+
+                    yield note
+                    count += 1
+                    if limit is not None and count >= limit:
+                        logger.info(f"Reached limit of {limit} notes, stopping traversal")
+                        return
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
 
 class ListTemplate(string.Template):
     """Encapsulate To Do List HTML details
@@ -1799,3 +2768,175 @@ class ItemTemplate(string.Template):
         d = self._defaults.copy()
         d.update(mapping or {})
         return super().substitute(d, **kwds)
+
+
+class TodoSession:
+    """
+    Edit the todo list of a day note with one read and one write.
+
+    The note is fetched once, edits are spliced into the html at the offsets found by
+    `scan_todos`, and the new content is written once when the `with` block exits without
+    an error. The rest of the note is kept exactly as it is.
+    Items are selected by index (starts from 0) or by their description text.
+
+    .. Code:: python
+
+    with ea.todo_session('2024-01-01') as todos:
+        todos.check(0)
+        todos.uncheck('call mom')
+        todos.add('buy milk')
+        todos.delete('old item')
+
+    :param ea: ETAPI client
+    :param date: date string in format of "%Y-%m-%d", e.g. "2022-02-25"
+    """
+
+    def __init__(self, ea: ETAPI, date: str):
+        self.ea = ea
+        self.date = date
+        self.noteId: Optional[str] = None
+        self.content: str = ''
+        self.changed = False
+        self._todos: Optional[list[dict]] = None
+
+    def __enter__(self):
+        self.load()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None and self.changed:
+            self.commit()
+
+    def load(self):
+        """
+        resolve the day note and read its content
+        """
+        self.noteId, self.content = self.ea._call_day_note(self.date, self.ea._get_note_content)
+        self._todos = None
+        self.changed = False
+
+    def commit(self) -> bool:
+        """
+        write the edited content back to the day note
+
+        :return: True if success, False if failed
+        """
+        res = self.ea.update_note_content(self.noteId, self.content)
+        self.changed = False
+        return res
+
+    def _set_content(self, content: str):
+        self.content = content
+        self._todos = None
+        self.changed = True
+
+    def todos(self) -> list[dict]:
+        """
+        todo items with their offsets in the content, see `scan_todos`
+        """
+        if self._todos is None:
+            self._todos = scan_todos(self.content)
+        return self._todos
+
+    @property
+    def items(self) -> list[list[Union[bool, str]]]:
+        """
+        list of todo items, each item is a list of [status, description]
+        """
+        return [[x['checked'], x['description']] for x in self.todos()]
+
+    def find(self, item: Union[int, str]) -> Optional[dict]:
+        """
+        todo item by index or description, None if not found
+        """
+        todos = self.todos()
+        if isinstance(item, int):
+            try:
+                return todos[item]
+            except IndexError:
+                return None
+        for todo in todos:
+            if todo['description'] == item.strip():
+                return todo
+        return None
+
+    def check(self, item: Union[int, str], check: bool = True) -> bool:
+        """check/uncheck a todo item.
+
+        :param item: index starts from 0, or description
+        :param check: True to check, False to uncheck
+        :return: True if the item exists
+        """
+        todo = self.find(item)
+        if todo is None:
+            return False
+        self._set_content(set_checked(self.content, todo, check))
+        return True
+
+    def uncheck(self, item: Union[int, str]) -> bool:
+        return self.check(item, check=False)
+
+    def add(self, todo_description: str, todo_caption: str = r'<p>TODO:</p>'):
+        """append item to todo list.
+
+        special case 1: no todo available, add it to the beginning of document
+        special case 2: if last todo item is empty, update it
+
+        :param todo_description: todo item, or the html of a todo label to keep its format
+        :param todo_caption: caption added to new todo lists, default to '<p>TODO:</p>'
+        """
+        todo_description = todo_description.strip()
+        if "todo-list__label" in todo_description:
+            todo_item_html = f'''<li>{todo_description}</li>'''
+        else:
+            todo_item_html = ItemTemplate(todo_description).substitute()
+        if not self.todos():
+            logger.info('new empty page')
+        list_html = ListTemplate(todo_caption).substitute(items=todo_item_html)
+        self._set_content(add_item(self.content, self.todos(), todo_item_html, list_html))
+
+    def update(self, item: Union[int, str], todo_description: str) -> bool:
+        """update a todo item.
+
+        :param item: index starts from 0, or description
+        :param todo_description: new todo item
+        :return: True if the item exists
+        """
+        todo = self.find(item)
+        if todo is None:
+            return False
+        content = update_description(self.content, todo, todo_description.strip())
+        if content is None:
+            return False
+        self._set_content(content)
+        return True
+
+    def delete(self, item: Union[int, str]) -> bool:
+        """delete a todo item.
+
+        :param item: index starts from 0, or description
+        :return: True if the item exists
+        """
+        todo = self.find(item)
+        if todo is None:
+            return False
+        self._set_content(delete_item(self.content, todo))
+        return True
+
+    def delete_many(self, items: list[Union[int, str]]) -> int:
+        """delete several todo items, indexes refer to the list before any deletion.
+
+        :param items: indexes start from 0, or descriptions
+        :return: number of deleted items
+        """
+        todos = [x for x in (self.find(item) for item in items) if x is not None]
+        # splice from the end, so earlier offsets stay valid
+        content = self.content
+        deleted = set()
+        for todo in sorted(todos, key=lambda x: x['start'], reverse=True):
+            if todo['start'] not in deleted:
+                deleted.add(todo['start'])
+                content = delete_item(content, todo)
+        if deleted:
+            self._set_content(content)
+        return len(deleted)
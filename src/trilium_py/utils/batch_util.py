@@ -0,0 +1,90 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+
+class BatchExecutor:
+    """
+    Run methods of `target` concurrently on a bounded thread pool.
+
+    Any method called on the executor is submitted to the pool and returns a Future,
+    results are collected in submission order.
+
+    .. Code:: python
+
+    with ea.batch(max_workers=8) as batch:
+        for note_id in note_ids:
+            batch.get_note(note_id)
+    notes = batch.results()
+    """
+
+    def __init__(self, target: Any, max_workers: int = 8):
+        self._target = target
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures: list[Future] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def submit_method(*args, **kwargs) -> Future:
+            return self.submit(attr, *args, **kwargs)
+
+        return submit_method
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        submit any callable to the pool
+
+        :return: Future of the call
+        """
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._futures.append(future)
+        return future
+
+    def map(self, fn: Callable, items: Iterable) -> list[Future]:
+        """
+        submit `fn(item)` for every item
+
+        :return: list of Futures in the same order as `items`
+        """
+        return [self.submit(fn, x) for x in items]
+
+    def results(self, raise_errors: bool = False) -> list:
+        """
+        wait for all submitted calls and return their results in submission order.
+        Failed calls give None, their exceptions can be found in `errors`.
+
+        :param raise_errors: raise the first exception instead of returning None for it
+        :return:
+        """
+        result = []
+        for future in self._futures:
+            error = future.exception()
+            if error is not None:
+                if raise_errors:
+                    raise error
+                result.append(None)
+            else:
+                result.append(future.result())
+        return result
+
+    @property
+    def errors(self) -> dict[int, BaseException]:
+        """
+        exceptions of failed calls, keyed by submission index. Waits for all calls to finish.
+        """
+        return {
+            i: future.exception()
+            for i, future in enumerate(self._futures)
+            if future.exception() is not None
+        }
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
@@ -0,0 +1,211 @@
+import copy
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread safe LRU cache with an optional time to live.
+
+    Values are deep copied on the way in and out, so callers can modify what they get
+    without corrupting the cache.
+
+    :param maxsize: max number of entries, the least recently used entry is evicted first
+    :param ttl: seconds an entry stays valid, None means entries never expire
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, copy.deepcopy(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]):
+        """
+        drop every entry whose value matches `predicate`
+        """
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+
+class NoteContentCache:
+    """
+    Persistent note content cache stored in SQLite.
+
+    Each note keeps one entry tagged with a version key (`blobId` or `utcDateModified`),
+    a lookup only hits when the version still matches.
+    When the total size exceeds `max_bytes`, least recently used entries are evicted.
+    Access times of hits are kept in memory and written in batches, before evicting
+    and on close, so a lookup does not commit to disk.
+
+    :param path: SQLite database file
+    :param max_bytes: size cap of all cached contents
+    :param access_flush_size: number of buffered access times that triggers a write
+    """
+
+    def __init__(
+        self, path: str, max_bytes: int = 256 * 1024 * 1024, access_flush_size: int = 256
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.access_flush_size = access_flush_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # note id -> last access time not written yet
+        self._pending_access: dict[str, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS note_content ('
+            'note_id TEXT PRIMARY KEY, version TEXT NOT NULL, content BLOB NOT NULL, '
+            'size INTEGER NOT NULL, last_access REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS note_content_last_access ON note_content (last_access)'
+        )
+        self._conn.commit()
+
+    def get(self, noteId: str, version: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT content FROM note_content WHERE note_id = ? AND version = ?',
+                (noteId, version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._pending_access[noteId] = time.time()
+            if len(self._pending_access) >= self.access_flush_size:
+                self._flush_access()
+                self._conn.commit()
+            self.hits += 1
+            return row[0].decode('utf-8')
+
+    def set(self, noteId: str, version: str, content: str):
+        data = content.encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO note_content VALUES (?, ?, ?, ?, ?)',
+                (noteId, version, data, len(data), time.time()),
+            )
+            self._pending_access.pop(noteId, None)
+            self._evict()
+            self._conn.commit()
+
+    def _flush_access(self):
+        """
+        write buffered access times, the caller commits
+        """
+        if self._pending_access:
+            self._conn.executemany(
+                'UPDATE note_content SET last_access = ? WHERE note_id = ?',
+                [(t, note_id) for note_id, t in self._pending_access.items()],
+            )
+            self._pending_access.clear()
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM note_content').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self._flush_access()
+        rows = self._conn.execute(
+            'SELECT note_id, size FROM note_content ORDER BY last_access'
+        ).fetchall()
+        for note_id, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM note_content WHERE note_id = ?', (note_id,))
+            total -= size
+            self.evictions += 1
+
+    def invalidate(self, *noteIds: str):
+        with self._lock:
+            for note_id in noteIds:
+                self._pending_access.pop(note_id, None)
+            self._conn.executemany(
+                'DELETE FROM note_content WHERE note_id = ?', [(x,) for x in noteIds]
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._pending_access.clear()
+            self._conn.execute('DELETE FROM note_content')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+            self._conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM note_content'
+            ).fetchone()
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'size': count,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
@@ -1,4 +1,7 @@
+import hashlib
 import os
+import time
+from typing import BinaryIO, Callable, Optional, Union
 
 
 def replace_extension(filename: str, new_extension: str) -> str:
@@ -14,3 +17,86 @@ def replace_extension(filename: str, new_extension: str) -> str:
 
     base = os.path.splitext(filename)[0]
     return base + new_extension
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    sha256 hex digest of a file, read in chunks
+
+    :param file_path:
+    :param chunk_size:
+    :return:
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileReader:
+    """
+    File like upload body which reads a file in chunks and reports progress.
+
+    requests sends it chunk by chunk with a Content-Length header, so uploads take
+    constant memory whatever the file size. Reads return at least `chunk_size` bytes
+    to keep the number of socket writes low.
+
+    .. Code:: python
+
+    with FileReader('backup.zip', progress=print) as reader:
+        session.put(url, data=reader)
+
+    :param file: file path or a binary file object, a path is opened and closed by the reader
+    :param progress: called after each chunk with (bytes read, total bytes, bytes per second)
+    :param chunk_size:
+    """
+
+    def __init__(
+        self,
+        file: Union[str, os.PathLike, BinaryIO],
+        progress: Optional[Callable[[int, int, float], None]] = None,
+        chunk_size: int = 1024 * 1024,
+    ):
+        if isinstance(file, (str, os.PathLike)):
+            self._file = open(file, 'rb')
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+        start = self._file.tell()
+        self.total = self._file.seek(0, os.SEEK_END) - start
+        self._file.seek(start)
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self._started = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.total - self.bytes_read
+
+    def __iter__(self):
+        while chunk := self.read(self.chunk_size):
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        if size is not None and size >= 0:
+            size = max(size, self.chunk_size)
+        chunk = self._file.read(size)
+        if chunk:
+            self.bytes_read += len(chunk)
+            if self.progress:
+                elapsed = time.monotonic() - self._started
+                speed = self.bytes_read / elapsed if elapsed > 0 else 0.0
+                self.progress(self.bytes_read, self.total, speed)
+        return chunk
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
@@ -2,11 +2,15 @@ import locale
 import re
 import warnings
 
-from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
+from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning, NavigableString
+
+from .keyword_util import ChainedKeywordMatcher, KeywordMatcher
 
 # Disable MarkupResemblesLocatorWarning globally
 warnings.filterwarnings('ignore', category=MarkupResemblesLocatorWarning)
 
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
 TAG_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
 
 
@@ -79,6 +83,31 @@ def sort_h_tags_with_hierarchy(data, locale_str='zh_CN.UTF-8'):
     return html_string
 
 
+def _text_node(text):
+    # BeautifulSoup turns strings of ASCII whitespace into a single space or newline
+    if not text.strip(ASCII_SPACES):
+        text = '\n' if '\n' in text else ' '
+    return NavigableString(text)
+
+
+def _link_nodes(soup, text, matches):
+    """
+    text and link nodes replacing `text`, the same nodes parsing the replacement html would give
+    """
+    nodes = []
+    pos = 0
+    for start, end, keyword, note_id in matches:
+        if start > pos:
+            nodes.append(_text_node(text[pos:start]))
+        link = soup.new_tag('a', attrs={'class': 'reference-link', 'href': f'#root/{note_id}'})
+        link.append(_text_node(keyword))
+        nodes.append(link)
+        pos = end
+    if pos < len(text):
+        nodes.append(_text_node(text[pos:]))
+    return nodes
+
+
 def add_internal_links(
     html_content, keyword_note_id_list, current_note_id=None, exclude_headings=True
 ):
@@ -87,32 +116,27 @@ def add_internal_links(
 
     Args:
         html_content (str): The HTML content to process.
-        keyword_note_id_list (list of tuples): List of (keyword, note_id).
+        keyword_note_id_list (list of tuples or KeywordMatcher): List of (keyword, note_id),
+            or a matcher built from it once and reused for many notes.
         exclude_headings (bool): Whether to exclude heading tags from processing.
         current_note_id (str): The ID of the current note to prevent self-referencing.
 
     Returns:
         tuple: A tuple containing the updated HTML content and a boolean indicating if replacements were made.
+        Without replacements, `html_content` is returned as is.
     """
+    if isinstance(keyword_note_id_list, KeywordMatcher):
+        matcher = keyword_note_id_list
+    else:
+        matcher = KeywordMatcher(keyword_note_id_list)
+
+    if not len(matcher):
+        return html_content, False  # No keywords to process
+
     # Use BeautifulSoup to parse the HTML content
     soup = BeautifulSoup(html_content, "html.parser")
     replaced = False  # Flag to check if any replacement happens
 
-    # Precompile the keywords and links into a dictionary, excluding self-referencing notes
-    keyword_to_link = {
-        keyword: f'<a class="reference-link" href="#root/{note_id}">{keyword}</a>'
-        for keyword, note_id in keyword_note_id_list
-        if note_id != current_note_id  # Exclude the current note's ID
-    }
-
-    # Create a regex pattern to match any keyword
-    if not keyword_to_link:
-        return str(soup), replaced  # No keywords to process
-
-    keyword_pattern = re.compile(
-        r'\b(' + '|'.join(re.escape(k) for k in keyword_to_link.keys()) + r')\b'
-    )
-
     # Tags to exclude from replacement
     exclude_tags = ['a']
     if exclude_headings:
@@ -124,19 +148,59 @@ def add_internal_links(
         if text_node.parent.name in exclude_tags:
             continue
 
-        # Replace keywords in the text
-        def replace_keyword(match):
-            replaced_keyword = match.group(0)
-            return keyword_to_link[replaced_keyword]
-
-        new_text = keyword_pattern.sub(replace_keyword, text_node)
-        if new_text != text_node:  # If the text has actually changed
-            text_node.replace_with(BeautifulSoup(new_text, "html.parser"))
-            replaced = True  # Mark that replacement has occurred
+        # Replace keywords in the text, self-referencing keywords are excluded by the matcher
+        matches = list(matcher.finditer(text_node, current_note_id))
+        if not matches:
+            continue
 
+        if (
+            type(text_node) is NavigableString
+            and not any(x in text_node for x in '<&')
+            and not any('"' in x[3] or '&' in x[3] for x in matches)
+        ):
+            # edit the tree in place instead of parsing the replacement html
+            for node in _link_nodes(soup, text_node, matches):
+                text_node.insert_before(node)
+            text_node.extract()
+        else:
+            # comments, scripts and text with markup characters are parsed like html
+            parts = []
+            pos = 0
+            for start, end, keyword, note_id in matches:
+                parts.append(text_node[pos:start])
+                parts.append(f'<a class="reference-link" href="#root/{note_id}">{keyword}</a>')
+                pos = end
+            parts.append(text_node[pos:])
+            text_node.replace_with(BeautifulSoup(''.join(parts), "html.parser"))
+        replaced = True  # Mark that replacement has occurred
+
+    if not replaced:
+        return html_content, replaced
     return str(soup), replaced
 
 
+# matcher of all note titles in an internal link worker process
+_worker_matcher = None
+
+
+def init_internal_link_worker(matcher):
+    """
+    initializer of a process pool running `add_internal_links_in_worker`, the matcher of all
+    note titles is sent once per process instead of once per note
+    """
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def add_internal_links_in_worker(html_content, child_title_list, current_note_id):
+    """
+    `add_internal_links` with the child note titles of the current note before the titles
+    given to `init_internal_link_worker`
+    """
+    matcher = ChainedKeywordMatcher(KeywordMatcher(child_title_list), _worker_matcher)
+    return add_internal_links(html_content, matcher, current_note_id=current_note_id)
+
+
 if __name__ == '__main__':
     # Example input HTML content
     html_content = """
@@ -0,0 +1,57 @@
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+Timeout = Union[None, float, Tuple[float, float]]
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter which applies a default timeout to every request sent through it.
+
+    requests.Session has no session level timeout, so it is injected here instead of
+    passing `timeout=` on every call.
+    """
+
+    def __init__(self, *args, timeout: Timeout = None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session(
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    max_retries: int = 0,
+    timeout: Timeout = None,
+    keep_alive: bool = True,
+    session: Optional[requests.Session] = None,
+) -> requests.Session:
+    """
+    Create a requests session backed by a connection pool.
+
+    :param pool_connections: number of host pools to cache
+    :param pool_maxsize: max number of connections kept alive per host
+    :param max_retries: retries for failed connections, passed to urllib3
+    :param timeout: default timeout in seconds, either a float or a (connect, read) tuple
+    :param keep_alive: set to False to send `Connection: close` and disable connection reuse
+    :param session: mount the adapter on an existing session instead of a new one
+    :return:
+    """
+    session = session or requests.Session()
+    adapter = TimeoutHTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries,
+        timeout=timeout,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
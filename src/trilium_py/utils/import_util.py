@@ -0,0 +1,202 @@
+import json
+import mimetypes
+import os
+import re
+import urllib.parse
+import zipfile
+from typing import Optional
+
+from .note_util import generate_note_id
+
+
+class ImportZipWriter:
+    """
+    Write a Trilium import archive (`!!!meta.json` plus one data file per note) to disk.
+
+    Data files are compressed into the zip as soon as they are added, only the small
+    meta tree stays in memory until `close` writes it. Note ids in the archive are
+    placeholders, Trilium assigns new ids on import and rewrites relative links between
+    the files of the archive to them.
+
+    .. Code:: python
+
+    with ImportZipWriter('upload.zip') as writer:
+        folder = writer.add_note(None, 'folder', '<p>folder</p>')
+        note = writer.add_note(folder, 'note')
+        url = writer.add_attachment(note, 'image.png', '/path/image.png', role='image')
+        writer.set_content(note, f'<img src="{url}">')
+    ea.import_note('root', 'upload.zip')
+    """
+
+    def __init__(self, path: str, compression: int = zipfile.ZIP_DEFLATED):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, 'w', compression=compression)
+        self._files: list[dict] = []
+        # noteId -> folder of the note in the archive, and names used in each folder
+        self._note_dirs: dict[str, str] = {}
+        self._dir_names: dict[str, set] = {'': set()}
+        self.note_count = 0
+        self.attachment_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _unique_name(self, folder: str, title: str, extension: str = '') -> str:
+        names = self._dir_names.setdefault(folder, set())
+        base = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', title).strip(' .')[:100] or 'note'
+        name = base + extension
+        i = 0
+        while name in names:
+            i += 1
+            name = f'{base}_{i}{extension}'
+        names.add(name)
+        return name
+
+    def _children(self, parent: Optional[dict]) -> tuple[list, str]:
+        """
+        children list of `parent` and its folder in the archive, None means the import root
+        """
+        if parent is None:
+            return self._files, ''
+        if 'dirFileName' not in parent:
+            folder = self._note_dirs[parent['noteId']]
+            parent['dirFileName'] = self._unique_name(folder, parent['title'])
+            parent['children'] = []
+        folder = self._note_dirs[parent['noteId']]
+        return parent['children'], f"{folder}{parent['dirFileName']}/"
+
+    def add_note(
+        self,
+        parent: Optional[dict],
+        title: str,
+        content: Optional[str] = None,
+        file_path: Optional[str] = None,
+        type: str = 'text',
+        mime: str = 'text/html',
+        notePosition: Optional[int] = None,
+        attributes: Optional[list[dict]] = None,
+    ) -> dict:
+        """
+        Add a note, its content comes from `content` or from the file at `file_path`.
+        Without either, the content must be written later with `set_content`.
+
+        :param parent: meta of the parent note returned by `add_note`, None for the top level
+        :param title:
+        :param content: text content, html for text notes
+        :param file_path: file to copy as the content, for image and file notes
+        :param type: note type, e.g. text, image, file
+        :param mime:
+        :param notePosition: defaults to the order the notes are added
+        :param attributes: like [{'type': 'label', 'name': 'x', 'value': ''}]
+        :return: meta of the note
+        """
+        siblings, folder = self._children(parent)
+        if type == 'text':
+            extension = '.html'
+        else:
+            extension = os.path.splitext(file_path or '')[1]
+        data_file_name = self._unique_name(folder, title, extension)
+
+        note_id = generate_note_id()
+        meta = {
+            'isClone': False,
+            'noteId': note_id,
+            'notePath': [*(parent['notePath'] if parent else []), note_id],
+            'title': title,
+            'notePosition': notePosition or (len(siblings) + 1) * 10,
+            'prefix': None,
+            'isExpanded': False,
+            'type': type,
+            'mime': mime,
+            'attributes': [],
+            'format': 'html' if type == 'text' else None,
+            'dataFileName': data_file_name,
+            'attachments': [],
+        }
+        siblings.append(meta)
+        self._note_dirs[note_id] = folder
+        for attribute in attributes or []:
+            self.add_attribute(meta, **attribute)
+
+        if file_path is not None:
+            self._zip.write(file_path, folder + data_file_name)
+        elif content is not None:
+            self.set_content(meta, content)
+        self.note_count += 1
+        return meta
+
+    def set_content(self, note: dict, content: str):
+        """
+        write the content of a note added without content
+        """
+        self._zip.writestr(self._note_dirs[note['noteId']] + note['dataFileName'], content)
+
+    def add_attribute(
+        self, note: dict, type: str, name: str, value: str = '', isInheritable: bool = False
+    ):
+        """
+        Add a label or relation to `note`, relation values are note ids in the archive.
+        """
+        note['attributes'].append(
+            {
+                'type': type,
+                'name': name,
+                'value': value,
+                'isInheritable': isInheritable,
+                'position': (len(note['attributes']) + 1) * 10,
+            }
+        )
+
+    def add_attachment(
+        self,
+        note: dict,
+        title: str,
+        file_path: str,
+        role: str = 'file',
+        mime: Optional[str] = None,
+    ) -> str:
+        """
+        Add a file as an attachment of `note`.
+
+        :param note: meta returned by `add_note`
+        :param title:
+        :param file_path:
+        :param role: image or file
+        :param mime: guessed from the file name if not given
+        :return: url of the attachment relative to the note, to use in its html
+        """
+        if not mime:
+            mime = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        folder = self._note_dirs[note['noteId']]
+        data_file_name = self._unique_name(folder, os.path.basename(file_path))
+        note['attachments'].append(
+            {
+                'attachmentId': generate_note_id(),
+                'title': title,
+                'role': role,
+                'mime': mime,
+                'position': (len(note['attachments']) + 1) * 10,
+                'dataFileName': data_file_name,
+            }
+        )
+        self._zip.write(file_path, folder + data_file_name)
+        self.attachment_count += 1
+        return urllib.parse.quote(data_file_name)
+
+    def relative_url(self, note: dict, target: dict) -> str:
+        """
+        url of the data file of `target` relative to the data file of `note`
+        """
+        source = self._note_dirs[note['noteId']]
+        path = self._note_dirs[target['noteId']] + target['dataFileName']
+        return urllib.parse.quote(os.path.relpath(path, source or '.').replace('\\', '/'))
+
+    def close(self):
+        if self._zip.fp is None:
+            return
+        meta = {'formatVersion': 2, 'appVersion': 'trilium-py', 'files': self._files}
+        self._zip.writestr('!!!meta.json', json.dumps(meta, ensure_ascii=False, indent=2))
+        self._zip.close()
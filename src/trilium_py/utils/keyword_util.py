@@ -0,0 +1,165 @@
+from collections import deque
+from typing import Iterator, Optional
+
+
+def _is_word(ch: str) -> bool:
+    # same as `\w` of a str pattern in `re`
+    return ch.isalnum() or ch == '_'
+
+
+def _boundary(text: str, pos: int) -> bool:
+    """
+    `\\b` at `pos` of `text`
+    """
+    before = pos > 0 and _is_word(text[pos - 1])
+    after = pos < len(text) and _is_word(text[pos])
+    return before != after
+
+
+class KeywordMatcher:
+    """
+    Find note titles in text with an Aho–Corasick automaton.
+
+    Matches are the same as `re.sub(r'\\b(k1|k2|...)\\b', ...)` over the keywords in list
+    order: the leftmost match wins, at the same position the keyword coming first in the
+    list wins. With a list sorted by title length (`preprocess_note_title_list`), this is
+    the longest match. For a keyword listed several times, its first position sets the
+    priority and its last note id is linked, like building a dict from the list.
+
+    Build it once per title list and reuse it for every note, the automaton does not
+    depend on the note being processed.
+
+    .. Code:: python
+
+    matcher = KeywordMatcher([['Python', 'python_note_id'], ['root', 'root']])
+    for start, end, keyword, note_id in matcher.finditer(text, current_note_id='root'):
+        ...
+    """
+
+    def __init__(self, keyword_note_id_list):
+        """
+        :param keyword_note_id_list: list of (keyword, note_id), empty keywords are ignored
+        """
+        # keyword -> [(priority, note_id), ...] in list order
+        self.entries: dict[str, list[tuple[int, str]]] = {}
+        for i, (keyword, note_id) in enumerate(keyword_note_id_list):
+            if keyword:
+                self.entries.setdefault(keyword, []).append((i, note_id))
+
+        # trie, node 0 is the root
+        self._goto: list[dict[str, int]] = [{}]
+        self._keyword: list[Optional[str]] = [None]
+        for keyword in self.entries:
+            node = 0
+            for ch in keyword:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][ch] = next_node
+                    self._goto.append({})
+                    self._keyword.append(None)
+                node = next_node
+            self._keyword[node] = keyword
+
+        # failure links, and output links to the next node ending a keyword
+        self._fail = [0] * len(self._goto)
+        self._output = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+                self._fail[child] = fail
+                if self._keyword[fail] is not None:
+                    self._output[child] = fail
+                else:
+                    self._output[child] = self._output[fail]
+                queue.append(child)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def occurrences(self, text: str) -> Iterator[tuple[int, int, str]]:
+        """
+        all (start, end, keyword) found in `text`, overlapping ones included
+        """
+        goto, fail, keywords, output = self._goto, self._fail, self._keyword, self._output
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            out = node if keywords[node] is not None else output[node]
+            while out:
+                keyword = keywords[out]
+                yield i + 1 - len(keyword), i + 1, keyword
+                out = output[out]
+
+    def keyword_entries(self, keyword: str) -> list[tuple]:
+        return self.entries.get(keyword, [])
+
+    def finditer(
+        self, text: str, current_note_id: Optional[str] = None
+    ) -> Iterator[tuple[int, int, str, str]]:
+        """
+        Non-overlapping keyword matches between word boundaries.
+
+        :param text:
+        :param current_note_id: keywords of this note are not matched
+        :return: (start, end, keyword, note_id) from left to right
+        """
+        # keyword -> (priority, note_id), None if it only links to the current note
+        resolved: dict[str, Optional[tuple]] = {}
+        # start -> best match starting there
+        best: dict[int, tuple] = {}
+        for start, end, keyword in self.occurrences(text):
+            if not (_boundary(text, start) and _boundary(text, end)):
+                continue
+            if keyword not in resolved:
+                entries = [x for x in self.keyword_entries(keyword) if x[1] != current_note_id]
+                resolved[keyword] = (entries[0][0], entries[-1][1]) if entries else None
+            if resolved[keyword] is None:
+                continue
+            priority, note_id = resolved[keyword]
+            if start not in best or priority < best[start][0]:
+                best[start] = (priority, end, keyword, note_id)
+
+        pos = 0
+        for start in sorted(best):
+            if start < pos:
+                continue
+            _, end, keyword, note_id = best[start]
+            yield start, end, keyword, note_id
+            pos = end
+
+
+class ChainedKeywordMatcher(KeywordMatcher):
+    """
+    Match the keywords of several matchers as if their lists were concatenated,
+    e.g. the titles of the child notes before the titles of all notes, without building
+    a new automaton for the large list.
+    """
+
+    def __init__(self, *matchers: KeywordMatcher):
+        self.matchers = matchers
+
+    def __len__(self):
+        return len(set().union(*(x.entries for x in self.matchers)))
+
+    def occurrences(self, text: str) -> Iterator[tuple[int, int, str]]:
+        seen = set()
+        for matcher in self.matchers:
+            for occurrence in matcher.occurrences(text):
+                if occurrence not in seen:
+                    seen.add(occurrence)
+                    yield occurrence
+
+    def keyword_entries(self, keyword: str) -> list[tuple]:
+        return [
+            ((i, priority), note_id)
+            for i, matcher in enumerate(self.matchers)
+            for priority, note_id in matcher.keyword_entries(keyword)
+        ]
@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+
+class InternalLinkState:
+    """
+    Local record of an `auto_create_internal_link` run over all notes, stored as JSON.
+
+    It keeps the newest `utcDateModified` seen when the run started and the
+    (title, note id) list the links were created from, so the next run can skip notes
+    that neither changed nor contain a new title.
+
+    :param path: JSON file, missing until the first run finishes
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.last_modified: Optional[str] = None
+        self.title_hash: Optional[str] = None
+        self.titles: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            self.last_modified = state.get('last_modified')
+            self.title_hash = state.get('title_hash')
+            self.titles = state.get('titles', {})
+
+    @staticmethod
+    def hash_titles(title_list: list) -> str:
+        """
+        sha256 of a (title, note id) list
+        """
+        data = json.dumps([list(x) for x in title_list], ensure_ascii=False)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def changed_titles(self, title_list: list) -> list[str]:
+        """
+        titles that are new or link to another note since the last run
+        """
+        return [title for title, note_id in title_list if self.titles.get(title) != note_id]
+
+    def save(self, last_modified: Optional[str], title_list: list):
+        """
+        write the state of a finished run, replacing the file atomically
+        """
+        self.last_modified = last_modified
+        self.title_hash = self.hash_titles(title_list)
+        self.titles = {title: note_id for title, note_id in title_list}
+        state = {
+            'last_modified': self.last_modified,
+            'title_hash': self.title_hash,
+            'titles': self.titles,
+        }
+        part_path = f'{self.path}.part'
+        with open(part_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(part_path, self.path)
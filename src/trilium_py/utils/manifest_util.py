@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from .file_util import hash_file
+
+
+class UploadManifest:
+    """
+    Local record of an `upload_md_folder` run, stored in SQLite.
+
+    Every uploaded file or folder is recorded by its path relative to the uploaded folder,
+    with the content hash, the note id and the ids of uploaded images/files.
+    An entry is `pending` while it is being uploaded and `done` afterwards,
+    so an interrupted run can be resumed and unchanged files can be skipped.
+
+    :param path: SQLite database file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS upload_manifest ('
+            'rel_path TEXT PRIMARY KEY, kind TEXT NOT NULL, content_hash TEXT, '
+            'note_id TEXT NOT NULL, parent_note_id TEXT, assets TEXT NOT NULL, '
+            'status TEXT NOT NULL, updated REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get(self, rel_path: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT rel_path, kind, content_hash, note_id, parent_note_id, assets, status '
+                'FROM upload_manifest WHERE rel_path = ?',
+                (rel_path,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'rel_path': row[0],
+            'kind': row[1],
+            'content_hash': row[2],
+            'note_id': row[3],
+            'parent_note_id': row[4],
+            'assets': json.loads(row[5]),
+            'status': row[6],
+        }
+
+    def start(
+        self,
+        rel_path: str,
+        kind: str,
+        note_id: str,
+        parent_note_id: str,
+        content_hash: Optional[str] = None,
+    ):
+        """
+        record an entry as `pending` before uploading it
+
+        :param kind: 'file' or 'folder'
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO upload_manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    rel_path,
+                    kind,
+                    content_hash,
+                    note_id,
+                    parent_note_id,
+                    '[]',
+                    'pending',
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+
+    def add_asset(self, rel_path: str, asset: dict):
+        """
+        record an image/file uploaded for a `pending` entry as soon as it is created,
+        so it can be cleaned up if the upload is interrupted
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT assets FROM upload_manifest WHERE rel_path = ?', (rel_path,)
+            ).fetchone()
+            if row is None:
+                return
+            assets = json.loads(row[0])
+            assets.append(asset)
+            self._conn.execute(
+                'UPDATE upload_manifest SET assets = ?, updated = ? WHERE rel_path = ?',
+                (json.dumps(assets), time.time(), rel_path),
+            )
+            self._conn.commit()
+
+    def finish(self, rel_path: str, assets: Optional[list[dict]] = None):
+        """
+        mark an entry as `done`
+
+        :param assets: uploaded images/files, e.g. [{'type': 'attachment', 'id': 'abc'}]
+        """
+        with self._lock:
+            self._conn.execute(
+                'UPDATE upload_manifest SET status = ?, assets = ?, updated = ? WHERE rel_path = ?',
+                ('done', json.dumps(assets or []), time.time(), rel_path),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AssetIndex:
+    """
+    Content hash index of images and files uploaded by `upload_md_folder`.
+
+    Image/file notes are looked up by the sha256 of their bytes, so identical files referenced
+    from many markdown files are uploaded once and reused. With `path` the index is kept in
+    SQLite (usually the upload manifest) and reused across runs.
+
+    Attachments belong to a single note and can't be shared, for them the index only keeps
+    recently read small file contents in memory, so a file is not read from disk again for
+    every note. Files over `max_file_bytes` are left to be streamed from disk.
+
+    :param path: SQLite database file, None keeps the index in memory for this run only
+    :param max_cached_bytes: memory budget for cached file contents
+    :param max_file_bytes: larger files are never cached, they are streamed from disk
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_cached_bytes: int = 64 * 1024 * 1024,
+        max_file_bytes: int = 4 * 1024 * 1024,
+    ):
+        self.max_cached_bytes = max_cached_bytes
+        self.max_file_bytes = min(max_file_bytes, max_cached_bytes)
+        self.uploads = 0
+        self.reused = 0
+        self.reused_bytes = 0
+        self.reads_saved = 0
+        self._lock = threading.Lock()
+        self._records: dict[tuple[str, str], dict] = {}
+        self._in_flight: dict[tuple[str, str], Future] = {}
+        self._digests: dict[tuple[str, int, int], str] = {}
+        self._contents: OrderedDict[str, bytes] = OrderedDict()
+        self._cached_bytes = 0
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS upload_assets ('
+                'digest TEXT NOT NULL, kind TEXT NOT NULL, record TEXT NOT NULL, '
+                'PRIMARY KEY (digest, kind))'
+            )
+            self._conn.commit()
+            for digest, kind, record in self._conn.execute('SELECT * FROM upload_assets'):
+                self._records[(digest, kind)] = json.loads(record)
+
+    def file_digest(self, file_path: str) -> str:
+        """
+        sha256 of a file, remembered by path, size and modification time
+        """
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            digest = hash_file(file_path)
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def read(self, file_path: str) -> Optional[bytes]:
+        """
+        Content of a file to upload, served from memory if the same content was read before.
+        Files larger than `max_file_bytes` are not read, None means the caller should stream
+        the file from disk. A file read here is hashed from the same bytes, not read twice.
+        """
+        stat = os.stat(file_path)
+        if stat.st_size > self.max_file_bytes:
+            return None
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+            data = self._contents.get(digest) if digest else None
+            if data is not None:
+                self._contents.move_to_end(digest)
+                self.reads_saved += 1
+                return data
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._digests[key] = digest
+            if digest in self._contents:
+                self._contents.move_to_end(digest)
+            else:
+                self._contents[digest] = data
+                self._cached_bytes += len(data)
+            while self._cached_bytes > self.max_cached_bytes:
+                _, evicted = self._contents.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+        return data
+
+    def get_or_upload(
+        self, file_path: str, kind: str, upload: Callable[[], dict]
+    ) -> tuple[dict, bool]:
+        """
+        Return the uploaded record of a file with the same content, or call `upload` once.
+        Concurrent calls for the same content wait for the first upload.
+
+        :param file_path: local file
+        :param kind: 'image' or 'file', the same bytes are uploaded once per kind
+        :param upload: uploads the file and returns a json serializable record
+        :return: (record, True if an existing upload was reused)
+        """
+        key = (self.file_digest(file_path), kind)
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                future = self._in_flight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._in_flight[key] = Future()
+        if record is None and not owner:
+            record = future.result()
+        if record is not None:
+            with self._lock:
+                self.reused += 1
+                self.reused_bytes += os.path.getsize(file_path)
+            return record, True
+
+        try:
+            record = upload()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._records[key] = record
+            del self._in_flight[key]
+            self.uploads += 1
+            if self._conn is not None:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO upload_assets VALUES (?, ?, ?)',
+                    (key[0], kind, json.dumps(record)),
+                )
+                self._conn.commit()
+        future.set_result(record)
+        return record, False
+
+    def contains(self, asset_id: str) -> bool:
+        """
+        whether an uploaded note is in the index, i.e. it may be shared by several notes
+        """
+        with self._lock:
+            return any(x.get('id') == asset_id for x in self._records.values())
+
+    def stats(self) -> dict:
+        return {
+            'uploads': self.uploads,
+            'reused': self.reused,
+            'reused_bytes': self.reused_bytes,
+            'reads_saved': self.reads_saved,
+        }
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
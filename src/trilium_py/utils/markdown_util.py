@@ -0,0 +1,234 @@
+import os
+import re
+import urllib.parse
+from datetime import datetime, timezone
+
+import markdown2
+from dateutil.tz import tzlocal
+from loguru import logger
+
+from .markdown_math import reconstructMath, sanitizeInput
+from .note_util import beautify_content
+
+
+def render_md_file(
+    file: str, parse_math: bool = True, hasFrontMatter: bool = False, cleanText: bool = False
+) -> dict:
+    """
+    Read a markdown file and convert it to Trilium html.
+
+    This is the CPU bound part of `ETAPI.upload_md_file`, kept as a plain function
+    so it can run in a process pool.
+
+    :param file: markdown file path
+    :param parse_math: parse latex math formulas
+    :param hasFrontMatter: strip front matter and read the `created` date from it
+    :param cleanText: beautify the generated html
+    :return: dict with `md_file`, `md_name`, `md_folder`, `html` and `dateCreated`
+    """
+    md_file = os.path.abspath(file).replace('\\', '/').replace('//', '/')
+    md_full_name = os.path.basename(md_file)
+    md_name = md_full_name[:-3]
+    md_folder = os.path.dirname(md_file)
+    logger.info(md_file)
+    # logger.info(md_name)
+    # logger.info(md_folder)
+
+    # convert md to html
+    with open(md_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+        utcDateCreated = None
+        dateCreated = None
+
+        if hasFrontMatter:
+
+            # Extract and strip FrontMatter (delimited by leading ---)
+            frontmatter_match = re.match(r'^---\n(.*?)\n---\n', content, re.DOTALL)
+            if frontmatter_match:
+                frontmatter = frontmatter_match.group(1)
+                content = content[frontmatter_match.end():]
+
+                # Extract the 'created' key from FrontMatter
+                created_match = re.search(r'^created:\s*(.+)$', frontmatter, re.MULTILINE)
+                if created_match:
+                    created_raw = created_match.group(1).strip()
+                    # Normalise to millisecond precision: "YYYY-MM-DD HH:MM:SS.mmmZ"
+                    # Input may be "YYYY-MM-DD HH:MM:SSZ" (no millis) or already have them
+                    ts_match = re.match(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(\.\d+)?(Z?)$', created_raw)
+                    if ts_match:
+                        base, millis, tz = ts_match.groups()
+                        millis = (millis or '.000')[:4].ljust(4, '0')  # ensure exactly .mmm
+                        utcDateCreated = f"{base}{millis}Z"
+
+                        # Convert to local timezone
+                        dt_utc = datetime.strptime(f"{base}{millis}", "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=timezone.utc)
+                        local_tz = tzlocal()
+                        dt_local = dt_utc.astimezone(local_tz)
+                        utc_offset = dt_local.strftime("%z")  # e.g. "+0900"
+                        dateCreated = dt_local.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt_local.microsecond // 1000:03d}{utc_offset}"
+
+        # fix logseq image size format
+        logseq_image_pat = r'(\!\[.*\]\(.*\))\{.*?:height.*width.*}'
+        content = re.sub(logseq_image_pat, r'\1', content)
+
+        # Check if we should parse math formulas
+        if not parse_math or not re.search(re.escape("$"), content):
+            # extra format support
+            # https://github.com/trentm/python-markdown2/wiki/Extras
+            html = markdown2.markdown(
+                content,
+                extras=['fenced-code-blocks', 'strike', 'tables', 'task_list', 'code-friendly'],
+            )
+
+            if cleanText:
+                html = beautify_content(html)
+
+            # logger.info(html)
+        else:
+            # Parse math formulas
+            no_latex_part, latex_code_part = sanitizeInput(content)
+            html = reconstructMath(
+                markdown2.markdown(
+                    no_latex_part,
+                    extras=['fenced-code-blocks', 'strike', 'tables', 'task_list'],
+                ),
+                list(
+                    map(
+                        lambda x: x.replace("<", " \\lt ").replace(">", " \\gt "),
+                        latex_code_part,
+                    )
+                ),
+            )
+
+    return {
+        'md_file': md_file,
+        'md_name': md_name,
+        'md_folder': md_folder,
+        'html': html,
+        'dateCreated': dateCreated,
+    }
+
+
+def find_md_assets(html: str, md_folder: str) -> tuple[dict, dict]:
+    """
+    Find local images and files linked from the html of a rendered markdown file.
+
+    Each asset is keyed by its path as written in the html, a path used more than once
+    is only listed once.
+
+    :param html: html from `render_md_file`
+    :param md_folder: folder of the markdown file, relative paths are resolved from it
+    :return: (image_assets, file_assets), both mapping path in html -> (local file path, title)
+    """
+    # detect images
+    # https://github.com/Nriver/trilium-py/issues/36
+    pat = '<img (.*?)>'
+    images = re.findall(pat, html)
+
+    # detect files
+    pat = '<a href="(.*?)">(.*)</a>'
+    a_links = re.findall(pat, html)
+
+    # path in html -> (local file, title)
+    image_assets = {}
+    file_assets = {}
+
+    if images:
+        # images require manually upload and url need to be replaced
+        logger.info('found images:')
+        logger.info(images)
+
+        # process images
+        for match in images:
+            # extract image url and name
+            image_names = re.findall('alt="(.*?)"', match)
+            image_paths = re.findall('src="(.*?)"', match)
+
+            if not image_paths:
+                continue
+            image_path = image_paths[0]
+            if not image_names:
+                image_name = ''
+            else:
+                image_name = image_names[0]
+
+            # absolute path
+            if image_path.startswith('http'):
+                # skip online images
+                continue
+
+            # fix vnote image with special size format
+            if ' ' in image_path and image_path.endswith('x'):
+                image_path = image_path.split(' ')[0]
+
+            if image_path in image_assets:
+                # same image used more than once, upload it only once
+                continue
+
+            image_file_path = os.path.join(md_folder, image_path).replace('\\', '/')
+            # unquote path, in case the url is quoted
+            image_file_path_unquote = urllib.parse.unquote(image_file_path)
+
+            # skip if path does not point to a valid file
+            if os.path.isdir(image_file_path) or os.path.isdir(image_file_path_unquote):
+                continue
+
+            # try both raw path and unquoted path
+            if not os.path.exists(image_file_path):
+                if not os.path.exists(image_file_path_unquote):
+                    # image file not exist, ignore it
+                    continue
+                image_file_path = image_file_path_unquote
+
+            if not image_name:
+                # if image name is not specified, use file name
+                image_name = os.path.basename(image_path)
+
+            image_assets[image_path] = (image_file_path, image_name)
+
+    logger.info(a_links)
+    for link, link_name in a_links:
+        # fix file path
+        file_path = ''
+        if link.startswith(('http:', 'https:')):
+            # skip online link
+            continue
+        if link in image_assets or link in file_assets:
+            continue
+        if os.path.exists(link):
+            # absolute file path
+            file_path = link
+        else:
+            file_path = os.path.join(md_folder, link).replace('\\', '/')
+            # unquote path, in case the url is quoted
+            file_path_unquote = urllib.parse.unquote(file_path)
+
+            # skip if path does not point to a valid file
+            if os.path.isdir(file_path) or os.path.isdir(file_path_unquote):
+                continue
+
+            # try both raw path and unquoted path
+            if os.path.exists(file_path_unquote):
+                file_path = file_path_unquote
+
+        if os.path.exists(file_path):
+            logger.info(file_path)
+            file_assets[link] = (file_path, link_name)
+    return image_assets, file_assets
+
+
+def replace_asset_paths(html: str, replacements: dict) -> str:
+    """
+    Replace asset paths in html in one pass, longer paths win over their prefixes.
+
+    :param html:
+    :param replacements: path in html -> new url
+    :return:
+    """
+    if not replacements:
+        return html
+    pattern = re.compile(
+        '|'.join(re.escape(x) for x in sorted(replacements, key=len, reverse=True))
+    )
+    return pattern.sub(lambda m: replacements[m.group(0)], html)
@@ -1,12 +1,40 @@
 import re
 import html
+import secrets
+import string
 from bs4 import BeautifulSoup
 
 from .html_util import sort_h_tags_with_hierarchy
 
+NOTE_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+def generate_note_id() -> str:
+    """
+    Generate a random 12 character note id, the same format Trilium uses for new notes.
+    Useful to know a note's id before creating it.
+    """
+    return ''.join(secrets.choice(NOTE_ID_ALPHABET) for _ in range(12))
+
+
+PRE_BLOCK_PATTERN = re.compile(r"<pre.*?>.*?</pre>", re.DOTALL)
+PRE_CODE_PATTERN = re.compile(r'(<pre.*?><code.*?>)\n*([\s\S]*?)\n*(</code></pre>)')
+PRE_BLOCK_KEY_PATTERN = re.compile(r'__PRE_BLOCK_(\d+)__')
+HEADING_LEVEL_PATTERN = re.compile(r'<h([2-6])')
+HEADING_TAG_PATTERN = re.compile(r'(<\/?)h([2-6])(>)')
+# empty paragraphs before a heading, replaced by exactly one
+HEADING_SPACING_PATTERN = re.compile(r'(?:<p>\s*</p>\s*)*(<h[2-5]>)')
+PARAGRAPH_PATTERN = re.compile(r"<p>.*?</p>", re.DOTALL)
+
+
 def add_br(match):
     return match.group(0).replace("\n", "<br>\n")
 
+
+def _trim_pre_code(m):
+    return m.group(1) + m.group(2) + m.group(3)
+
+
 def beautify_content(content):
     """
     Beautify note content  (excluding <pre> blocks except trimming inside <code>):
@@ -25,25 +53,21 @@ def beautify_content(content):
         key = f"__PRE_BLOCK_{len(pre_blocks)}__"
 
         # trim empty lines in <pre><code>
-        block = re.sub(
-            r'(<pre.*?><code.*?>)\n*([\s\S]*?)\n*(</code></pre>)',
-            lambda mm: mm.group(1) + mm.group(2) + mm.group(3),
-            block
-        )
+        block = PRE_CODE_PATTERN.sub(_trim_pre_code, block)
 
         pre_blocks[key] = block
         return key
     # Beautify content
-    content = re.sub(r"<pre.*?>.*?</pre>", _extract_pre, content, flags=re.DOTALL)
+    content = PRE_BLOCK_PATTERN.sub(_extract_pre, content)
 
 
     # Use html module to unescape HTML entities (like &nbsp;)
     content = html.unescape(content)
 
     # Normalize heading levels
-    headings = re.findall(r'<h([2-6])', content)
+    headings = HEADING_LEVEL_PATTERN.findall(content)
     if headings:
-        min_heading = min(int(h) for h in headings)
+        min_heading = int(min(headings))
         if min_heading > 2:
             shift = min_heading - 2
 
@@ -52,23 +76,11 @@ def beautify_content(content):
                 new_level = max(2, level - shift)
                 return f"{m.group(1)}h{new_level}{m.group(3)}"
 
-            content = re.sub(r'(<\/?)h([2-6])(>)', replace_heading, content)
-
-    # Remove redundant <p> before headings
-    for heading_level in range(2, 6):
-        content = re.sub(
-            fr'(?:<p>\s*</p>\s*)+(<h{heading_level}>)',
-            r'\1',
-            content
-        )
+            content = HEADING_TAG_PATTERN.sub(replace_heading, content)
 
-    # Ensure one empty <p></p> before headings (but no duplicates)
-    for heading_level in range(2, 6):
-        content = re.sub(
-            fr'(?<!<p></p>)(<h{heading_level}>)',
-            r'<p></p>\1',
-            content
-        )
+    # Remove redundant <p> before headings and ensure one empty <p></p> before them,
+    # h2 to h5 in a single pass
+    content = HEADING_SPACING_PATTERN.sub(r'<p></p>\1', content)
 
     # remove redundant new line in code block
     content = content.replace('\n</code></pre>', '</code></pre>')
@@ -81,15 +93,23 @@ def beautify_content(content):
     content = content.replace('<p>&nbsp;</p><p>&nbsp;</p>', '<p>&nbsp;</p>')
 
     # remove redundant beginning
-    content = re.sub('^<p></p><h2>', '<h2>', content)
-    content = re.sub('^<div><div><p></p><h2>', '<h2>', content)
+    if content.startswith('<p></p><h2>'):
+        content = content[len('<p></p>'):]
+    if content.startswith('<div><div><p></p><h2>'):
+        content = content[len('<div><div><p></p>'):]
 
     # Assemble pre blocks
-    for key, block in pre_blocks.items():
-        content = content.replace(key, block)
-        
+    if any('__PRE_BLOCK_' in x for x in pre_blocks.values()):
+        # a block looking like a key, replace keys one by one like the blocks were extracted
+        for key, block in pre_blocks.items():
+            content = content.replace(key, block)
+    elif pre_blocks:
+        content = PRE_BLOCK_KEY_PATTERN.sub(
+            lambda m: pre_blocks.get(m.group(0), m.group(0)), content
+        )
+
     # Add line breaks in Paragraph
-    content = re.sub(r"<p>.*?</p>", add_br, content, flags=re.DOTALL)
+    content = PARAGRAPH_PATTERN.sub(add_br, content)
 
     return content
 
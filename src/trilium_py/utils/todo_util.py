@@ -0,0 +1,211 @@
+import html
+import re
+from typing import Optional
+
+# comments, start tags and end tags, quoted attribute values may contain '>'
+TAG_PATTERN = re.compile(
+    r'<!--.*?-->|<(/?)([a-zA-Z][^\s/>]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>', re.DOTALL
+)
+ATTR_PATTERN = re.compile(r'([^\s=/>]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+CHECKED_ATTR_PATTERN = re.compile(
+    r'\s+checked(?:\s*=\s*(?:"[^"]*"|\'[^\']*\'|[^\s>/]+))?(?=[\s/>])', re.IGNORECASE
+)
+
+TODO_LIST_CLASS = 'todo-list'
+TODO_LABEL_CLASS = 'todo-list__label'
+TODO_DESCRIPTION_CLASS = 'todo-list__label__description'
+
+
+def _attrs(attr_text: str) -> dict[str, str]:
+    """
+    attributes of a tag, valueless attributes get '' like BeautifulSoup does
+    """
+    attrs = {}
+    for name, value in ATTR_PATTERN.findall(attr_text):
+        if value[:1] in ('"', "'"):
+            value = value[1:-1]
+        attrs.setdefault(name.lower(), html.unescape(value))
+    return attrs
+
+
+def _has_class(attr_text: str, class_name: str) -> bool:
+    return class_name in _attrs(attr_text).get('class', '').split()
+
+
+def _text(fragment: str) -> str:
+    """
+    text of an html fragment, like BeautifulSoup `.text`
+    """
+    return html.unescape(TAG_PATTERN.sub('', fragment))
+
+
+def _element_end(content: str, tag: str, pos: int) -> Optional[tuple[int, int]]:
+    """
+    (start, end) of the end tag closing the `tag` element opened before `pos`,
+    nested elements of the same tag are skipped
+    """
+    depth = 1
+    for m in TAG_PATTERN.finditer(content, pos):
+        if not m.group(2) or m.group(2).lower() != tag:
+            continue
+        if m.group(1):
+            depth -= 1
+            if depth == 0:
+                return m.start(), m.end()
+        elif not m.group(3).rstrip().endswith('/'):
+            depth += 1
+    return None
+
+
+def scan_todos(content: str) -> list[dict]:
+    """
+    Find the todo items of a note without building a DOM.
+
+    Each item is a dict with `checked`, `description` (text of the label, stripped),
+    `html` (the label element) and the offsets needed to edit it in place:
+    `start`/`end` of the label, `input_start`/`input_end` of its checkbox
+    and `li_start`/`li_end` of the list item around it (None if missing).
+
+    :param content: note html
+    :return: todo items in document order
+    """
+    items = []
+    open_li = []
+    # <li> start offset -> todo items inside it, waiting for the </li>
+    pending_li: dict[int, list[dict]] = {}
+    label = None
+    for m in TAG_PATTERN.finditer(content):
+        closing, tag, attr_text = m.group(1), m.group(2), m.group(3)
+        if not tag:
+            # comment
+            continue
+        tag = tag.lower()
+
+        if label is not None:
+            if tag == 'input' and not closing and label['input_start'] is None:
+                label['input_start'], label['input_end'] = m.start(), m.end()
+                label['checked'] = bool(_attrs(attr_text).get('checked'))
+            elif tag == 'label' and closing:
+                label['end'] = m.end()
+                label['html'] = content[label['start']:label['end']]
+                label['description'] = _text(content[label.pop('_inner'):m.start()]).strip()
+                items.append(label)
+                label = None
+            continue
+
+        if tag == 'li':
+            if closing:
+                if open_li:
+                    for item in pending_li.pop(open_li.pop(), []):
+                        item['li_end'] = m.end()
+            else:
+                open_li.append(m.start())
+        elif tag == 'label' and not closing and _has_class(attr_text, TODO_LABEL_CLASS):
+            label = {
+                'checked': False,
+                'description': '',
+                'html': '',
+                'start': m.start(),
+                'end': None,
+                '_inner': m.end(),
+                'input_start': None,
+                'input_end': None,
+                'li_start': open_li[-1] if open_li else None,
+                'li_end': None,
+            }
+            if open_li:
+                pending_li.setdefault(open_li[-1], []).append(label)
+    return items
+
+
+def set_checked(content: str, item: dict, checked: bool = True) -> str:
+    """
+    check or uncheck a todo item found by `scan_todos`
+
+    :return: new content
+    """
+    if item['input_start'] is None:
+        return content
+    input_tag = content[item['input_start']:item['input_end']]
+    input_tag = CHECKED_ATTR_PATTERN.sub('', input_tag)
+    if checked:
+        input_tag = input_tag[:6] + ' checked="checked"' + input_tag[6:]
+    return content[:item['input_start']] + input_tag + content[item['input_end']:]
+
+
+def update_description(content: str, item: dict, description: str) -> Optional[str]:
+    """
+    replace the description of a todo item found by `scan_todos` with plain text
+
+    :return: new content, None if the item has no description span
+    """
+    for m in TAG_PATTERN.finditer(content, item['start']):
+        if (
+            m.group(2)
+            and m.group(2).lower() == 'span'
+            and not m.group(1)
+            and _has_class(m.group(3), TODO_DESCRIPTION_CLASS)
+        ):
+            end = _element_end(content, 'span', m.end())
+            if end is None:
+                return None
+            text = html.escape(description, quote=False)
+            return content[:m.end()] + text + content[end[0]:]
+    return None
+
+
+def delete_item(content: str, item: dict) -> str:
+    """
+    remove the list item of a todo item found by `scan_todos`
+
+    :return: new content
+    """
+    if item['li_start'] is not None and item['li_end'] is not None:
+        return content[:item['li_start']] + content[item['li_end']:]
+    return content[:item['start']] + content[item['end']:]
+
+
+def add_item(content: str, items: list[dict], item_html: str, list_html: str) -> str:
+    """
+    Add a todo item to the first todo list of the note.
+
+    The item replaces the last list item when the last todo is empty. Without any todo,
+    `list_html` (a new list containing the item) is put at the beginning of the note.
+
+    :param content: note html
+    :param items: todo items of `content` from `scan_todos`
+    :param item_html: `<li>` element of the new item
+    :param list_html: new todo list with the item, used when the note has no todo
+    :return: new content
+    """
+    if not items:
+        return list_html + content
+
+    # first <ul class="todo-list">
+    for m in TAG_PATTERN.finditer(content):
+        if (
+            m.group(2)
+            and m.group(2).lower() == 'ul'
+            and not m.group(1)
+            and _has_class(m.group(3), TODO_LIST_CLASS)
+        ):
+            break
+    else:
+        return list_html + content
+    ul_end = _element_end(content, 'ul', m.end())
+    if ul_end is None:
+        return list_html + content
+
+    if not items[-1]['description']:
+        # replace last empty todo item, the last <li> of the list
+        last_li = None
+        for li in TAG_PATTERN.finditer(content, m.end(), ul_end[0]):
+            if li.group(2) and li.group(2).lower() == 'li' and not li.group(1):
+                last_li = li
+        if last_li is not None:
+            li_end = _element_end(content, 'li', last_li.end())
+            if li_end is not None:
+                return content[:last_li.start()] + item_html + content[li_end[1]:]
+
+    # append to the end of the list
+    return content[:ul_end[0]] + item_html + content[ul_end[0]:]
@@ -0,0 +1,232 @@
+import fnmatch
+import os
+import struct
+import zlib
+from typing import Callable, Iterable, Union
+
+LOCAL_FILE_HEADER = b'PK\x03\x04'
+DATA_DESCRIPTOR = b'PK\x07\x08'
+CENTRAL_DIRECTORY = b'PK\x01\x02'
+END_OF_CENTRAL_DIRECTORY = b'PK\x05\x06'
+ZIP64_END_OF_CENTRAL_DIRECTORY = b'PK\x06\x06'
+
+FLAG_ENCRYPTED = 0x1
+FLAG_DATA_DESCRIPTOR = 0x8
+FLAG_UTF8 = 0x800
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+ZipInclude = Union[None, list[str], Callable[[str], bool]]
+
+
+class ZipStreamError(Exception):
+    """
+    the zip stream is broken, unsupported or unsafe to extract
+    """
+
+
+class _ChunkReader:
+    """
+    read exact amounts of bytes from an iterator of chunks, with push back
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+        self._pos = 0
+
+    def read(self, size: int) -> bytes:
+        """
+        read up to `size` bytes, b'' at the end of the stream
+        """
+        while self._pos >= len(self._buffer):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return b''
+            self._buffer = chunk
+            self._pos = 0
+        data = self._buffer[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        while len(data) < size:
+            more = self.read(size - len(data))
+            if not more:
+                raise ZipStreamError('unexpected end of zip stream')
+            data += more
+        return data
+
+    def unread(self, data: bytes):
+        if data:
+            self._buffer = data + self._buffer[self._pos:]
+            self._pos = 0
+
+
+def _safe_path(out_dir: str, name: str) -> str:
+    """
+    path of a zip entry inside `out_dir`, refuse names escaping it
+    """
+    normalized = name.replace('\\', '/')
+    parts = [x for x in normalized.split('/') if x not in ('', '.')]
+    if (
+        normalized.startswith('/')
+        or '..' in parts
+        or (parts and ':' in parts[0])
+    ):
+        raise ZipStreamError(f'unsafe path in zip: {name}')
+    return os.path.join(out_dir, *parts)
+
+
+def _included(name: str, include: ZipInclude) -> bool:
+    if include is None:
+        return True
+    if callable(include):
+        return include(name)
+    return any(fnmatch.fnmatch(name, x) for x in include)
+
+
+def _zip64_sizes(extra: bytes, compressed_size: int, size: int) -> tuple[int, int, bool]:
+    """
+    read sizes from the zip64 extra field when the header sizes overflowed
+    """
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, length = struct.unpack('<HH', extra[pos:pos + 4])
+        if header_id == 0x0001:
+            values = extra[pos + 4:pos + 4 + length]
+            # only the overflowed fields are present, uncompressed size first
+            if size == 0xFFFFFFFF:
+                size, values = struct.unpack('<Q', values[:8])[0], values[8:]
+            if compressed_size == 0xFFFFFFFF:
+                compressed_size = struct.unpack('<Q', values[:8])[0]
+            return compressed_size, size, True
+        pos += 4 + length
+    return compressed_size, size, False
+
+
+def extract_zip_stream(
+    chunks: Iterable[bytes],
+    out_dir: str,
+    include: ZipInclude = None,
+    chunk_size: int = 1024 * 1024,
+) -> list[str]:
+    """
+    Extract a zip while it is being downloaded, without a seekable archive on disk.
+
+    Entries are read one after another from their local file headers, the central
+    directory at the end is never needed. Deflated entries may use data descriptors,
+    stored entries must have their size in the local header. Each file is written to
+    a `.part` file first and renamed once its CRC is verified.
+
+    :param chunks: bytes of the zip, e.g. `response.iter_content(chunk_size)`
+    :param out_dir: target folder, created if missing
+    :param include: glob patterns or a function of the entry name, other entries are skipped
+    :param chunk_size: max size of decompressed data held in memory at once
+    :return: paths of the extracted files
+    """
+    reader = _ChunkReader(chunks)
+    extracted = []
+    os.makedirs(out_dir, exist_ok=True)
+
+    while True:
+        signature = reader.read_exact(4)
+        if signature in (
+            CENTRAL_DIRECTORY,
+            END_OF_CENTRAL_DIRECTORY,
+            ZIP64_END_OF_CENTRAL_DIRECTORY,
+        ):
+            break
+        if signature != LOCAL_FILE_HEADER:
+            raise ZipStreamError(f'bad zip entry signature {signature!r}')
+
+        (
+            _version,
+            flags,
+            method,
+            _mod_time,
+            _mod_date,
+            crc,
+            compressed_size,
+            size,
+            name_length,
+            extra_length,
+        ) = struct.unpack('<HHHHHIIIHH', reader.read_exact(26))
+        raw_name = reader.read_exact(name_length)
+        extra = reader.read_exact(extra_length)
+        name = raw_name.decode('utf-8' if flags & FLAG_UTF8 else 'cp437')
+        compressed_size, size, zip64 = _zip64_sizes(extra, compressed_size, size)
+        has_descriptor = bool(flags & FLAG_DATA_DESCRIPTOR)
+
+        if flags & FLAG_ENCRYPTED:
+            raise ZipStreamError(f'encrypted zip entry is not supported: {name}')
+        if method not in (METHOD_STORED, METHOD_DEFLATED):
+            raise ZipStreamError(f'unsupported compression method {method}: {name}')
+        if method == METHOD_STORED and has_descriptor and not compressed_size:
+            raise ZipStreamError(f'stored zip entry without size is not supported: {name}')
+
+        target = _safe_path(out_dir, name)
+        wanted = not name.endswith('/') and _included(name, include)
+        part_path = f'{target}.part'
+        if wanted:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+        sink = open(part_path, 'wb') if wanted else None
+        computed_crc = 0
+        try:
+            if method == METHOD_STORED:
+                remaining = compressed_size
+                while remaining:
+                    data = reader.read(min(remaining, chunk_size))
+                    if not data:
+                        raise ZipStreamError(f'unexpected end of zip stream in {name}')
+                    remaining -= len(data)
+                    computed_crc = zlib.crc32(data, computed_crc)
+                    if sink:
+                        sink.write(data)
+            else:
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                # without a data descriptor the compressed size is known, read no further
+                remaining = None if has_descriptor else compressed_size
+                while not decompressor.eof:
+                    if remaining == 0:
+                        raise ZipStreamError(f'truncated deflate data in {name}')
+                    read_size = chunk_size if remaining is None else min(remaining, chunk_size)
+                    data = reader.read(read_size)
+                    if not data:
+                        raise ZipStreamError(f'unexpected end of zip stream in {name}')
+                    if remaining is not None:
+                        remaining -= len(data)
+                    # limit the output size, a small chunk can inflate to a lot of data
+                    while data:
+                        out = decompressor.decompress(data, chunk_size)
+                        data = decompressor.unconsumed_tail
+                        computed_crc = zlib.crc32(out, computed_crc)
+                        if sink:
+                            sink.write(out)
+                        if decompressor.eof:
+                            break
+                reader.unread(decompressor.unused_data)
+
+            if has_descriptor:
+                descriptor = reader.read_exact(4)
+                if descriptor == DATA_DESCRIPTOR:
+                    descriptor = reader.read_exact(4)
+                crc = struct.unpack('<I', descriptor)[0]
+                reader.read_exact(16 if zip64 else 8)
+
+            if computed_crc != crc:
+                raise ZipStreamError(f'CRC mismatch in {name}')
+        except BaseException:
+            if sink:
+                sink.close()
+                os.remove(part_path)
+            raise
+
+        if sink:
+            sink.close()
+            os.replace(part_path, target)
+            extracted.append(target)
+
+    return extracted
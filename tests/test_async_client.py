@@ -0,0 +1,71 @@
+"""Verify trilium-py AsyncETAPI methods.
+
+"""
+import asyncio
+import json
+import unittest
+
+try:
+    import httpx
+
+    from trilium_py.async_client import AsyncETAPI
+except ImportError:  # pragma: no cover
+    httpx = None
+
+
+@unittest.skipIf(httpx is None, 'httpx is not installed')
+class TestAsyncETAPI(unittest.TestCase):
+    def run_with(self, handler, coro_func):
+        async def runner():
+            async with AsyncETAPI(
+                'http://bogus:8080',
+                'Token bogus',
+                max_concurrency=2,
+                transport=httpx.MockTransport(handler),
+            ) as ea:
+                return await coro_func(ea)
+
+        return asyncio.run(runner())
+
+    def test_get_note(self):
+        def handler(request):
+            self.assertEqual(request.headers['Authorization'], 'Token bogus')
+            return httpx.Response(200, json={'noteId': request.url.path.split('/')[-1]})
+
+        result = self.run_with(handler, lambda ea: ea.map(ea.get_note, ['a', 'b', 'c']))
+        self.assertEqual([x['noteId'] for x in result], ['a', 'b', 'c'])
+
+    def test_bounded_concurrency(self):
+        in_flight = []
+        peak = []
+
+        async def handler(request):
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            return httpx.Response(200, text='<p></p>')
+
+        async def fetch(ea):
+            return await ea.gather(*(ea.get_note_content(str(i)) for i in range(10)))
+
+        result = self.run_with(handler, fetch)
+        self.assertEqual(result, ['<p></p>'] * 10)
+        self.assertLessEqual(max(peak), 2)
+
+    def test_create_note(self):
+        def handler(request):
+            self.assertEqual(
+                json.loads(request.content),
+                {'parentNoteId': 'root', 'title': 'hello', 'type': 'text', 'content': 'world'},
+            )
+            return httpx.Response(201, json={'note': {'noteId': 'new'}})
+
+        result = self.run_with(
+            handler, lambda ea: ea.create_note('root', 'hello', 'text', content='world')
+        )
+        self.assertEqual(result['note']['noteId'], 'new')
+
+
+if __name__ == '__main__':
+    unittest.main()
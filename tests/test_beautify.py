@@ -0,0 +1,67 @@
+"""Verify trilium-py note content beautification.
+
+"""
+import unittest
+
+from trilium_py.utils.note_util import beautify_content
+
+# (content, beautified content) from beautify_content before the patterns were fused
+GOLDEN_NOTES = [
+    (
+        '<h3>Title</h3><p>text</p><h4>Sub</h4><p>more</p>',
+        '<h2>Title</h2><p>text</p><p></p><h3>Sub</h3><p>more</p>',
+    ),
+    (
+        '<p></p><p> </p>\n<h2>Heading</h2><p>a\nb</p>',
+        '<h2>Heading</h2><p>a<br>\nb</p>',
+    ),
+    (
+        '<div><div><p></p><h2>Top</h2><p>x</p></div></div>',
+        '<h2>Top</h2><p>x</p></div></div>',
+    ),
+    (
+        '<p>caption <img src="a.png"></p><p>&nbsp;</p><p>&nbsp;</p>',
+        '<p>caption</p><p><img src="a.png"></p><p>\xa0</p><p>\xa0</p>',
+    ),
+    (
+        '<pre><code class="language-python">\n\nprint("&lt;h2&gt;")\n\n</code></pre><h5>Five</h5>',
+        '<pre><code class="language-python">print("&lt;h2&gt;")</code></pre><p></p><h2>Five</h2>',
+    ),
+    (
+        '<p>one</p><pre>keep &amp; this\nline</pre><p>two\nthree</p>',
+        '<p>one</p><pre>keep &amp; this\nline</pre><p>two<br>\nthree</p>',
+    ),
+    (
+        '<h6>six</h6><h4>four</h4><p>&lt;b&gt;escaped&lt;/b&gt;</p>',
+        '<p></p><h4>six</h4><p></p><h2>four</h2><p><b>escaped</b></p>',
+    ),
+    (
+        '<p>__PRE_BLOCK_0__</p><pre>__PRE_BLOCK_1__</pre><pre>second</pre>',
+        '<p><pre><pre>second</pre></pre></p><pre><pre>second</pre></pre><pre>second</pre>',
+    ),
+    (
+        '',
+        '',
+    ),
+]
+
+
+class TestBeautifyContent(unittest.TestCase):
+    def test_golden_notes(self):
+        for content, expected in GOLDEN_NOTES:
+            self.assertEqual(beautify_content(content), expected, content)
+
+    def test_large_note(self):
+        sections = ''.join(
+            f'<p></p><h3>Section {i}</h3><p>line\nline</p><pre><code>\n{i}\n</code></pre>'
+            for i in range(1000)
+        )
+        expected = ''.join(
+            f'<p></p><h2>Section {i}</h2><p>line<br>\nline</p><pre><code>{i}</code></pre>'
+            for i in range(1000)
+        )
+        self.assertEqual(beautify_content(sections), expected[len('<p></p>'):])
+
+
+if __name__ == '__main__':
+    unittest.main()
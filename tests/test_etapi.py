@@ -2,11 +2,15 @@
 
 These tests are an example of how to use standard library unittest to test the trilium-py
 """
+import os
+import re
+import tempfile
 import unittest
 
 import requests_mock
 
 from trilium_py.client import ETAPI
+from trilium_py.utils.cache_util import NoteContentCache
 
 
 class TestETAPI(unittest.TestCase):
@@ -58,6 +62,255 @@ class TestETAPI(unittest.TestCase):
             mock.post('http://bogus:8080/etapi/sync/now')
             self.assertIsNone(etapi.close())
 
+    def test_etapi_session(self):
+        with ETAPI('http://bogus:8080', 'Token bogus', pool_maxsize=4, timeout=5) as etapi:
+            adapter = etapi.session.get_adapter('http://bogus:8080')
+            self.assertEqual(adapter.timeout, 5)
+
+            with requests_mock.Mocker() as mock:
+                mock.get('http://bogus:8080/etapi/app-info', json={"appVersion": "0.0.0"})
+                self.assertEqual(etapi.app_info(), {"appVersion": "0.0.0"})
+                self.assertEqual(etapi.app_info(), {"appVersion": "0.0.0"})
+                self.assertEqual(mock.call_count, 2)
+
+    def test_etapi_batch(self):
+        etapi = ETAPI('http://bogus:8080', 'Token bogus')
+
+        with requests_mock.Mocker() as mock:
+            for note_id in ['a', 'b', 'c']:
+                mock.get(f'http://bogus:8080/etapi/notes/{note_id}', json={"noteId": note_id})
+            mock.get('http://bogus:8080/etapi/notes/bad', status_code=500, text='oops')
+
+            with etapi.batch(max_workers=4) as batch:
+                future = batch.get_note('a')
+                for note_id in ['b', 'bad', 'c']:
+                    batch.get_note(note_id)
+
+            self.assertEqual(future.result(), {"noteId": "a"})
+            results = batch.results()
+            self.assertEqual([x and x['noteId'] for x in results], ['a', 'b', None, 'c'])
+            self.assertEqual(list(batch.errors), [2])
+
+    def test_etapi_iter_note_tree(self):
+        etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        tree = {'root': ['a', 'b'], 'a': ['c'], 'b': ['c', 'd'], 'c': [], 'd': ['e'], 'e': []}
+
+        with requests_mock.Mocker() as mock:
+            for note_id, children in tree.items():
+                mock.get(
+                    f'http://bogus:8080/etapi/notes/{note_id}',
+                    json={"noteId": note_id, "title": note_id, "childNoteIds": children},
+                )
+            mock.get(re.compile(r'http://bogus:8080/etapi/notes/\w+/content'), text='<p></p>')
+
+            notes = list(etapi.iter_note_tree('root', depth=3, max_workers=2))
+            # the cloned note "c" is visited once, "e" is too deep
+            self.assertEqual(
+                sorted((x['noteId'], x['depth']) for x in notes),
+                [('a', 2), ('b', 2), ('c', 3), ('d', 3), ('root', 1)],
+            )
+            self.assertTrue(all('content' not in x for x in notes))
+            self.assertFalse(any(x.path.endswith('/content') for x in mock.request_history))
+
+            notes = list(etapi.iter_note_tree('root', limit=2, with_content=True))
+            self.assertEqual(len(notes), 2)
+            self.assertEqual(notes[0]['content'], '<p></p>')
+
+    def test_etapi_get_subtree(self):
+        etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        tree = {'a': ['c'], 'b': ['c', 'd'], 'c': [], 'd': []}
+
+        with requests_mock.Mocker() as mock:
+            mock.get(
+                'http://bogus:8080/etapi/notes/root',
+                json={"noteId": "root", "childNoteIds": ["a", "b", "outside"]},
+            )
+            search = mock.get(
+                'http://bogus:8080/etapi/notes',
+                json={
+                    "results": [
+                        {"noteId": note_id, "childNoteIds": children}
+                        for note_id, children in tree.items()
+                    ]
+                },
+            )
+
+            subtree = etapi.get_subtree('root', depth=3)
+            self.assertEqual(search.call_count, 1)
+            self.assertEqual(search.last_request.qs['ancestornoteid'], ['root'])
+            self.assertEqual(search.last_request.qs['ancestordepth'], ['lt3'])
+            self.assertEqual(list(subtree), ['root', 'a', 'b', 'c', 'd'])
+            self.assertEqual(subtree['root']['children'], ['a', 'b'])
+            self.assertEqual([x['depth'] for x in subtree.values()], [1, 2, 2, 3, 3])
+
+            self.assertEqual(list(etapi.get_subtree('root', depth=1)), ['root'])
+            self.assertEqual(search.call_count, 1)
+
+    def test_etapi_traverse_note_tree(self):
+        etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        tree = {'a': ['c'], 'b': ['d'], 'c': ['e'], 'd': [], 'e': []}
+
+        with requests_mock.Mocker() as mock:
+            note = mock.get(
+                'http://bogus:8080/etapi/notes/root',
+                json={"noteId": "root", "title": "root", "childNoteIds": ["a", "b"]},
+            )
+            search = mock.get(
+                'http://bogus:8080/etapi/notes',
+                json={
+                    "results": [
+                        {"noteId": note_id, "title": note_id, "childNoteIds": children}
+                        for note_id, children in tree.items()
+                        if note_id != 'e'
+                    ]
+                },
+            )
+            content = mock.get(
+                re.compile(r'http://bogus:8080/etapi/notes/\w+/content'),
+                text=lambda request, context: request.path.split('/')[-2],
+            )
+
+            notes = etapi.traverse_note_tree('root', depth=3, method='dfs')
+            self.assertEqual(
+                [(x['noteId'], x['depth']) for x in notes],
+                [('root', 1), ('a', 2), ('c', 3), ('b', 2), ('d', 3)],
+            )
+            self.assertEqual([x['content'] for x in notes], ['root', 'a', 'c', 'b', 'd'])
+            # one search instead of a get_note per node
+            self.assertEqual(search.call_count, 1)
+            self.assertEqual(note.call_count, 1)
+
+            notes = etapi.traverse_note_tree('root', depth=3, limit=3, method='bfs')
+            self.assertEqual(
+                [(x['noteId'], x['depth'], x['title']) for x in notes],
+                [('root', 1, 'root'), ('a', 2, 'a'), ('b', 2, 'b')],
+            )
+            # content is only fetched for the returned notes
+            self.assertEqual(content.call_count, 8)
+
+    def test_etapi_note_cache(self):
+        etapi = ETAPI('http://bogus:8080', 'Token bogus', note_cache_size=2)
+
+        with requests_mock.Mocker() as mock:
+            for note_id in ['a', 'b', 'c']:
+                mock.get(f'http://bogus:8080/etapi/notes/{note_id}', json={"noteId": note_id})
+            mock.patch('http://bogus:8080/etapi/notes/a', json={"noteId": "a"})
+
+            etapi.get_note('a')
+            etapi.get_note('a')['title'] = 'modified copy'
+            self.assertEqual(etapi.get_note('a'), {"noteId": "a"})
+            self.assertEqual(mock.call_count, 1)
+
+            # write-through invalidation
+            etapi.patch_note('a', title='new title')
+            etapi.get_note('a')
+            self.assertEqual(mock.call_count, 3)
+
+            # LRU eviction
+            etapi.get_note('b')
+            etapi.get_note('c')
+            etapi.get_note('a')
+            self.assertEqual(mock.call_count, 6)
+
+            stats = etapi.note_cache.stats()
+            self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (2, 5, 2))
+
+    def test_etapi_content_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, 'content.sqlite')
+            with requests_mock.Mocker() as mock:
+                note = mock.get(
+                    'http://bogus:8080/etapi/notes/a',
+                    [{'json': {"noteId": "a", "blobId": "v1"}}] * 2
+                    + [{'json': {"noteId": "a", "blobId": "v2"}}],
+                )
+                content = mock.get(
+                    'http://bogus:8080/etapi/notes/a/content',
+                    [{'text': '<p>v1</p>'}, {'text': '<p>v2</p>'}],
+                )
+
+                with ETAPI('http://bogus:8080', 'Token bogus', content_cache_path=cache_path) as etapi:
+                    self.assertEqual(etapi.get_note_content('a'), '<p>v1</p>')
+
+                # the cache is persistent
+                with ETAPI('http://bogus:8080', 'Token bogus', content_cache_path=cache_path) as etapi:
+                    self.assertEqual(etapi.get_note_content('a'), '<p>v1</p>')
+                    self.assertEqual(content.call_count, 1)
+
+                    # a new blobId downloads the content again
+                    self.assertEqual(etapi.get_note_content('a'), '<p>v2</p>')
+                    self.assertEqual(content.call_count, 2)
+                    self.assertEqual(note.call_count, 3)
+                    self.assertEqual(etapi.content_cache.stats()['size'], 1)
+
+    def test_content_cache_with_note_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, 'content.sqlite')
+            with requests_mock.Mocker() as mock:
+                mock.get(
+                    'http://bogus:8080/etapi/notes/a',
+                    [{'json': {"noteId": "a", "blobId": "v1"}}]
+                    + [{'json': {"noteId": "a", "blobId": "v2"}}],
+                )
+                mock.get(
+                    'http://bogus:8080/etapi/notes/a/content',
+                    [{'text': '<p>old</p>'}, {'text': '<p>new</p>'}],
+                )
+                with ETAPI(
+                        'http://bogus:8080',
+                        'Token bogus',
+                        note_cache_size=10,
+                        note_cache_ttl=600,
+                        content_cache_path=cache_path,
+                ) as etapi:
+                    self.assertEqual(etapi.get_note_content('a'), '<p>old</p>')
+                    # the note changed on the server, the cached metadata must not hide it
+                    self.assertEqual(etapi.get_note_content('a'), '<p>new</p>')
+                    self.assertEqual(mock.call_count, 4)
+                    # the fresh metadata is kept in the note cache
+                    self.assertEqual(etapi.get_note('a')['blobId'], 'v2')
+                    self.assertEqual(mock.call_count, 4)
+
+    def test_content_cache_access_buffered(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = NoteContentCache(os.path.join(tmp_dir, 'content.sqlite'), max_bytes=10)
+            cache.set('a', 'v', 'aaaa')
+            cache.set('b', 'v', 'bbbb')
+            changes = cache._conn.total_changes
+            self.assertEqual(cache.get('a', 'v'), 'aaaa')
+            # a hit is not written to disk
+            self.assertEqual(cache._conn.total_changes, changes)
+
+            # the buffered access of 'a' is written before evicting, 'b' is the oldest
+            cache.set('c', 'v', 'cccc')
+            self.assertIsNone(cache.get('b', 'v'))
+            self.assertEqual(cache.get('a', 'v'), 'aaaa')
+            cache.close()
+
+    def test_update_attachment_content(self):
+        etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        url = 'http://bogus:8080/etapi/attachments/att/content'
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'image.svg')
+            with open(file_path, 'wb') as f:
+                f.write(b'<svg>file</svg>')
+
+            with requests_mock.Mocker() as mock:
+                bodies = []
+
+                def callback(request, context):
+                    body = request.body
+                    bodies.append(body if isinstance(body, bytes) else body.read())
+                    context.status_code = 204
+                    return ''
+
+                mock.put(url, text=callback)
+                self.assertTrue(
+                    etapi.update_attachment_content('att', '<svg>text</svg>', is_file=False)
+                )
+                self.assertTrue(etapi.update_attachment_content('att', file_path))
+                self.assertEqual(bodies, [b'<svg>text</svg>', b'<svg>file</svg>'])
+
     def test_etapi_login_fail(self):
         etapi = ETAPI('http://bogus:8080')
 
@@ -0,0 +1,306 @@
+"""Verify trilium-py note export downloads.
+
+"""
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+import requests_mock
+
+from trilium_py.client import ETAPI
+from trilium_py.utils.zip_util import ZipStreamError
+
+EXPORT_URL = 'http://bogus:8080/etapi/notes/root/export'
+
+
+class InterruptedStream(io.RawIOBase):
+    """
+    response body failing after `data`, like a dropped connection
+    """
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.data.readinto(b)
+        if not n:
+            raise ConnectionResetError('connection dropped')
+        return n
+
+
+class TestExportNote(unittest.TestCase):
+    def setUp(self):
+        self.etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.save_path = os.path.join(self.tmp_dir.name, 'root.zip')
+        self.data = os.urandom(300000)
+        self.etag = '"v1"'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def range_callback(self, request, context):
+        context.headers['ETag'] = self.etag
+        range_header = request.headers.get('Range')
+        if range_header and request.headers.get('If-Range') == self.etag:
+            start = int(range_header[len('bytes='):-1])
+            context.status_code = 206
+            size = len(self.data)
+            context.headers['Content-Range'] = f'bytes {start}-{size - 1}/{size}'
+            return self.data[start:]
+        context.status_code = 200
+        return self.data
+
+    def interrupted_export(self, size):
+        """
+        first attempt of a resumable export, the connection drops after `size` bytes
+        """
+        with requests_mock.Mocker() as mock:
+            mock.get(
+                EXPORT_URL, body=InterruptedStream(self.data[:size]), headers={'ETag': self.etag}
+            )
+            with self.assertRaises(Exception):
+                self.etapi.export_note(
+                    'root', 'html', self.save_path, chunk_size=100, resume=True
+                )
+        self.assertEqual(os.path.getsize(f'{self.save_path}.part'), size)
+
+    def test_export_note(self):
+        progress = []
+        with requests_mock.Mocker() as mock:
+            mock.get(EXPORT_URL, content=self.data)
+            self.assertTrue(
+                self.etapi.export_note(
+                    'root', 'html', self.save_path, progress=lambda *x: progress.append(x)
+                )
+            )
+            self.assertEqual(mock.last_request.qs, {'format': ['html']})
+        with open(self.save_path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(os.path.exists(f'{self.save_path}.part'))
+        self.assertEqual(progress[-1][0], len(self.data))
+
+    def test_export_note_error(self):
+        with requests_mock.Mocker() as mock:
+            mock.get(EXPORT_URL, status_code=403, json={'message': 'protected'})
+            self.assertFalse(self.etapi.export_note('root', 'md', self.save_path))
+        self.assertFalse(os.path.exists(self.save_path))
+        self.assertFalse(os.path.exists(f'{self.save_path}.part'))
+
+    def test_export_note_resume(self):
+        self.interrupted_export(1000)
+
+        with requests_mock.Mocker() as mock:
+            mock.get(EXPORT_URL, content=self.range_callback)
+            self.assertTrue(self.etapi.export_note('root', 'html', self.save_path, resume=True))
+            self.assertEqual(mock.last_request.headers['Range'], 'bytes=1000-')
+            self.assertEqual(mock.last_request.headers['If-Range'], self.etag)
+        with open(self.save_path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['root.zip'])
+
+    def test_export_note_resume_changed(self):
+        self.interrupted_export(1000)
+        # the note is edited before the next attempt
+        self.data = os.urandom(300000)
+        self.etag = '"v2"'
+
+        with requests_mock.Mocker() as mock:
+            mock.get(EXPORT_URL, content=self.range_callback)
+            self.assertTrue(self.etapi.export_note('root', 'html', self.save_path, resume=True))
+        with open(self.save_path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_export_note_resume_wrong_content_range(self):
+        self.interrupted_export(1000)
+
+        def callback(request, context):
+            if request.headers.get('Range'):
+                context.status_code = 206
+                context.headers['Content-Range'] = f'bytes 0-{len(self.data) - 1}/{len(self.data)}'
+            return self.data
+
+        with requests_mock.Mocker() as mock:
+            mock.get(EXPORT_URL, content=callback)
+            self.assertTrue(self.etapi.export_note('root', 'html', self.save_path, resume=True))
+            self.assertEqual(mock.call_count, 2)
+            self.assertNotIn('Range', mock.last_request.headers)
+        with open(self.save_path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_export_note_resume_without_validator(self):
+        # left over by another run, nothing tells which export it belongs to
+        with open(f'{self.save_path}.part', 'wb') as f:
+            f.write(self.data[:1000])
+
+        with requests_mock.Mocker() as mock:
+            mock.get(EXPORT_URL, content=self.range_callback)
+            self.assertTrue(self.etapi.export_note('root', 'html', self.save_path, resume=True))
+            self.assertNotIn('Range', mock.last_request.headers)
+        with open(self.save_path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_export_note_resume_without_range_support(self):
+        self.interrupted_export(1000)
+
+        with requests_mock.Mocker() as mock:
+            mock.get(EXPORT_URL, content=self.data)
+            self.assertTrue(self.etapi.export_note('root', 'html', self.save_path, resume=True))
+        with open(self.save_path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+
+class TestExportNotes(unittest.TestCase):
+    def setUp(self):
+        self.etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_export_notes(self):
+        calls = []
+
+        def flaky_callback(request, context):
+            calls.append(request)
+            context.status_code = 500 if len(calls) == 1 else 200
+            return b'flaky'
+
+        with requests_mock.Mocker() as mock:
+            mock.get('http://bogus:8080/etapi/notes/a/export', content=b'aaa')
+            mock.get('http://bogus:8080/etapi/notes/b/export', content=flaky_callback)
+            mock.get('http://bogus:8080/etapi/notes/c/export', status_code=404)
+            report = self.etapi.export_notes(
+                ['a', 'b', 'c'],
+                'md',
+                os.path.join(self.tmp_dir.name, 'out'),
+                max_workers=3,
+                backoff=0.01,
+            )
+
+        self.assertEqual(list(report), ['a', 'b', 'c'])
+        self.assertTrue(report['a']['ok'])
+        self.assertEqual(report['a']['size'], 3)
+        self.assertEqual(report['a']['attempts'], 1)
+        self.assertTrue(report['b']['ok'])
+        self.assertEqual(report['b']['attempts'], 2)
+        with open(report['b']['path'], 'rb') as f:
+            self.assertEqual(f.read(), b'flaky')
+        self.assertFalse(report['c']['ok'])
+        self.assertEqual(report['c']['attempts'], 3)
+        self.assertFalse(os.path.exists(report['c']['path']))
+
+    def test_export_notes_stale_part(self):
+        out_dir = os.path.join(self.tmp_dir.name, 'out')
+        os.makedirs(out_dir)
+        # left over by an unrelated run
+        with open(os.path.join(out_dir, 'a.zip.part'), 'wb') as f:
+            f.write(b'stale')
+        with open(os.path.join(out_dir, 'a.zip.part.validator'), 'w') as f:
+            f.write('"v1"')
+
+        with requests_mock.Mocker() as mock:
+            mock.get(
+                'http://bogus:8080/etapi/notes/a/export', content=b'aaa', headers={'ETag': '"v1"'}
+            )
+            report = self.etapi.export_notes(['a'], 'md', out_dir, backoff=0)
+            self.assertNotIn('Range', mock.last_request.headers)
+        with open(report['a']['path'], 'rb') as f:
+            self.assertEqual(f.read(), b'aaa')
+
+
+class NonSeekableBuffer(io.RawIOBase):
+    """
+    write only stream, zipfile writes data descriptors to it like a streaming server does
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+class TestExportNoteToDir(unittest.TestCase):
+    def setUp(self):
+        self.etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.out_dir = os.path.join(self.tmp_dir.name, 'out')
+        self.files = {
+            '!!!meta.json': b'{}',
+            'root/note.md': b'# note\n' * 1000,
+            'root/note/child.md': b'child',
+            'root/note/image.png': os.urandom(100000),
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_zip(self, files):
+        buffer = NonSeekableBuffer()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('root/', b'')
+            for name, data in files.items():
+                archive.writestr(name, data)
+        return bytes(buffer.data)
+
+    def export(self, data, **kwargs):
+        with requests_mock.Mocker() as mock:
+            mock.get(EXPORT_URL, body=io.BytesIO(data))
+            return self.etapi.export_note_to_dir(
+                'root', 'md', self.out_dir, chunk_size=1000, **kwargs
+            )
+
+    def test_export_note_to_dir(self):
+        data = self.make_zip(self.files)
+        extracted = self.export(data)
+        self.assertEqual(len(extracted), 4)
+        for name, content in self.files.items():
+            with open(os.path.join(self.out_dir, name), 'rb') as f:
+                self.assertEqual(f.read(), content)
+
+    def test_export_note_to_dir_include(self):
+        extracted = self.export(self.make_zip(self.files), include=['*.md'])
+        self.assertEqual(
+            sorted(os.path.relpath(x, self.out_dir).replace('\\', '/') for x in extracted),
+            ['root/note.md', 'root/note/child.md'],
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, 'root/note/image.png')))
+
+    def test_export_note_to_dir_stored(self):
+        # zip from a seekable file, sizes are in the local headers
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for name, content in self.files.items():
+                archive.writestr(name, content)
+        self.assertEqual(len(self.export(buffer.getvalue())), 4)
+
+    def test_export_note_to_dir_path_traversal(self):
+        with self.assertRaises(ZipStreamError):
+            self.export(self.make_zip({'root/../../evil.md': b'evil'}))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir.name, 'evil.md')))
+
+    def test_export_note_to_dir_corrupted(self):
+        data = bytearray(self.make_zip({'root/note.md': os.urandom(4000)}))
+        data[200] ^= 0xFF
+        with self.assertRaises(ZipStreamError):
+            self.export(bytes(data))
+        self.assertEqual(os.listdir(os.path.join(self.out_dir, 'root')), [])
+
+    def test_export_note_to_dir_error(self):
+        with requests_mock.Mocker() as mock:
+            mock.get(EXPORT_URL, status_code=404)
+            self.assertIsNone(self.etapi.export_note_to_dir('root', 'md', self.out_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,387 @@
+"""Verify trilium-py internal link creation.
+
+"""
+import json
+import os
+import random
+import re
+import tempfile
+import unittest
+
+import requests_mock
+from bs4 import BeautifulSoup
+
+from trilium_py.client import ETAPI
+from trilium_py.utils.html_util import add_internal_links
+from trilium_py.utils.keyword_util import ChainedKeywordMatcher, KeywordMatcher
+from trilium_py.utils.link_state_util import InternalLinkState
+from trilium_py.utils.note_util import preprocess_note_title_list
+
+
+def regex_sub(text, keyword_note_id_list, current_note_id=None):
+    """
+    the alternation regex add_internal_links used before KeywordMatcher
+    """
+    keyword_to_link = {
+        keyword: f'<a class="reference-link" href="#root/{note_id}">{keyword}</a>'
+        for keyword, note_id in keyword_note_id_list
+        if note_id != current_note_id and keyword
+    }
+    if not keyword_to_link:
+        return text
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(k) for k in keyword_to_link) + r')\b')
+    return pattern.sub(lambda m: keyword_to_link[m.group(0)], text)
+
+
+def matcher_sub(text, matcher, current_note_id=None):
+    parts = []
+    pos = 0
+    for start, end, keyword, note_id in matcher.finditer(text, current_note_id):
+        parts.append(text[pos:start])
+        parts.append(f'<a class="reference-link" href="#root/{note_id}">{keyword}</a>')
+        pos = end
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
+def reparse_add_internal_links(html_content, keyword_note_id_list, current_note_id=None):
+    """
+    add_internal_links parsing every replaced text node again, as it used to
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    replaced = False
+    for text_node in soup.find_all(string=True):
+        if text_node.parent.name in ['a', 'h2', 'h3', 'h4', 'h5', 'h6']:
+            continue
+        new_text = regex_sub(text_node, keyword_note_id_list, current_note_id)
+        if new_text != text_node:
+            text_node.replace_with(BeautifulSoup(new_text, 'html.parser'))
+            replaced = True
+    return str(soup), replaced
+
+
+NOTE_CORPUS = [
+    '<p>Python is a programming language.</p>',
+    '<p>Only root can see this. <a href="#root/python">Python</a> is Python.</p>',
+    '<h2>Python</h2><p>Python<br>Python</p><h1>Python</h1>',
+    '<p>Python &amp; Java &lt;Python&gt; Python&nbsp;Java</p>',
+    '<p>x &lt;b&gt;Python&lt;/b&gt; y</p>',
+    '<!-- Python --><p><strong>Python</strong> <em>programming language</em></p>',
+    '<pre><code class="language-python">import Python\nPython()</code></pre>',
+    '<script>var Python = 1;</script><style>.Python {}</style><p>Python</p>',
+    '<ul class="todo-list"><li><label class="todo-list__label">'
+    '<input type="checkbox" checked disabled><span>Python Java</span></label></li></ul>',
+    '<figure class="image"><img src="api/images/x/Python.png" alt="Python"></figure>'
+    '<p>Python_3, Python3, Python.</p>',
+    '<table><tr><td>Java</td><td>C++ and Python</td></tr></table>',
+    '<p>中文 Python 中文Python 文</p>\n<p>  Java  </p>',
+    '<p>Nothing to link here.</p>',
+    '<p>Unclosed <b>Python',
+]
+
+
+class TestKeywordMatcher(unittest.TestCase):
+    def setUp(self):
+        self.random = random.Random(20)
+        self.alphabet = 'ab _-(.é中文'
+
+    def random_text(self, max_length):
+        return ''.join(
+            self.random.choice(self.alphabet) for _ in range(self.random.randint(1, max_length))
+        )
+
+    def random_keywords(self, count):
+        return [[self.random_text(5), f'n{self.random.randint(0, 5)}'] for _ in range(count)]
+
+    def test_same_as_regex(self):
+        for _ in range(300):
+            keywords = self.random_keywords(self.random.randint(1, 12))
+            matcher = KeywordMatcher(keywords)
+            text = self.random_text(60)
+            for current_note_id in (None, 'n0', 'n1'):
+                self.assertEqual(
+                    matcher_sub(text, matcher, current_note_id),
+                    regex_sub(text, keywords, current_note_id),
+                    (text, keywords, current_note_id),
+                )
+
+    def test_chained_same_as_concatenated_list(self):
+        for _ in range(300):
+            child_keywords = self.random_keywords(self.random.randint(0, 4))
+            all_keywords = self.random_keywords(self.random.randint(1, 12))
+            matcher = ChainedKeywordMatcher(
+                KeywordMatcher(child_keywords), KeywordMatcher(all_keywords)
+            )
+            text = self.random_text(60)
+            for current_note_id in (None, 'n0'):
+                self.assertEqual(
+                    matcher_sub(text, matcher, current_note_id),
+                    regex_sub(text, child_keywords + all_keywords, current_note_id),
+                    (text, child_keywords, all_keywords, current_note_id),
+                )
+
+    def test_longest_title_first(self):
+        keywords = preprocess_note_title_list(
+            [['Python', 'python'], ['Python programming', 'python_programming']]
+        )
+        matcher = KeywordMatcher(keywords)
+        self.assertEqual(
+            list(matcher.finditer('Python programming and Python_3 or Python.')),
+            [
+                (0, 18, 'Python programming', 'python_programming'),
+                (35, 41, 'Python', 'python'),
+            ],
+        )
+
+
+class TestAddInternalLinks(unittest.TestCase):
+    def test_add_internal_links(self):
+        html_content = (
+            '<p>Only root can see this. <a href="#root/python">Python</a> is a '
+            'programming language.</p><h2>Python</h2><p>Python</p>'
+        )
+        data = [
+            ['Python', 'python'],
+            ['programming language', 'programming_language'],
+            ['root', 'root'],
+        ]
+        matcher = KeywordMatcher(data)
+        for keywords in (data, matcher):
+            updated_html, replaced = add_internal_links(
+                html_content, keywords, current_note_id='root'
+            )
+            self.assertTrue(replaced)
+            self.assertEqual(
+                updated_html,
+                '<p>Only root can see this. <a href="#root/python">Python</a> is a '
+                '<a class="reference-link" href="#root/programming_language">'
+                'programming language</a>.</p><h2>Python</h2>'
+                '<p><a class="reference-link" href="#root/python">Python</a></p>',
+            )
+
+    def test_same_as_reparse(self):
+        data = [
+            ['programming language', 'programming_language'],
+            ['Python', 'python'],
+            ['Java', 'java'],
+            ['C++', 'cpp'],
+            ['root', 'root'],
+            ['Python & Java', 'a&b'],
+        ]
+        for html_content in NOTE_CORPUS:
+            for current_note_id in (None, 'python'):
+                expected, expected_replaced = reparse_add_internal_links(
+                    html_content, data, current_note_id
+                )
+                updated_html, replaced = add_internal_links(
+                    html_content, data, current_note_id=current_note_id
+                )
+                self.assertEqual(replaced, expected_replaced, html_content)
+                if replaced:
+                    self.assertEqual(updated_html, expected, html_content)
+                else:
+                    # nothing to replace, the content is not serialized again
+                    self.assertIs(updated_html, html_content)
+
+    def test_random_notes_same_as_reparse(self):
+        rand = random.Random(24)
+        pieces = ['Python', 'Java', 'Py', 'thon', ' ', '  ', '\n', '\r', '\t', '\xa0', '>', '"']
+        pieces += ['é', '_', 'a', ';', '&amp;', '&lt;']
+        tags = ['p', 'pre', 'b', 'textarea', 'h2', 'a', 'li', 'code']
+        data = [['Python', 'python'], ['Java', 'java'], ['a', 'a'], ['Py thon', 'py_thon']]
+        for _ in range(500):
+            parts = []
+            for _ in range(rand.randint(1, 6)):
+                text = ''.join(rand.choice(pieces) for _ in range(rand.randint(0, 8)))
+                tag = rand.choice(tags)
+                parts.append(f'<{tag}>{text}</{tag}>' if rand.random() < 0.7 else text)
+            html_content = ''.join(parts)
+            expected, expected_replaced = reparse_add_internal_links(html_content, data)
+            updated_html, replaced = add_internal_links(html_content, data)
+            self.assertEqual(replaced, expected_replaced, html_content)
+            if replaced:
+                self.assertEqual(updated_html, expected, html_content)
+
+    def test_no_keyword(self):
+        self.assertEqual(
+            add_internal_links('<p>root</p>', [['root', 'root']], current_note_id='root'),
+            ('<p>root</p>', False),
+        )
+
+
+class TestAutoCreateInternalLink(unittest.TestCase):
+    def setUp(self):
+        self.etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmp_dir.name, 'link_state.json')
+        self.notes = {
+            'python': self.note('python', 'Python', '2024-01-01 00:00:00.000Z'),
+            'diary': self.note('diary', 'Diary', '2024-01-02 00:00:00.000Z'),
+        }
+        self.contents = {'python': '<p>A language</p>', 'diary': '<p>Python and Java</p>'}
+        self.searches = []
+        self.updated = []
+        self.fetched = []
+        self.archived = set()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def note(note_id, title, modified):
+        return {
+            'noteId': note_id,
+            'title': title,
+            'type': 'text',
+            'isProtected': False,
+            'attributes': [],
+            'childNoteIds': [],
+            'parentNoteIds': ['root'],
+            'utcDateModified': modified,
+        }
+
+    def search_callback(self, request, context):
+        search = request.qs['search'][0]
+        self.searches.append(search)
+        notes = [x for x in self.notes.values() if x['noteId'] not in self.archived]
+        if search.startswith('note.utcDateModified'):
+            last_modified = search.split("'")[1]
+            results = [x for x in notes if x['utcDateModified'] > last_modified]
+        elif search.startswith('note.content'):
+            keywords = [x.lower() for x in re.findall(r"note\.content \*=\* '([^']*)'", search)]
+            results = [
+                x for x in notes
+                if any(k in self.contents.get(x['noteId'], '').lower() for k in keywords)
+            ]
+        else:
+            results = notes
+        return {'results': results}
+
+    def update_callback(self, request, context):
+        note_id = request.url.split('/')[-2]
+        self.updated.append(note_id)
+        self.contents[note_id] = request.text
+        context.status_code = 204
+        return ''
+
+    def get_note_callback(self, request, context):
+        note_id = request.url.split('/')[-1]
+        self.fetched.append(note_id)
+        return self.notes[note_id]
+
+    def run_link(self, **kwargs):
+        self.searches.clear()
+        self.updated.clear()
+        self.fetched.clear()
+        with requests_mock.Mocker(case_sensitive=True) as mock:
+            mock.get('http://bogus:8080/etapi/notes', json=self.search_callback)
+            mock.get(
+                re.compile(r'http://bogus:8080/etapi/notes/\w+$'),
+                json=self.get_note_callback,
+            )
+            mock.get(
+                re.compile(r'http://bogus:8080/etapi/notes/\w+/content$'),
+                text=lambda request, context: self.contents[request.url.split('/')[-2]],
+            )
+            mock.put(
+                re.compile(r'http://bogus:8080/etapi/notes/\w+/content$'),
+                text=self.update_callback,
+            )
+            kwargs.setdefault('state_path', self.state_path)
+            return self.etapi.auto_create_internal_link(
+                process_all_notes=True, verbose=False, **kwargs
+            )
+
+    def test_process_all_notes(self):
+        self.notes['java'] = self.note('java', 'Java', '2024-01-03 00:00:00.000Z')
+        self.notes['java']['parentNoteIds'] = ['python']
+        # archived notes are not found by the searches
+        self.notes['old'] = self.note('old', 'Old Java', '2024-01-03 00:00:00.000Z')
+        self.archived.add('old')
+        self.notes['python']['childNoteIds'] = ['java', 'old']
+        self.contents['python'] = '<p>Java is not Old Java</p>'
+        self.contents['java'] = '<p>Another language</p>'
+
+        progress = []
+        result = self.run_link(
+            state_path=None, max_workers=4, link_workers=1, progress=lambda *x: progress.append(x)
+        )
+        self.assertEqual(result['processed'], 3)
+        self.assertEqual(result['updated'], 2)
+        self.assertEqual(sorted(self.updated), ['diary', 'python'])
+        # only the archived child is fetched, other metadata comes from the searches
+        self.assertEqual(self.fetched, ['old'])
+        self.assertEqual(
+            self.contents['python'],
+            '<p><a class="reference-link" href="#root/java">Java</a> is not '
+            '<a class="reference-link" href="#root/old">Old Java</a></p>',
+        )
+        self.assertEqual([x[:2] for x in progress], [(1, 3), (2, 3), (3, 3)])
+
+    def test_incremental_run(self):
+        # first run processes every note
+        self.run_link()
+        self.assertEqual(self.updated, ['diary'])
+        with open(self.state_path) as f:
+            state = json.load(f)
+        self.assertEqual(state['last_modified'], '2024-01-02 00:00:00.000Z')
+        self.assertEqual(state['titles'], {'Python': 'python', 'Diary': 'diary'})
+
+        # nothing changed, only modified notes are searched
+        self.run_link()
+        self.assertEqual(self.updated, [])
+        self.assertIn("note.utcDateModified > '2024-01-02 00:00:00.000Z'", self.searches)
+        self.assertFalse(any(x.startswith('note.content') for x in self.searches))
+
+        # a new title, notes containing it are processed
+        self.notes['java'] = self.note('java', 'Java', '2024-01-03 00:00:00.000Z')
+        self.notes['java']['parentNoteIds'] = ['python']
+        self.contents['java'] = '<p>Another language</p>'
+        self.run_link()
+        self.assertIn("note.content *=* 'Java'", self.searches)
+        self.assertEqual(self.updated, ['diary'])
+        self.assertIn('href="#root/java">Java</a>', self.contents['diary'])
+
+
+    def test_incremental_run_protected_parent(self):
+        self.run_link()
+
+        self.notes['secret'] = self.note('secret', 'Secret', '2024-01-01 00:00:00.000Z')
+        self.notes['secret']['isProtected'] = True
+        self.notes['java'] = self.note('java', 'Java', '2024-01-03 00:00:00.000Z')
+        self.notes['java']['parentNoteIds'] = ['secret']
+        self.contents['java'] = '<p>Another language</p>'
+        # the content of a protected note can't be read, the mock raises KeyError
+        result = self.run_link()
+        self.assertEqual(self.updated, ['diary'])
+        self.assertEqual(result['processed'], 2)
+
+    def test_incremental_run_title_batches(self):
+        self.run_link()
+
+        self.notes['java'] = self.note('java', 'Java', '2024-01-03 00:00:00.000Z')
+        self.notes['rust'] = self.note('rust', 'Rust', '2024-01-03 00:00:00.000Z')
+        self.notes['java']['parentNoteIds'] = self.notes['rust']['parentNoteIds'] = ['python']
+        self.contents.update(java='<p>JVM</p>', rust='<p>Java or not</p>')
+        self.run_link()
+        content_searches = [x for x in self.searches if x.startswith('note.content')]
+        self.assertEqual(content_searches, ["note.content *=* 'Java' or note.content *=* 'Rust'"])
+        self.assertEqual(sorted(self.updated), ['diary', 'rust'])
+
+    def test_incremental_run_too_many_titles(self):
+        self.run_link()
+
+        self.notes['java'] = self.note('java', 'Java', '2024-01-03 00:00:00.000Z')
+        self.notes['rust'] = self.note('rust', 'Rust', '2024-01-03 00:00:00.000Z')
+        self.contents.update(java='<p>JVM</p>', rust='<p>Java or not</p>')
+        state = InternalLinkState(self.state_path)
+        title_list = [['Java', 'java'], ['Rust', 'rust'], ['Python', 'python']]
+        self.assertIsNone(
+            self.etapi._get_internal_link_target_notes(
+                state, title_list, {}, titles_per_search=1, max_title_searches=1
+            )
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,8 +5,10 @@ import re
 import unittest
 
 import requests_mock
+from bs4 import BeautifulSoup
 
 from trilium_py.client import ETAPI, ItemTemplate, ListTemplate
+from trilium_py.utils.todo_util import add_item, delete_item, scan_todos, set_checked
 
 
 class TestToDo(unittest.TestCase):
@@ -149,7 +151,173 @@ class TestToDo(unittest.TestCase):
         mock.get('mock://bogus:8080/etapi/notes/c0ffee/content', text=self.body)
 
         put_c0ffee = mock.put('mock://bogus:8080/etapi/notes/c0ffee/content', status_code=204)
+        put_deadbeef = mock.put('mock://bogus:8080/etapi/notes/deadbeef/content', status_code=204)
 
         self.assertIsNone(self.etapi.move_yesterday_unfinished_todo_to_today())
         self.assertEqual(put_c0ffee.call_count, 1)
         self.assertEqual(put_c0ffee.last_request.text, self.task_list['deleted'])
+        self.assertEqual(put_deadbeef.call_count, 1)
+        self.assertEqual(
+            put_deadbeef.last_request.text,
+            ListTemplate().substitute(
+                items=ItemTemplate(checked=True).substitute(description='item_2')
+            )
+            + self.body,
+        )
+        # both notes are read once and written once
+        self.assertEqual(mock.call_count, 6)
+
+    @requests_mock.Mocker()
+    def test_todo_session(self, mock):
+        mock.get(self.day_url, json={"noteId": "deadbeef"})
+        mock.get(self.content_url, text=self.task_list['checked'])
+        put = mock.put(self.content_url, status_code=204)
+
+        with self.etapi.todo_session('2024-01-01') as todos:
+            self.assertEqual(todos.items, [[False, 'item_1'], [True, 'item_2']])
+            self.assertTrue(todos.update('item_1', 'item_3'))
+            self.assertTrue(todos.uncheck(1))
+            self.assertTrue(todos.check('item_2'))
+            self.assertFalse(todos.delete(99))
+            self.assertFalse(todos.check('missing'))
+
+        # one calendar lookup, one read and one write
+        self.assertEqual(mock.call_count, 3)
+        self.assertEqual(put.call_count, 1)
+        self.assertEqual(put.last_request.text, self.task_list['updated'])
+
+    @requests_mock.Mocker()
+    def test_day_note_id_cache(self, mock):
+        day = mock.get(self.day_url, json={"noteId": "deadbeef"})
+        mock.get(self.content_url, text=self.task_list['checked'])
+        mock.put(self.content_url, status_code=204)
+
+        self.etapi.get_day_note('2024-01-01')
+        self.etapi.set_day_note('2024-01-01', self.body)
+        self.etapi.get_todo()
+        self.etapi.get_todo()
+        # once for 2024-01-01 and once for today
+        self.assertEqual(day.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_day_note_deleted(self, mock):
+        # deadbeef was cached, then deleted, the calendar creates the day note again
+        day = mock.get(self.day_url, json={'noteId': 'cafebabe'})
+        mock.get('mock://bogus:8080/etapi/notes/deadbeef/content', status_code=404)
+        mock.get('mock://bogus:8080/etapi/notes/cafebabe/content', text=self.body)
+        mock.put('mock://bogus:8080/etapi/notes/deadbeef/content', status_code=404)
+        put = mock.put('mock://bogus:8080/etapi/notes/cafebabe/content', status_code=204)
+
+        self.etapi.day_note_ids.set('2024-01-01', 'deadbeef')
+        self.assertEqual(self.etapi.get_day_note('2024-01-01'), self.body)
+        self.assertEqual(self.etapi.get_day_note_id('2024-01-01'), 'cafebabe')
+        self.assertEqual(day.call_count, 1)
+
+        self.etapi.day_note_ids.set('2024-01-02', 'deadbeef')
+        self.assertTrue(self.etapi.set_day_note('2024-01-02', self.body))
+        self.assertEqual(put.call_count, 1)
+
+    def test_day_note_id_cache_size(self):
+        etapi = ETAPI('mock://bogus:8080', day_note_cache_size=2)
+        for i in range(3):
+            etapi.day_note_ids.set(f'2024-01-0{i + 1}', f'day{i}')
+        self.assertEqual(len(etapi.day_note_ids), 2)
+        self.assertIsNone(etapi.day_note_ids.get('2024-01-01'))
+
+    @requests_mock.Mocker()
+    def test_prefetch_calendar(self, mock):
+        search = mock.get(
+            'http://bogus:8080/etapi/notes',
+            json={
+                'results': [
+                    {
+                        'noteId': f'day{x}',
+                        'attributes': [
+                            {'type': 'label', 'name': 'dateNote', 'value': f'2024-01-0{x}'}
+                        ],
+                    }
+                    for x in [1, 3]
+                ]
+            },
+        )
+        day = mock.get(
+            re.compile(r'http://bogus:8080/etapi/calendar/days/.*'), json={"noteId": "created"}
+        )
+        # mock:// urls don't get query strings
+        etapi = ETAPI('http://bogus:8080')
+
+        self.assertEqual(
+            etapi.prefetch_calendar('2024-01-01', '2024-01-03'),
+            {'2024-01-01': 'day1', '2024-01-03': 'day3'},
+        )
+        self.assertEqual(
+            search.last_request.qs['search'],
+            ["#datenote >= '2024-01-01' #datenote <= '2024-01-03'"],
+        )
+        self.assertEqual(day.call_count, 0)
+
+        result = etapi.prefetch_calendar('2024-01-01', '2024-01-03', create_missing=True)
+        self.assertEqual(result['2024-01-02'], 'created')
+        self.assertEqual(day.call_count, 1)
+
+        # everything is cached now
+        etapi.prefetch_calendar('2024-01-01', '2024-01-03')
+        self.assertEqual(etapi.get_day_note_id('2024-01-03'), 'day3')
+        self.assertEqual(search.call_count, 2)
+        self.assertEqual(day.call_count, 1)
+
+
+class TestTodoScanner(unittest.TestCase):
+    content = (
+        '<h2>Day</h2><p>TODO:</p><ul class="todo-list">'
+        '<li><label class="todo-list__label"><input type="checkbox" disabled="disabled">'
+        '<span class="todo-list__label__description">a &amp; <b>b</b><!-- note --></span>'
+        '</label></li>'
+        '<li><label class="x todo-list__label" title="a > b"><input checked="checked" '
+        'type="checkbox"><span class="todo-list__label__description">'
+        '<a class="reference-link" href="#root/abc">link</a>&nbsp;</span></label>'
+        '<ul class="todo-list"><li><label class="todo-list__label"><input checked '
+        'type="checkbox"><span class="todo-list__label__description">nested</span></label>'
+        '</li></ul></li>'
+        '<li><label class="todo-list__label"><input type="checkbox">'
+        '<span class="todo-list__label__description"></span></label></li>'
+        '</ul><p>end</p>'
+    )
+
+    def soup_todos(self, content):
+        soup = BeautifulSoup(content, 'html.parser')
+        return [
+            [bool(x.find('input').get('checked')), x.text.strip()]
+            for x in soup.find_all('label', {'class': 'todo-list__label'})
+        ]
+
+    def test_scan_like_soup(self):
+        todos = scan_todos(self.content)
+        self.assertEqual(
+            [[x['checked'], x['description']] for x in todos], self.soup_todos(self.content)
+        )
+        self.assertEqual(
+            [[x['checked'], x['description']] for x in todos],
+            [[False, 'a & b'], [True, 'link'], [False, 'nested'], [False, '']],
+        )
+        self.assertTrue(todos[0]['html'].startswith('<label class="todo-list__label">'))
+        self.assertTrue(todos[0]['html'].endswith('</label>'))
+
+    def test_splice(self):
+        todos = scan_todos(self.content)
+        checked = set_checked(self.content, todos[0])
+        self.assertEqual(self.soup_todos(checked)[0], [True, 'a & b'])
+        unchecked = set_checked(self.content, todos[1], checked=False)
+        self.assertEqual(self.soup_todos(unchecked)[1], [False, 'link'])
+
+        # the nested list goes with its parent item, the rest is untouched
+        deleted = delete_item(self.content, todos[1])
+        self.assertEqual(self.soup_todos(deleted), [[False, 'a & b'], [False, '']])
+        self.assertTrue(deleted.endswith('</ul><p>end</p>'))
+
+        # the last todo is empty, it is replaced
+        item = ItemTemplate('new').substitute()
+        added = add_item(self.content, todos, item, ListTemplate().substitute(items=item))
+        self.assertEqual(self.soup_todos(added)[-1], [False, 'new'])
+        self.assertEqual(len(self.soup_todos(added)), 4)
+
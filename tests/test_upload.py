@@ -0,0 +1,319 @@
+"""Verify trilium-py markdown folder upload.
+
+"""
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+import zipfile
+
+import requests
+import requests_mock
+
+from trilium_py.client import ETAPI
+from trilium_py.utils.manifest_util import AssetIndex
+
+
+class TestUploadMdFolder(unittest.TestCase):
+    def setUp(self):
+        self.etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.folder = self.tmp_dir.name
+        os.makedirs(os.path.join(self.folder, 'sub'))
+        for path in ['b10.md', 'b2.md', 'a.md', 'ignored.txt', os.path.join('sub', 'c.md')]:
+            with open(os.path.join(self.folder, path), 'w', encoding='utf-8') as f:
+                f.write(f'# {path}\n\nhello *world*\n')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_note_callback(self, request, context):
+        params = request.json()
+        context.status_code = 201
+        note_id = params.get('noteId', f"id_{params['title']}")
+        return {'note': {'noteId': note_id, 'title': params['title']}}
+
+    def upload(self, **kwargs):
+        with requests_mock.Mocker() as mock:
+            create = mock.post(
+                'http://bogus:8080/etapi/create-note', json=self.create_note_callback
+            )
+            self.assertTrue(self.etapi.upload_md_folder('root', self.folder, **kwargs))
+            return {x.json()['title']: x.json() for x in create.request_history}
+
+    def test_upload_serial(self):
+        notes = self.upload()
+        self.assertEqual(sorted(notes), ['a', 'b10', 'b2', 'c', 'sub'])
+        self.assertEqual(notes['c']['parentNoteId'], 'id_sub')
+        self.assertIn('<em>world</em>', notes['a']['content'])
+        self.assertNotIn('notePosition', notes['a'])
+
+    def test_upload_pipeline(self):
+        notes = self.upload(render_workers=2, upload_workers=2)
+        self.assertEqual(sorted(notes), ['a', 'b10', 'b2', 'c', 'sub'])
+        self.assertEqual(notes['c']['parentNoteId'], 'id_sub')
+        self.assertIn('<em>world</em>', notes['c']['content'])
+        # natsorted files first, then folders
+        self.assertEqual(
+            [notes[x]['notePosition'] for x in ['a', 'b2', 'b10', 'sub']], [10, 20, 30, 40]
+        )
+        self.assertEqual(notes['c']['notePosition'], 10)
+
+    def test_upload_manifest(self):
+        manifest_path = os.path.join(self.folder, 'manifest.sqlite')
+
+        with requests_mock.Mocker() as mock:
+            create = mock.post(
+                'http://bogus:8080/etapi/create-note', json=self.create_note_callback
+            )
+            mock.get(requests_mock.ANY, json=[])
+
+            self.etapi.upload_md_folder('root', self.folder, manifest_path=manifest_path)
+            self.assertEqual(create.call_count, 5)
+            note_ids = {x.json()['title']: x.json()['noteId'] for x in create.request_history}
+
+            # nothing changed
+            self.etapi.upload_md_folder('root', self.folder, manifest_path=manifest_path)
+            self.assertEqual(create.call_count, 5)
+
+            # only the changed file is uploaded again, to the same note
+            with open(os.path.join(self.folder, 'sub', 'c.md'), 'a', encoding='utf-8') as f:
+                f.write('more\n')
+            self.etapi.upload_md_folder('root', self.folder, manifest_path=manifest_path)
+            self.assertEqual(create.call_count, 6)
+            self.assertEqual(create.last_request.json()['noteId'], note_ids['c'])
+            self.assertEqual(create.last_request.json()['parentNoteId'], note_ids['sub'])
+
+    def test_upload_manifest_interrupted(self):
+        manifest_path = os.path.join(self.folder, 'manifest.sqlite')
+        with open(os.path.join(self.folder, 'a.md'), 'w', encoding='utf-8') as f:
+            f.write('![logo](logo.png)\n\n[doc](doc.pdf)\n')
+        for name in ['logo.png', 'doc.pdf']:
+            with open(os.path.join(self.folder, name), 'wb') as f:
+                f.write(name.encode())
+        fail_files = [True]
+
+        def create_attachment_callback(request, context):
+            if 'role=file' in request.text and fail_files[0]:
+                raise requests.exceptions.ConnectionError('interrupted')
+            context.status_code = 201
+            attachment_id = 'att_image' if 'role=image' in request.text else 'att_file'
+            return {'attachmentId': attachment_id, 'title': attachment_id}
+
+        with requests_mock.Mocker() as mock:
+            create = mock.post(
+                'http://bogus:8080/etapi/create-note', json=self.create_note_callback
+            )
+            mock.post('http://bogus:8080/etapi/attachments', json=create_attachment_callback)
+            mock.put(requests_mock.ANY, status_code=204)
+            list_attachments = mock.get(requests_mock.ANY, json=[])
+            delete = mock.delete(requests_mock.ANY, status_code=204)
+
+            # the image attachment is created, then the upload of a.md fails
+            self.etapi.upload_md_folder('root', self.folder, manifest_path=manifest_path)
+            self.assertEqual(delete.call_count, 0)
+
+            fail_files[0] = False
+            self.etapi.upload_md_folder('root', self.folder, manifest_path=manifest_path)
+            # only the attachment recorded for the interrupted upload is deleted
+            self.assertEqual(
+                [x.path for x in delete.request_history], ['/etapi/attachments/att_image']
+            )
+            self.assertEqual(list_attachments.call_count, 0)
+            self.assertEqual(create.call_count, 6)
+
+    def test_upload_dedup_assets(self):
+        for name in ['a.md', 'b2.md']:
+            with open(os.path.join(self.folder, name), 'w', encoding='utf-8') as f:
+                f.write('![logo](logo.png)\n')
+        with open(os.path.join(self.folder, 'logo.png'), 'wb') as f:
+            f.write(b'png')
+
+        with requests_mock.Mocker() as mock:
+            create = mock.post(
+                'http://bogus:8080/etapi/create-note', json=self.create_note_callback
+            )
+            upload = mock.put(requests_mock.ANY, status_code=204)
+            mock.post('http://bogus:8080/etapi/attributes/', json={}, status_code=201)
+            self.etapi.upload_md_folder(
+                'root', self.folder, image_and_file_as_attachments=False
+            )
+
+            images = [x for x in create.request_history if x.json()['type'] == 'image']
+            self.assertEqual(len(images), 1)
+            contents = {
+                x.path: x.text for x in upload.request_history if x.path.endswith('/content')
+            }
+            self.assertIn('api/images/id_logo/logo', contents['/etapi/notes/id_a/content'])
+            self.assertIn('api/images/id_logo/logo', contents['/etapi/notes/id_b2/content'])
+
+    def test_upload_zip(self):
+        with open(os.path.join(self.folder, 'sub', 'c.md'), 'a', encoding='utf-8') as f:
+            f.write('![logo](../logo.png)\n')
+        with open(os.path.join(self.folder, 'logo.png'), 'wb') as f:
+            f.write(b'png')
+
+        uploaded = []
+
+        def import_callback(request, context):
+            uploaded.append(request.body.read())
+            context.status_code = 201
+            return ''
+
+        with requests_mock.Mocker() as mock:
+            import_note = mock.post(
+                'http://bogus:8080/etapi/notes/root/import', text=import_callback
+            )
+            self.assertTrue(self.etapi.upload_md_folder('root', self.folder, strategy='zip'))
+            self.assertEqual(import_note.call_count, 1)
+            archive = zipfile.ZipFile(io.BytesIO(uploaded[0]))
+
+        meta = json.loads(archive.read('!!!meta.json'))
+        files = meta['files']
+        self.assertEqual([x['title'] for x in files], ['a', 'b2', 'b10', 'sub'])
+        self.assertEqual([x['notePosition'] for x in files], [10, 20, 30, 40])
+        c = files[3]['children'][0]
+        self.assertEqual(c['title'], 'c')
+        self.assertEqual(c['attachments'][0]['role'], 'image')
+        html = archive.read(f"sub/{c['dataFileName']}").decode()
+        self.assertIn('<em>world</em>', html)
+        self.assertIn(f'src="{c["attachments"][0]["dataFileName"]}"', html)
+        self.assertEqual(archive.read('sub/logo.png'), b'png')
+
+
+class TestUploadMdFile(unittest.TestCase):
+    def setUp(self):
+        self.etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.folder = self.tmp_dir.name
+        for name in ['1.png', '2.png', 'doc.pdf']:
+            with open(os.path.join(self.folder, name), 'wb') as f:
+                f.write(name.encode())
+        self.md_file = os.path.join(self.folder, 'note.md')
+        with open(self.md_file, 'w', encoding='utf-8') as f:
+            f.write(
+                '![one](1.png)\n\n![two](2.png)\n\n![one again](1.png)\n\n'
+                '[the doc](doc.pdf)\n\n[web](https://example.com)\n'
+            )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_upload_single_write(self):
+        def create_attachment_callback(request, context):
+            context.status_code = 201
+            title = request.text.split('title=')[1].split('&')[0]
+            return {'attachmentId': f'att_{title}', 'title': title}
+
+        with requests_mock.Mocker() as mock:
+            create = mock.post(
+                'http://bogus:8080/etapi/create-note',
+                json={'note': {'noteId': 'fixed', 'title': 'note'}},
+                status_code=201,
+            )
+            mock.post('http://bogus:8080/etapi/attachments', json=create_attachment_callback)
+            upload = mock.put(requests_mock.ANY, status_code=204)
+            mock.post('http://bogus:8080/etapi/attributes/', json={}, status_code=201)
+
+            self.etapi.upload_md_file(self.md_file, 'root', noteId='fixed')
+
+            self.assertEqual(create.last_request.json()['noteId'], 'fixed')
+            content_puts = [
+                x for x in upload.request_history if x.path == '/etapi/notes/fixed/content'
+            ]
+            self.assertEqual(len(content_puts), 1)
+            # 1.png is used twice but uploaded once
+            self.assertEqual(len(upload.request_history), 4)
+            html = content_puts[0].text
+            self.assertIn('src="api/attachments/att_one/image/one"', html)
+            self.assertIn('src="api/attachments/att_two/image/two"', html)
+            self.assertIn('href="#root/fixed?viewMode=attachments&amp;attachmentId=att_the+doc"', html)
+            self.assertIn('href="https://example.com"', html)
+
+
+class TestAssetIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_read(self):
+        index = AssetIndex(max_file_bytes=10)
+        small = self.write('small.png', b'small')
+        copy = self.write('copy.png', b'small')
+        large = self.write('large.png', b'x' * 11)
+
+        self.assertEqual(index.read(small), b'small')
+        self.assertEqual(index.read(small), b'small')
+        self.assertEqual(index.reads_saved, 1)
+        # same content from another path is stored once
+        self.assertEqual(index.read(copy), b'small')
+        self.assertEqual(index._cached_bytes, 5)
+        # large files are left to be streamed
+        self.assertIsNone(index.read(large))
+        self.assertEqual(index._cached_bytes, 5)
+
+
+class TestStreamingUpload(unittest.TestCase):
+    def setUp(self):
+        self.etapi = ETAPI('http://bogus:8080', 'Token bogus')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def upload_peak_memory(self, size):
+        file_path = os.path.join(self.tmp_dir.name, f'{size}.zip')
+        with open(file_path, 'wb') as f:
+            f.truncate(size)
+
+        received = []
+        progress = []
+
+        def import_callback(request, context):
+            # consume the body like a socket would, chunk by chunk
+            total = 0
+            while chunk := request.body.read(16384):
+                total += len(chunk)
+            received.append(total)
+            context.status_code = 201
+            return ''
+
+        with requests_mock.Mocker() as mock:
+            import_note = mock.post(
+                'http://bogus:8080/etapi/notes/root/import', text=import_callback
+            )
+            tracemalloc.start()
+            try:
+                res = self.etapi.import_note(
+                    'root', file_path, progress=lambda *x: progress.append(x)
+                )
+                self.assertTrue(res)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        self.assertEqual(received, [size])
+        self.assertEqual(import_note.last_request.headers['Content-Length'], str(size))
+        self.assertEqual(progress[-1][:2], (size, size))
+        return peak
+
+    def test_import_note_constant_memory(self):
+        small = self.upload_peak_memory(8 * 1024 * 1024)
+        large = self.upload_peak_memory(64 * 1024 * 1024)
+        # only one chunk is held at a time
+        self.assertLess(small, 4 * 1024 * 1024)
+        self.assertLess(large, 4 * 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()